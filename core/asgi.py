@@ -3,6 +3,12 @@ ASGI config for core project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with an ASGI server, e.g.
+``gunicorn core.asgi:application -k uvicorn.workers.UvicornWorker``. The
+project is deployed with WSGI (core.wsgi); its views are synchronous and
+run in a worker thread here. Pair it with DB_POOL=True, since per-thread
+persistent connections are not reused under ASGI.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.0/howto/deployment/asgi/
 """
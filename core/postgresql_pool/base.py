@@ -0,0 +1,69 @@
+"""
+PostgreSQL backend that borrows connections from an in-process pool.
+
+Django 4.0 opens a new connection per request (or keeps one per thread with
+CONN_MAX_AGE, without health checks). With this engine and CONN_MAX_AGE = 0,
+"closing" at the end of a request returns the connection to the pool, so
+requests skip the TCP and authentication handshake. Pool settings come from
+the database's "POOL" dict: TAMANHO, MAX_IDADE, CHECAR_APOS and TIMEOUT.
+"""
+import threading
+
+from django.db.backends.postgresql import base
+
+from .pool import PoolConexoes
+
+
+# alias -> (connection parameters, PoolConexoes)
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def pool(self) -> PoolConexoes:
+        """
+        The pool for this alias and its current connection parameters.
+
+        When the parameters change, e.g. the test runner switching NAME to
+        the test database, a new pool replaces the old one, which is retired
+        so none of its connections is handed out again.
+        """
+        chave = repr(sorted(self.get_connection_params().items()))
+        with _pools_lock:
+            atual = _pools.get(self.alias)
+            if atual is not None and atual[0] == chave:
+                return atual[1]
+            opcoes = self.settings_dict.get('POOL', {})
+            pool = PoolConexoes(
+                None,
+                tamanho=opcoes.get('TAMANHO', 10),
+                max_idade=opcoes.get('MAX_IDADE', 1800),
+                checar_apos=opcoes.get('CHECAR_APOS', 10),
+                timeout=opcoes.get('TIMEOUT', 30),
+            )
+            _pools[self.alias] = (chave, pool)
+        if atual is not None:
+            atual[1].encerrar()
+        return pool
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool()
+        conexao = pool.obter(lambda: super(DatabaseWrapper, self).get_new_connection(conn_params))
+        # Returned by _close to the pool it came from, even if that was retired.
+        self._pool_da_conexao = pool
+        # A reused connection skipped the parent's setup of this attribute.
+        self.isolation_level = self.settings_dict['OPTIONS'].get(
+            'isolation_level', conexao.isolation_level
+        )
+        return conexao
+
+    def _close(self):
+        if self.connection is None:
+            return
+        pool = getattr(self, '_pool_da_conexao', None)
+        if pool is None:
+            return super()._close()
+        self._pool_da_conexao = None
+        with self.wrap_database_errors:
+            pool.devolver(self.connection, descartar=self.connection.closed != 0)
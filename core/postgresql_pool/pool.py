@@ -0,0 +1,122 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Callable
+
+from django.db.utils import OperationalError
+
+
+class PoolEsgotado(OperationalError):
+    pass
+
+
+def saudavel(conexao: Any) -> bool:
+    """
+    Returns whether a DB-API connection still answers a trivial query.
+
+    The ping is rolled back, so a connection outside autocommit is not left
+    inside a transaction (psycopg2 would then refuse `set_autocommit`).
+    """
+    try:
+        cursor = conexao.cursor()
+        try:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+        finally:
+            cursor.close()
+        conexao.rollback()
+        return True
+    except Exception:
+        return False
+
+
+class PoolConexoes:
+    """
+    Thread-safe pool of DB-API connections.
+
+    At most `tamanho` connections are checked out at once; further callers
+    wait up to `timeout` seconds. Idle connections are reused newest first.
+    Connections older than `max_idade` seconds are closed instead of reused.
+    Connections idle for more than `checar_apos` seconds are pinged before
+    being handed out, so one the server dropped is replaced transparently.
+    """
+    def __init__(self, criar: Callable[[], Any], tamanho: int = 10, max_idade: float = 1800,
+                 checar_apos: float = 10, timeout: float = 30) -> None:
+        self.criar = criar
+        self.tamanho = tamanho
+        self.max_idade = max_idade
+        self.checar_apos = checar_apos
+        self.timeout = timeout
+        self.encerrado = False
+        self._livres = deque()
+        self._criadas = {}
+        self._lock = threading.Lock()
+        self._vagas = threading.BoundedSemaphore(tamanho)
+
+    def _fechar(self, conexao: Any) -> None:
+        self._criadas.pop(id(conexao), None)
+        try:
+            conexao.close()
+        except Exception:
+            pass
+
+    def obter(self, criar: Callable[[], Any] = None) -> Any:
+        """
+        Checks out a connection, opening one with `criar` (default: the
+        pool's factory) when none of the idle ones is usable.
+        """
+        if not self._vagas.acquire(timeout=self.timeout):
+            raise PoolEsgotado(f'Nenhuma das {self.tamanho} conexões ficou livre em {self.timeout}s.')
+        try:
+            while True:
+                with self._lock:
+                    item = self._livres.pop() if self._livres else None
+                if item is None:
+                    conexao = (criar or self.criar)()
+                    self._criadas[id(conexao)] = time.monotonic()
+                    return conexao
+                conexao, devolvida_em = item
+                agora = time.monotonic()
+                if agora - self._criadas.get(id(conexao), agora) > self.max_idade:
+                    self._fechar(conexao)
+                elif agora - devolvida_em > self.checar_apos and not saudavel(conexao):
+                    self._fechar(conexao)
+                else:
+                    return conexao
+        except BaseException:
+            self._vagas.release()
+            raise
+
+    def devolver(self, conexao: Any, descartar: bool = False) -> None:
+        """
+        Returns a connection, rolling back anything left open. Broken or
+        expired connections are closed instead.
+        """
+        try:
+            if not descartar:
+                try:
+                    conexao.rollback()
+                except Exception:
+                    descartar = True
+            idade = time.monotonic() - self._criadas.get(id(conexao), 0)
+            if descartar or self.encerrado or idade > self.max_idade:
+                self._fechar(conexao)
+            else:
+                with self._lock:
+                    self._livres.append((conexao, time.monotonic()))
+        finally:
+            self._vagas.release()
+
+    def encerrar(self) -> None:
+        """
+        Retires the pool: idle connections are closed now and checked-out
+        ones when they are returned.
+        """
+        self.encerrado = True
+        self.fechar_todas()
+
+    def fechar_todas(self) -> None:
+        with self._lock:
+            livres, self._livres = list(self._livres), deque()
+        for conexao, _ in livres:
+            self._fechar(conexao)
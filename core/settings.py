@@ -1,6 +1,7 @@
 from pathlib import Path
 from django.contrib.messages import constants as messages
-from decouple import config
+from django.core.exceptions import ImproperlyConfigured
+from decouple import Csv, config
 
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -24,6 +25,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'seguros.middleware.MetricasMiddleware',
+    'seguros.middleware.InstrumentacaoMiddleware',
+    'seguros.middleware.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -52,17 +56,83 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'core.wsgi.application'
 
+# DB_POOL swaps the backend for core.postgresql_pool, which keeps a bounded
+# per-process pool of health-checked connections. Without it, each request opens
+# its own connection unless SQL_CONN_MAX_AGE is set: that keeps one connection
+# per thread, and under ASGI sync views run on many threads, so it stays 0 by default.
+DB_POOL = config("DB_POOL", default=False, cast=bool)
+SQL_ENGINE = config("SQL_ENGINE", default="django.db.backends.postgresql")
+
+if DB_POOL and SQL_ENGINE != "django.db.backends.postgresql":
+    raise ImproperlyConfigured(
+        f"DB_POOL=True requires SQL_ENGINE=django.db.backends.postgresql, not {SQL_ENGINE}."
+    )
+
 DATABASES = {
     "default": {
-        "ENGINE": config("SQL_ENGINE", default="django.db.backends.postgresql"),
+        "ENGINE": "core.postgresql_pool" if DB_POOL else SQL_ENGINE,
         "NAME": config("SQL_DATABASE", default="github-actions"),
         "USER": config("SQL_USER", default="postgres"),
         "PASSWORD": config("SQL_PASSWORD", default="postgres"),
         "HOST": config("SQL_HOST", default="localhost"),
         "PORT": config("SQL_PORT", default=5432),
+        "CONN_MAX_AGE": 0 if DB_POOL else config("SQL_CONN_MAX_AGE", default=0, cast=int),
+        "POOL": {
+            "TAMANHO": config("DB_POOL_TAMANHO", default=10, cast=int),
+            "MAX_IDADE": config("DB_POOL_MAX_IDADE", default=1800, cast=int),
+            "CHECAR_APOS": config("DB_POOL_CHECAR_APOS", default=10, cast=int),
+            "TIMEOUT": config("DB_POOL_TIMEOUT", default=30, cast=int),
+        },
     }
 }
 
+# Read replicas (seguros.routers): each host in SQL_REPLICA_HOSTS becomes the
+# alias replica_1, replica_2, ... with the primary's credentials. Listing and
+# report pages read from them; after a write the client reads from the primary
+# for REPLICA_ATRASO_MAXIMO seconds.
+for numero, host in enumerate(config("SQL_REPLICA_HOSTS", default="", cast=Csv()), start=1):
+    DATABASES[f"replica_{numero}"] = {**DATABASES["default"], "HOST": host, "TEST": {"MIRROR": "default"}}
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias.startswith("replica_")]
+DATABASE_ROUTERS = ["seguros.routers.ReplicaRouter"]
+REPLICA_ATRASO_MAXIMO = config("REPLICA_ATRASO_MAXIMO", default=5, cast=int)
+
+# CACHE_BACKEND is arquivo (directory CACHE_LOCATION, shared by the processes
+# of one host), redis (URL CACHE_LOCATION, shared by every host) or locmem (per
+# process, only for development or a single process). "default" holds the
+# monthly reports (seguros.cache); "fragmentos" holds the rendered policy table
+# rows, keyed by Apolice.versao. The default is shared so that invalidation on
+# write reaches every worker.
+CACHE_BACKEND = config("CACHE_BACKEND", default="arquivo")
+CACHE_LOCATION = config("CACHE_LOCATION", default="")
+
+CACHES = {}
+for alias, maximo in (("default", config("CACHE_MAX", default=5000, cast=int)),
+                      ("fragmentos", config("CACHE_FRAGMENTOS_MAX", default=20000, cast=int))):
+    CACHES[alias] = {
+        "locmem": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": alias,
+            "OPTIONS": {"MAX_ENTRIES": maximo},
+        },
+        "arquivo": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": Path(CACHE_LOCATION or BASE_DIR / ".cache") / alias,
+            "OPTIONS": {"MAX_ENTRIES": maximo},
+        },
+        "redis": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_LOCATION or "redis://localhost:6379/0",
+            "KEY_PREFIX": alias,
+        },
+    }[CACHE_BACKEND]
+
+# Reports are dropped on every write, but with locmem only in the process that
+# wrote; other processes keep their copy until it expires. Deployments with
+# more than one process should use arquivo or redis, where a day is safe.
+RELATORIO_CACHE_TIMEOUT = config("RELATORIO_CACHE_TIMEOUT", cast=int,
+                                 default=60 if CACHE_BACKEND == "locmem" else 86400)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -97,3 +167,40 @@ MESSAGE_TAGS = {
         messages.WARNING: 'alert-warning',
         messages.ERROR: 'alert-danger',
     }
+
+# Per-request query/SQL-time instrumentation (seguros.middleware). Off by
+# default; AMOSTRAGEM is the fraction of requests measured (0.0 to 1.0).
+INSTRUMENTACAO_ATIVA = config('INSTRUMENTACAO_ATIVA', default=False, cast=bool)
+INSTRUMENTACAO_AMOSTRAGEM = config('INSTRUMENTACAO_AMOSTRAGEM', default=0.1, cast=float)
+INSTRUMENTACAO_LIMITE_REPETICOES = config('INSTRUMENTACAO_LIMITE_REPETICOES', default=5, cast=int)
+
+# Renewal queue (seguros.renovacoes): policies enter it this many days
+# before their vigência ends, when reminders are e-mailed to the segurado.
+RENOVACAO_ANTECEDENCIA = config('RENOVACAO_ANTECEDENCIA', default=30, cast=int)
+EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.console.EmailBackend')
+DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='webmaster@localhost')
+
+# Background jobs (seguros.tarefas), run by `manage.py rodar_tarefas`. TAREFAS_DIR
+# holds uploads waiting for a worker and must be shared with the workers; CSV
+# uploads larger than IMPORTACAO_SINCRONA_MAX bytes are imported in a job.
+TAREFAS_WORKERS = config('TAREFAS_WORKERS', default=2, cast=int)
+TAREFAS_INTERVALO = config('TAREFAS_INTERVALO', default=1.0, cast=float)
+TAREFAS_TEMPO_LIMITE = config('TAREFAS_TEMPO_LIMITE', default=600, cast=int)
+TAREFAS_ESPERA = config('TAREFAS_ESPERA', default=30, cast=int)
+TAREFAS_DIR = config('TAREFAS_DIR', default=str(BASE_DIR / '.tarefas'))
+IMPORTACAO_SINCRONA_MAX = config('IMPORTACAO_SINCRONA_MAX', default=1024 * 1024, cast=int)
+
+# In-process Prometheus metrics served at /metrics (seguros.metricas).
+METRICAS_ATIVAS = config('METRICAS_ATIVAS', default=True, cast=bool)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'seguros.instrumentacao': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+        'seguros.tarefas': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
@@ -0,0 +1,24 @@
+"""
+Settings for the read-replica routing tests (seguros/tests/test_replicas.py).
+
+Primary and replica are two separate SQLite databases with no replication
+between them, so a read routed to the wrong one shows up as missing data:
+
+    python manage.py test seguros.tests.test_replicas --settings=core.settings_teste_replicas
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR
+
+
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / "primario.sqlite3",
+    },
+    "replica_1": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / "replica.sqlite3",
+    },
+}
+
+DATABASE_REPLICAS = ["replica_1"]
@@ -1,7 +1,9 @@
 from django.contrib import admin
 from django.urls import path, include
+from seguros import views as seguros_views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', seguros_views.metricas, name='metrics'),
     path('', include('seguros.urls'))
 ]
@@ -0,0 +1,200 @@
+import json
+from typing import Callable, Dict, Iterable, Iterator, Optional, Sequence
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import QuerySet
+from django.http import JsonResponse, StreamingHttpResponse
+
+from .autocomplete import sugerir
+from .models import Apolice, Segurado, Veiculo
+from .pagination import paginate_by_cursor
+from .relatorios import periodo_dashboard, serie_mensal
+from .search import search_apolices, search_segurados, search_veiculos
+
+
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+class Recurso:
+    """
+    A model exposed by the JSON API.
+
+    Attributes:
+        queryset: Base queryset of the resource.
+        campos: Public field name -> ORM path, in default output order. Paths
+            may follow foreign keys, which are joined in the same query.
+        cursor_ordering: Fields, unique together, the keyset is ordered on.
+        busca: Function filtering the queryset by `?search=`, shared with
+            the HTML views.
+        chave: Lookup used by the detail endpoint.
+    """
+    def __init__(self, queryset: QuerySet, campos: Dict[str, str], cursor_ordering: Sequence[str],
+                 busca: Callable[[QuerySet, str], QuerySet], chave: str = 'pk') -> None:
+        self.queryset = queryset
+        self.campos = campos
+        self.cursor_ordering = tuple(cursor_ordering)
+        self.busca = busca
+        self.chave = chave
+
+    def selecionar(self, parametro: Optional[str]) -> Dict[str, str]:
+        """
+        Resolves `?fields=` into the {public name: ORM path} to output.
+
+        Raises:
+            ValueError: If a requested field does not exist.
+        """
+        if not parametro:
+            return self.campos
+        nomes = [nome.strip() for nome in parametro.split(',') if nome.strip()]
+        desconhecidos = [nome for nome in nomes if nome not in self.campos]
+        if desconhecidos:
+            raise ValueError(f'Campos inexistentes: {", ".join(desconhecidos)}.')
+        return {nome: self.campos[nome] for nome in nomes}
+
+
+APOLICES = Recurso(
+    Apolice.objects.all(),
+    {
+        'codigo': 'codigo',
+        'seguradora': 'seguradora',
+        'vigencia': 'vigencia',
+        'premio': 'premio',
+        'perc_comissao': 'perc_comissao',
+        'comissao': 'comissao',
+        'segurado': 'segurado_id',
+        'segurado_nome': 'segurado__nome',
+        'veiculo': 'veiculo_id',
+        'placa': 'veiculo__placa',
+    },
+    cursor_ordering=('vigencia', 'codigo'),
+    busca=search_apolices,
+    chave='codigo',
+)
+
+SEGURADOS = Recurso(
+    Segurado.objects.all(),
+    {
+        'id': 'id',
+        'nome': 'nome',
+        'nascimento': 'nascimento',
+        'telefone': 'telefone',
+        'email': 'email',
+        'cpf': 'cpf',
+        'endereco': 'endereco',
+        'estado_civil': 'estado_civil',
+    },
+    cursor_ordering=('nome', 'id'),
+    busca=search_segurados,
+)
+
+VEICULOS = Recurso(
+    Veiculo.objects.all(),
+    {
+        'id': 'id',
+        'modelo': 'modelo',
+        'placa': 'placa',
+        'chassi': 'chassi',
+        'ano_modelo': 'ano_modelo',
+        'alienado': 'alienado',
+    },
+    cursor_ordering=('id',),
+    busca=search_veiculos,
+)
+
+
+def _erro(mensagem: str, status: int = 400) -> JsonResponse:
+    return JsonResponse({'erro': mensagem}, status=status)
+
+
+def _renomear(linha: dict, campos: Dict[str, str]) -> dict:
+    return {nome: linha[caminho] for nome, caminho in campos.items()}
+
+
+def _pagina_json(linhas: Iterable[dict], proxima: Optional[str],
+                 anterior: Optional[str]) -> Iterator[str]:
+    """
+    Encodes a page one row at a time, so the response is never held in
+    memory as a whole document.
+    """
+    yield '{"results": ['
+    for i, linha in enumerate(linhas):
+        yield (',' if i else '') + json.dumps(linha, cls=DjangoJSONEncoder, ensure_ascii=False)
+    yield f'], "next": {json.dumps(proxima)}, "previous": {json.dumps(anterior)}}}'
+
+
+def _url_cursor(request, token: Optional[str]) -> Optional[str]:
+    if token is None:
+        return None
+    params = request.GET.copy()
+    params['cursor'] = token
+    return request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+
+
+def listar(request, recurso: Recurso):
+    """
+    Page of `recurso` as JSON, in keyset order.
+
+    Querystring: `fields` (comma-separated), `search`, `cursor` (from the
+    `next`/`previous` URLs) and `limit` (up to MAX_PAGE_SIZE). Each page is a
+    single query through `values()`, so no model instances are built.
+    """
+    try:
+        campos = recurso.selecionar(request.GET.get('fields'))
+        limite = min(int(request.GET.get('limit', PAGE_SIZE)), MAX_PAGE_SIZE)
+        if limite < 1:
+            raise ValueError('limit deve ser positivo.')
+    except ValueError as e:
+        return _erro(str(e))
+
+    queryset = recurso.queryset
+    if termo := request.GET.get('search'):
+        queryset = recurso.busca(queryset, termo)
+    caminhos = {*campos.values(), *recurso.cursor_ordering}
+    try:
+        pagina = paginate_by_cursor(queryset.values(*caminhos), recurso.cursor_ordering, limite,
+                                    request.GET.get('cursor'))
+    except ValueError as e:
+        return _erro(str(e))
+
+    return StreamingHttpResponse(
+        _pagina_json(
+            (_renomear(linha, campos) for linha in pagina.object_list),
+            _url_cursor(request, pagina.next_cursor),
+            _url_cursor(request, pagina.previous_cursor),
+        ),
+        content_type='application/json',
+    )
+
+
+def detalhar(request, recurso: Recurso, pk):
+    try:
+        campos = recurso.selecionar(request.GET.get('fields'))
+    except ValueError as e:
+        return _erro(str(e))
+
+    linha = recurso.queryset.filter(**{recurso.chave: pk}).values(*set(campos.values())).first()
+    if linha is None:
+        return _erro('Não encontrado.', status=404)
+    return JsonResponse(_renomear(linha, campos), json_dumps_params={'ensure_ascii': False})
+
+
+def autocompletar(request):
+    """
+    Suggestions for the search box: segurados, apólice codes and plates
+    starting with `?q=`. See seguros.autocomplete.sugerir.
+    """
+    return JsonResponse(sugerir(request.GET.get('q', '')), json_dumps_params={'ensure_ascii': False})
+
+
+def dashboard(request):
+    """
+    Monthly series of the commission dashboard, from `?de=` to `?ate=`
+    (AAAA-MM), as the compact arrays of seguros.relatorios.serie_mensal.
+    """
+    try:
+        inicio, fim = periodo_dashboard(request.GET.get('de'), request.GET.get('ate'))
+        serie = serie_mensal(inicio, fim)
+    except ValueError as e:
+        return _erro(str(e))
+    return JsonResponse(serie, json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')})
@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class SegurosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'seguros'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .metricas import contar_conexao
+        from .search import register_sqlite_functions
+        connection_created.connect(register_sqlite_functions)
+        connection_created.connect(contar_conexao)
@@ -0,0 +1,132 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.db.models.functions import Upper
+
+from .models import Apolice, Segurado, Veiculo, normalizar_identificacao
+from .search import OrdemBinaria, normalize, searchable
+
+
+LIMITE = 8
+TAMANHO_MINIMO = 2
+LRU_TAMANHO = 2048
+LRU_TTL = 30
+
+
+class CacheLRU:
+    """
+    Small thread-safe LRU with expiry, for per-process hot lookups.
+
+    Entries live at most `ttl` seconds, which bounds how stale a suggestion
+    can be without any invalidation traffic.
+    """
+    def __init__(self, tamanho: int = LRU_TAMANHO, ttl: float = LRU_TTL) -> None:
+        self.tamanho = tamanho
+        self.ttl = ttl
+        self._itens: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave) -> Optional[Any]:
+        item = self.obter_com_validade(chave)
+        return None if item is None else item[0]
+
+    def obter_com_validade(self, chave) -> Optional[Tuple[Any, float]]:
+        """
+        Returns the value and its `time.monotonic()` expiry, or None.
+        """
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                return None
+            if item[1] < time.monotonic():
+                del self._itens[chave]
+                return None
+            self._itens.move_to_end(chave)
+            return item
+
+    def guardar(self, chave, valor, expira_em: Optional[float] = None) -> None:
+        """
+        Stores `valor` for `ttl` seconds, or until `expira_em` when it was
+        derived from another entry and must not outlive it.
+        """
+        if expira_em is None:
+            expira_em = time.monotonic() + self.ttl
+        with self._lock:
+            self._itens[chave] = (valor, expira_em)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.tamanho:
+                self._itens.popitem(last=False)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._itens.clear()
+
+
+lru = CacheLRU()
+
+
+def _consultar(termo: str, limite: int) -> Dict[str, List[dict]]:
+    # Each lookup is a range scan on a prefix index from migration 0016,
+    # ordered like the index (byte order) so LIMIT stops after `limite` rows.
+    nome = normalize(termo)
+    codigo = termo.upper()
+    # Plates are stored by normalizar_identificacao, so "ABC-1" finds ABC1...
+    placa = normalizar_identificacao(termo)
+    segurados = Segurado.objects.annotate(nome_busca=searchable('nome')).filter(
+        nome_busca__startswith=nome
+    ).order_by(OrdemBinaria('nome_busca'), 'id').values('id', 'nome')[:limite]
+    apolices = Apolice.objects.annotate(codigo_busca=Upper('codigo')).filter(
+        codigo_busca__startswith=codigo
+    ).order_by(OrdemBinaria('codigo_busca')).values('codigo')[:limite]
+    placas = Veiculo.objects.filter(placa__startswith=placa).order_by(
+        OrdemBinaria('placa'), 'id'
+    ).values('id', 'placa')[:limite]
+    return {
+        'segurados': list(segurados),
+        'apolices': list(apolices),
+        'placas': list(placas),
+    }
+
+
+def _refinar(resultado: Dict[str, List[dict]], termo: str) -> Dict[str, List[dict]]:
+    nome = normalize(termo)
+    codigo = termo.upper()
+    placa = normalizar_identificacao(termo)
+    return {
+        'segurados': [s for s in resultado['segurados'] if normalize(s['nome']).startswith(nome)],
+        'apolices': [a for a in resultado['apolices'] if a['codigo'].upper().startswith(codigo)],
+        'placas': [p for p in resultado['placas'] if p['placa'].startswith(placa)],
+    }
+
+
+def sugerir(termo: str, limite: int = LIMITE) -> Dict[str, List[dict]]:
+    """
+    Client names, policy codes and plates starting with `termo`, up to
+    `limite` of each, accent- and case-insensitive.
+
+    Answers come from the LRU when the prefix is hot. A longer prefix is
+    also answered from a cached shorter one whose lists were not truncated,
+    since its matches are a subset, so typing a word costs about one query.
+    """
+    termo = termo.strip()
+    if len(termo) < TAMANHO_MINIMO:
+        return {'segurados': [], 'apolices': [], 'placas': []}
+
+    chave = (termo.lower(), limite)
+    if (resultado := lru.obter(chave)) is not None:
+        return resultado
+
+    expira_em = None
+    for tamanho in range(len(chave[0]) - 1, TAMANHO_MINIMO - 1, -1):
+        item = lru.obter_com_validade((chave[0][:tamanho], limite))
+        if item is not None and all(len(lista) < limite for lista in item[0].values()):
+            # A refinement is only as fresh as the result it was cut from.
+            anterior, expira_em = item
+            resultado = _refinar(anterior, termo)
+            break
+    else:
+        resultado = _consultar(termo, limite)
+    lru.guardar(chave, resultado, expira_em)
+    return resultado
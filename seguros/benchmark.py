@@ -0,0 +1,70 @@
+import statistics
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+from django.db import connection
+
+
+def percentil(amostras: List[float], p: int) -> float:
+    """
+    Returns the p-th percentile (1-99) of `amostras`.
+    """
+    if len(amostras) == 1:
+        return amostras[0]
+    return statistics.quantiles(amostras, n=100, method='inclusive')[p - 1]
+
+
+def medir(nome: str, executar: Callable[[], object], repeticoes: int = 20,
+          aquecimento: int = 2) -> Dict[str, float]:
+    """
+    Runs `executar` repeatedly and reports latency percentiles in milliseconds,
+    queries per call and peak traced memory in KiB.
+
+    Memory is traced in a separate pass so tracemalloc's overhead does not
+    distort the timings.
+    """
+    for _ in range(aquecimento):
+        executar()
+
+    tempos = []
+    queries = 0
+
+    def contar(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    # execute_wrapper instead of connection.queries, which every request resets.
+    with connection.execute_wrapper(contar):
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            executar()
+            tempos.append((time.perf_counter() - inicio) * 1000)
+
+    tracemalloc.start()
+    executar()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'nome': nome,
+        'repeticoes': repeticoes,
+        'p50_ms': round(percentil(tempos, 50), 2),
+        'p95_ms': round(percentil(tempos, 95), 2),
+        'p99_ms': round(percentil(tempos, 99), 2),
+        'queries': queries / repeticoes,
+        'memoria_kib': round(pico / 1024, 1),
+    }
+
+
+def formatar(resultados: List[Dict[str, float]]) -> str:
+    """
+    Renders benchmark results as an aligned text table.
+    """
+    colunas = ('nome', 'p50_ms', 'p95_ms', 'p99_ms', 'queries', 'memoria_kib')
+    linhas = [colunas] + [tuple(str(r[c]) for c in colunas) for r in resultados]
+    larguras = [max(len(linha[i]) for linha in linhas) for i in range(len(colunas))]
+    return '\n'.join(
+        '  '.join(valor.ljust(larguras[i]) for i, valor in enumerate(linha)) for linha in linhas
+    )
@@ -0,0 +1,122 @@
+from datetime import date
+from typing import Iterable, Tuple
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.utils import make_template_fragment_key
+from django.db import transaction
+from django.db.models import F, Sum
+
+from .models import SEGURADORAS, Apolice, ComissaoMensal, Segurado
+
+
+# Row fragments of index.html and relatorio.html, cached per (codigo, versao)
+# in the "fragmentos" cache by their {% cache %} tags.
+FRAGMENTOS_CACHE = 'fragmentos'
+FRAGMENTOS_LINHA = ('celulas_apolice', 'linha_relatorio')
+
+# Placeholder left by `invalidar_relatorios` while replicas may still serve
+# the old data; `cache.add` will not overwrite it until it expires.
+INVALIDADO = 'invalidado'
+
+
+def invalidar_linhas(**filtros) -> int:
+    """
+    Bumps the version of the Apolice rows matching `filtros`, so their cached
+    table rows are rendered again on the next request.
+
+    Returns:
+        Number of policies invalidated.
+    """
+    return Apolice.objects.filter(**filtros).update(versao=F('versao') + 1)
+
+
+def invalidar_segurados(ids: Iterable[int]) -> int:
+    """
+    Bumps the version of the segurados whose detail page lists a policy that
+    was added, changed or removed.
+
+    Returns:
+        Number of segurados invalidated.
+    """
+    return Segurado.objects.filter(pk__in=set(ids)).update(versao=F('versao') + 1)
+
+
+def descartar_linhas(codigo: str, versao: int) -> None:
+    """
+    Drops the cached rows of a deleted Apolice, so a new policy reusing its
+    codigo does not start at a version that is already cached.
+    """
+    caches[FRAGMENTOS_CACHE].delete_many([
+        make_template_fragment_key(fragmento, [codigo, versao]) for fragmento in FRAGMENTOS_LINHA
+    ])
+
+
+def chave_relatorio(ano: int, mes: int) -> str:
+    return f'relatorio:{ano}:{mes:02d}'
+
+
+def relatorio_mensal(ano: int, mes: int) -> dict:
+    """
+    Rows of the policies with vigência in the month, as the values the
+    report table shows, and their total commission, from the default cache
+    when present.
+
+    Rows are plain dicts read with one joined `values()` query, so entries
+    stay small and do not pickle model instances. Entries are dropped by
+    `invalidar_relatorios` whenever a policy of the month changes, so they
+    can be kept for `RELATORIO_CACHE_TIMEOUT` seconds.
+
+    Returns:
+        {'apolices': [{'codigo', 'versao', 'seguradora', 'vigencia',
+        'comissao', 'segurado_id', 'segurado_nome', 'segurado_telefone',
+        'veiculo_modelo', 'veiculo_placa'}, ...], 'soma': Decimal or None}
+    """
+    chave = chave_relatorio(ano, mes)
+    dados = cache.get(chave)
+    if dados is not None and dados != INVALIDADO:
+        return dados
+
+    inicio = date(ano, mes, 1)
+    fim = date(ano + mes // 12, mes % 12 + 1, 1)
+    seguradoras = dict(SEGURADORAS)
+    apolices = list(
+        Apolice.objects.filter(vigencia__gte=inicio, vigencia__lt=fim).order_by('vigencia').values(
+            'codigo', 'versao', 'seguradora', 'vigencia', 'comissao', 'segurado_id',
+            segurado_nome=F('segurado__nome'), segurado_telefone=F('segurado__telefone'),
+            veiculo_modelo=F('veiculo__modelo'), veiculo_placa=F('veiculo__placa'),
+        )
+    )
+    for apolice in apolices:
+        apolice['seguradora'] = seguradoras.get(apolice['seguradora'], apolice['seguradora'])
+    dados = {
+        'apolices': apolices,
+        'soma': ComissaoMensal.objects.filter(ano=ano, mes=mes).aggregate(
+            soma_com=Sum('total_comissao'))['soma_com'],
+    }
+    cache.add(chave, dados, getattr(settings, 'RELATORIO_CACHE_TIMEOUT', 86400))
+    return dados
+
+
+def invalidar_relatorios(meses: Iterable[Tuple[int, int]]) -> None:
+    """
+    Drops the cached reports of the given (ano, mes) pairs, now and again
+    when the current transaction commits, so a report read while the write
+    was uncommitted is not kept.
+
+    With read replicas the entries are replaced by a placeholder that lives
+    for `REPLICA_ATRASO_MAXIMO` seconds instead, so a replica that has not
+    caught up cannot cache the old month again.
+    """
+    chaves = [chave_relatorio(ano, mes) for ano, mes in set(meses)]
+    if not chaves:
+        return
+
+    def invalidar():
+        if getattr(settings, 'DATABASE_REPLICAS', None):
+            cache.set_many(dict.fromkeys(chaves, INVALIDADO), settings.REPLICA_ATRASO_MAXIMO)
+        else:
+            cache.delete_many(chaves)
+
+    invalidar()
+    transaction.on_commit(invalidar)
@@ -0,0 +1,132 @@
+import random
+import string
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Callable, List, Optional
+
+from django.db import transaction
+
+from . import ledger
+from .models import ESTADO_CIVIL, SEGURADORAS, Apolice, Segurado, Veiculo, calcular_comissao
+
+
+BATCH_SIZE = 5000
+
+# Approximate market share of each seguradora and civil status mix.
+PESOS_SEGURADORAS = {'PS': 25, 'BR': 20, 'AZ': 15, 'MA': 10, 'SA': 10, 'TM': 10, 'AL': 10}
+PESOS_ESTADO_CIVIL = {'SL': 35, 'CS': 40, 'DV': 10, 'UE': 10, 'NI': 5}
+
+NOMES = (
+    'Ana', 'João', 'Maria', 'José', 'Antônio', 'Francisca', 'Carlos', 'Paulo', 'Lúcia',
+    'Pedro', 'Márcia', 'Luís', 'Fernanda', 'Gabriel', 'Juliana', 'Rafael', 'Letícia', 'Sérgio',
+)
+SOBRENOMES = (
+    'Silva', 'Santos', 'Oliveira', 'Souza', 'Rodrigues', 'Ferreira', 'Alves', 'Pereira',
+    'Lima', 'Gomes', 'Costa', 'Ribeiro', 'Martins', 'Carvalho', 'Araújo', 'Conceição',
+)
+MODELOS = ('Gol', 'Onix', 'HB20', 'Corolla', 'Civic', 'Compass', 'Strada', 'Kwid', 'T-Cross', 'Hilux')
+RUAS = ('Rua das Flores', 'Av. Brasil', 'Rua XV de Novembro', 'Av. Paulista', 'Rua da Praia')
+
+POLICIES_PER_SEGURADO = 1.3
+
+
+def _cpf(rng: random.Random) -> str:
+    digitos = [rng.randint(0, 9) for _ in range(9)]
+    for tamanho in (9, 10):
+        soma = sum(d * (tamanho + 1 - i) for i, d in enumerate(digitos[:tamanho]))
+        digitos.append((soma * 10 % 11) % 10)
+    return ''.join(map(str, digitos))
+
+
+def _placa(rng: random.Random) -> str:
+    letras = rng.choices(string.ascii_uppercase, k=4)
+    numeros = rng.choices(string.digits, k=3)
+    return f'{letras[0]}{letras[1]}{letras[2]}{numeros[0]}{letras[3]}{numeros[1]}{numeros[2]}'
+
+
+def _escolher(rng: random.Random, pesos: dict, k: int) -> List[str]:
+    return rng.choices(list(pesos), weights=list(pesos.values()), k=k)
+
+
+def gerar_segurados(rng: random.Random, quantidade: int) -> List[Segurado]:
+    estados = _escolher(rng, PESOS_ESTADO_CIVIL, quantidade)
+    return [
+        Segurado(
+            nome=f'{rng.choice(NOMES)} {rng.choice(SOBRENOMES)} {rng.choice(SOBRENOMES)}'[:50],
+            nascimento=date(1950, 1, 1) + timedelta(days=rng.randint(0, 365 * 55)),
+            telefone=f'119{rng.randint(10000000, 99999999)}',
+            email=None if rng.random() < 0.2 else f'cliente{rng.randint(0, 10**9)}@exemplo.com.br',
+            cpf=_cpf(rng),
+            endereco=f'{rng.choice(RUAS)}, {rng.randint(1, 3000)}',
+            estado_civil=estado,
+        )
+        for estado in estados
+    ]
+
+
+def gerar_apolices(rng: random.Random, quantidade: int, segurado_ids: List[int],
+                   inicio: date, dias: int, sequencia: int) -> List[tuple]:
+    seguradoras = _escolher(rng, PESOS_SEGURADORAS, quantidade)
+    linhas = []
+    for i, seguradora in enumerate(seguradoras, start=sequencia):
+        veiculo = Veiculo(
+            modelo=rng.choice(MODELOS),
+            placa=_placa(rng),
+            chassi=''.join(rng.choices(string.ascii_uppercase + string.digits, k=17)),
+            ano_modelo=rng.randint(2005, 2024),
+            alienado=rng.random() < 0.3,
+        )
+        premio = Decimal(rng.lognormvariate(7.6, 0.5)).quantize(Decimal('0.01'))
+        premio = min(premio, Decimal('999999.99'))
+        perc = rng.randint(5, 25)
+        apolice = Apolice(
+            segurado_id=rng.choice(segurado_ids),
+            codigo=f'{seguradora}{i:012d}',
+            seguradora=seguradora,
+            vigencia=inicio + timedelta(days=rng.randrange(dias)),
+            premio=premio,
+            perc_comissao=perc,
+            comissao=calcular_comissao(premio, perc),
+        )
+        linhas.append((veiculo, apolice))
+    return linhas
+
+
+def gerar_dados(apolices: int, seed: int = 0, anos: int = 4, batch_size: int = BATCH_SIZE,
+                progresso: Optional[Callable[[int], None]] = None) -> int:
+    """
+    Inserts `apolices` synthetic policies, their vehicles and about
+    `apolices / 1.3` segurados, with vigência spread over the last `anos - 1`
+    years and the next one.
+
+    Writes happen in `bulk_create` batches; the commission ledger is rebuilt
+    once at the end.
+
+    Returns:
+        Number of segurados created.
+    """
+    rng = random.Random(seed)
+    hoje = date.today()
+    inicio = date(hoje.year - anos + 1, 1, 1)
+    dias = (date(hoje.year + 1, 1, 1) - inicio).days
+    sequencia = Apolice.objects.count()
+
+    total_segurados = max(1, int(apolices / POLICIES_PER_SEGURADO))
+    segurado_ids: List[int] = []
+    for feitos in range(0, total_segurados, batch_size):
+        lote = gerar_segurados(rng, min(batch_size, total_segurados - feitos))
+        segurado_ids.extend(s.pk for s in Segurado.objects.bulk_create(lote))
+
+    for feitos in range(0, apolices, batch_size):
+        linhas = gerar_apolices(rng, min(batch_size, apolices - feitos), segurado_ids,
+                                inicio, dias, sequencia + feitos)
+        with transaction.atomic():
+            Veiculo.objects.bulk_create([veiculo for veiculo, _ in linhas])
+            for veiculo, apolice in linhas:
+                apolice.veiculo = veiculo
+            Apolice.objects.bulk_create([apolice for _, apolice in linhas])
+        if progresso is not None:
+            progresso(feitos + len(linhas))
+
+    ledger.rebuild()
+    return total_segurados
@@ -0,0 +1,104 @@
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Min, Value, When
+from django.db.models.functions import Replace, Upper
+
+from .cache import invalidar_relatorios, invalidar_segurados
+from .models import Apolice, Veiculo
+
+
+BATCH_SIZE = 1000
+
+
+def normalizado(campo: str):
+    """
+    Database counterpart of `models.normalizar_identificacao`.
+    """
+    return Upper(Replace(Replace(campo, Value('-'), Value('')), Value(' '), Value('')))
+
+
+def normalizar_veiculos(batch_size: int = BATCH_SIZE) -> int:
+    """
+    Rewrites placa and chassi of every vehicle in canonical form, one UPDATE
+    per range of `batch_size` ids.
+
+    Returns:
+        Number of vehicles changed.
+    """
+    alterados = 0
+    maior = Veiculo.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    for inicio in range(0, maior + 1, batch_size):
+        alterados += Veiculo.objects.filter(id__gte=inicio, id__lt=inicio + batch_size).exclude(
+            placa=normalizado('placa'), chassi=normalizado('chassi')
+        ).update(placa=normalizado('placa'), chassi=normalizado('chassi'))
+    return alterados
+
+
+def _mesclar_lote(mescla: Dict[int, List[int]]) -> None:
+    duplicados = [id_ for ids in mescla.values() for id_ in ids]
+    destino = Case(
+        *(When(veiculo_id=id_, then=Value(manter)) for manter, ids in mescla.items() for id_ in ids),
+        output_field=IntegerField(),
+    )
+    apolices = Apolice.objects.filter(veiculo_id__in=duplicados)
+    segurados = set(apolices.values_list('segurado_id', flat=True))
+    meses = {(mes.year, mes.month) for mes in apolices.dates('vigencia', 'month')}
+
+    # One UPDATE repoints the policies and bumps their cached rows, since
+    # the surviving vehicle's modelo may differ from the duplicate's.
+    apolices.update(veiculo=destino, versao=F('versao') + 1)
+    Veiculo.objects.filter(id__in=duplicados).delete()
+    invalidar_segurados(segurados)
+    invalidar_relatorios(meses)
+
+
+def mesclar_duplicados(batch_size: int = BATCH_SIZE,
+                       progresso: Optional[Callable[[int], None]] = None) -> int:
+    """
+    Merges vehicles with the same placa and chassi, ignoring case and
+    separators, into the oldest of them, then rewrites the remaining ones in
+    canonical form.
+
+    Each batch of `batch_size` duplicate groups is merged in its own
+    transaction: its policies are moved to the surviving vehicle and the other
+    copies deleted.
+
+    Args:
+        batch_size: Duplicate groups per transaction.
+        progresso: Optional callable receiving the running count of
+            vehicles removed after each batch.
+
+    Returns:
+        Number of duplicate vehicles removed.
+    """
+    normalizados = Veiculo.objects.annotate(
+        placa_normalizada=normalizado('placa'), chassi_normalizado=normalizado('chassi')
+    )
+    grupos = normalizados.values('placa_normalizada', 'chassi_normalizado').annotate(
+        manter=Min('id'), total=Count('id')
+    ).filter(total__gt=1).order_by('manter')
+
+    removidos = 0
+    while lote := list(grupos[:batch_size]):
+        manter = {(g['placa_normalizada'], g['chassi_normalizado']): g['manter'] for g in lote}
+        mescla = defaultdict(list)
+        veiculos = normalizados.filter(
+            placa_normalizada__in={placa for placa, _ in manter}
+        ).values_list('id', 'placa_normalizada', 'chassi_normalizado')
+        for id_, placa, chassi in veiculos:
+            destino = manter.get((placa, chassi))
+            if destino is not None and id_ != destino:
+                mescla[destino].append(id_)
+
+        with transaction.atomic():
+            _mesclar_lote(mescla)
+        removidos += sum(len(ids) for ids in mescla.values())
+        if progresso is not None:
+            progresso(removidos)
+
+    # Only now: while duplicates remain, canonical values would collide on
+    # the unique constraint.
+    normalizar_veiculos(batch_size)
+    return removidos
@@ -0,0 +1,85 @@
+from decimal import Decimal
+from typing import Iterable, List, Tuple
+
+from django.db import transaction
+from django.db.models import DecimalField, F, QuerySet, Value
+
+from . import ledger
+from .cache import descartar_linhas, invalidar_relatorios, invalidar_segurados
+from .models import Apolice, Segurado
+from .signals import ledger_em_lote
+
+
+def _bloquear(codigos: Iterable[str]) -> Tuple[QuerySet, List[tuple]]:
+    # Locks the selected rows until the transaction ends, so the ledger
+    # deltas read around the UPDATE/DELETE match what it changes.
+    linhas = list(
+        Apolice.objects.select_for_update().filter(codigo__in=set(codigos))
+        .values_list('codigo', 'versao', 'segurado_id')
+    )
+    return Apolice.objects.filter(codigo__in=[codigo for codigo, _, _ in linhas]), linhas
+
+
+def excluir(codigos: Iterable[str]) -> int:
+    """
+    Deletes the given policies, taking them out of the ledger with one
+    aggregate query in the same transaction. Dependent rows, such as their
+    renewal queue entries, go through Django's usual cascade.
+
+    Returns:
+        Number of policies deleted.
+    """
+    with transaction.atomic():
+        apolices, linhas = _bloquear(codigos)
+        if not linhas:
+            return 0
+        ledger.apply_queryset(apolices, sign=-1)
+        with ledger_em_lote():
+            _, excluidas = apolices.delete()
+        invalidar_segurados(segurado for _, _, segurado in linhas)
+    for codigo, versao, _ in linhas:
+        descartar_linhas(codigo, versao)
+    return excluidas.get(Apolice._meta.label, 0)
+
+
+def reatribuir(codigos: Iterable[str], segurado: Segurado) -> int:
+    """
+    Moves the given policies to `segurado` with a single UPDATE. The ledger
+    is not keyed by segurado, so only cached rows and reports are dropped.
+
+    Returns:
+        Number of policies moved.
+    """
+    with transaction.atomic():
+        apolices, linhas = _bloquear(codigos)
+        meses = {(mes.year, mes.month) for mes in apolices.dates('vigencia', 'month')}
+        alteradas = apolices.update(segurado=segurado, versao=F('versao') + 1)
+        invalidar_segurados({segurado.pk, *(anterior for _, _, anterior in linhas)})
+        invalidar_relatorios(meses)
+    return alteradas
+
+
+def atualizar_comissao(codigos: Iterable[str], perc_comissao: int) -> int:
+    """
+    Sets perc_comissao of the given policies and recomputes their comissao
+    with a single UPDATE, moving their contribution in the ledger from the
+    old rate to the new one.
+
+    Returns:
+        Number of policies updated.
+    """
+    with transaction.atomic():
+        apolices, linhas = _bloquear(codigos)
+        ledger.apply_queryset(apolices, sign=-1)
+        # Same result as the apolice_comissao_trg trigger (migration 0005).
+        # The rate goes in as a decimal: SQLite stores prêmios without cents
+        # as integers, and `premio * 15 / 100` would then divide as integers.
+        taxa = Value(Decimal(perc_comissao) / 100, output_field=DecimalField(max_digits=5, decimal_places=2))
+        alteradas = apolices.update(
+            perc_comissao=perc_comissao,
+            comissao=F('premio') * taxa,
+            versao=F('versao') + 1,
+        )
+        ledger.apply_queryset(apolices)
+        invalidar_segurados(segurado for _, _, segurado in linhas)
+    return alteradas
@@ -0,0 +1,124 @@
+import asyncio
+import csv
+import queue
+import threading
+from typing import Iterable, Iterator, Optional
+
+from django.db import connections
+from django.db.models import QuerySet
+
+from .models import SEGURADORAS
+
+
+CHUNK_SIZE = 2000
+
+COLUNAS = (
+    ('Nome', 'segurado__nome'),
+    ('Telefone', 'segurado__telefone'),
+    ('Veículo', 'veiculo__modelo'),
+    ('Placa', 'veiculo__placa'),
+    ('Apólice', 'codigo'),
+    ('Seguradora', 'seguradora'),
+    ('Vigência', 'vigencia'),
+    ('Prêmio', 'premio'),
+    ('Comissão', 'comissao'),
+)
+
+
+class Echo:
+    """
+    File-like object whose `write` returns the value instead of buffering it,
+    so `csv.writer` can feed a StreamingHttpResponse one row at a time.
+    """
+    def write(self, value: str) -> str:
+        return value
+
+
+def apolice_rows(queryset: QuerySet) -> Iterator[tuple]:
+    """
+    Yields the report columns of each Apolice as plain tuples.
+
+    Uses `values_list` so no model instances are built, and `iterator()` so
+    Postgres streams rows through a server-side cursor `CHUNK_SIZE` at a time
+    instead of loading the whole result set.
+    """
+    seguradoras = dict(SEGURADORAS)
+    campos = [campo for _, campo in COLUNAS]
+    indice_seguradora = campos.index('seguradora')
+    for row in queryset.values_list(*campos).iterator(chunk_size=CHUNK_SIZE):
+        row = list(row)
+        row[indice_seguradora] = seguradoras.get(row[indice_seguradora], row[indice_seguradora])
+        yield row
+
+
+def stream_csv(rows: Iterable[Iterable], titulos: Optional[Iterable[str]] = None) -> Iterator[str]:
+    """
+    Encodes `rows` as CSV lines, header first, in the layout Excel pt-BR opens
+    directly (BOM, `;` separator). The header defaults to the policy columns.
+    """
+    writer = csv.writer(Echo(), delimiter=';')
+    if titulos is None:
+        titulos = [titulo for titulo, _ in COLUNAS]
+    yield '﻿' + writer.writerow(titulos)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+_FIM = object()
+
+
+def fora_do_loop(linhas: Iterable[str], lote: int = CHUNK_SIZE) -> Iterator[str]:
+    """
+    Yields `linhas`, producing them in a thread of their own when consumed
+    from an event loop.
+
+    Under ASGI, Django 4.0 iterates a StreamingHttpResponse inside the event
+    loop, where the lazy queries of `apolice_rows` would raise
+    SynchronousOnlyOperation. The thread runs them on its own connection,
+    closed when it finishes, and hands over `lote` lines at a time through a
+    bounded queue. Under WSGI `linhas` is consumed directly.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        yield from linhas
+        return
+
+    fila: queue.Queue = queue.Queue(maxsize=2)
+    parar = threading.Event()
+
+    def entregar(item) -> bool:
+        # Gives up when the download was abandoned and nobody reads anymore.
+        while not parar.is_set():
+            try:
+                fila.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produzir():
+        try:
+            bloco = []
+            for linha in linhas:
+                bloco.append(linha)
+                if len(bloco) >= lote:
+                    if not entregar(''.join(bloco)):
+                        return
+                    bloco = []
+            if bloco and not entregar(''.join(bloco)):
+                return
+            entregar(_FIM)
+        except Exception as erro:
+            entregar(erro)
+        finally:
+            connections.close_all()
+
+    threading.Thread(target=produzir, daemon=True).start()
+    try:
+        while (item := fila.get()) is not _FIM:
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        parar.set()
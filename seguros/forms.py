@@ -1,4 +1,4 @@
-from .models import Apolice, Segurado, Veiculo
+from .models import Apolice, Segurado, Veiculo, normalizar_identificacao
 from django import forms
 
 
@@ -15,8 +15,128 @@ class ApoliceForm(forms.ModelForm):
     
 
 class VeiculoForm(forms.ModelForm):
+    """
+    Vehicle part of the policy forms. Vehicles are identified by placa and
+    chassi and shared by every policy on them.
+
+    Args:
+        apolice: Policy being edited, so its own link to the vehicle does
+            not count as sharing it.
+    """
+    ATRIBUTOS = ('modelo', 'ano_modelo', 'alienado')
+
     class Meta:
         model = Veiculo 
         fields = ('modelo', 'placa', 'chassi', 'ano_modelo', 'alienado')
 
-    
+    def __init__(self, *args, apolice=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.apolice = apolice
+        self.divergentes = []
+
+    def clean_placa(self):
+        return normalizar_identificacao(self.cleaned_data['placa'])
+
+    def clean_chassi(self):
+        return normalizar_identificacao(self.cleaned_data['chassi'])
+
+    def clean(self):
+        dados = super().clean()
+        if (self.instance.pk is not None and not self.identificacao_alterada()
+                and any(campo in self.changed_data for campo in self.ATRIBUTOS)
+                and self.compartilhado()):
+            raise forms.ValidationError(
+                'Este veículo também está em outras apólices: seus dados não podem ser '
+                'alterados por esta. Informe outra placa/chassi para trocar de veículo.'
+            )
+        return dados
+
+    def identificacao_alterada(self) -> bool:
+        """
+        Whether placa or chassi differ from the vehicle being edited.
+        """
+        if self.instance.pk is None:
+            return True
+        return (self.cleaned_data.get('placa'), self.cleaned_data.get('chassi')) != (
+            normalizar_identificacao(self.initial['placa']),
+            normalizar_identificacao(self.initial['chassi']),
+        )
+
+    def compartilhado(self) -> bool:
+        """
+        Whether policies other than `apolice` use the vehicle being edited.
+        """
+        outras = Apolice.objects.filter(veiculo_id=self.instance.pk)
+        if self.apolice is not None:
+            outras = outras.exclude(pk=self.apolice.pk)
+        return outras.exists()
+
+    def validate_unique(self):
+        # A placa and chassi that are already registered are not an error:
+        # `salvar` switches to the registered vehicle.
+        if self.instance.pk is not None and not self.identificacao_alterada():
+            super().validate_unique()
+
+    def salvar(self) -> Veiculo:
+        """
+        Saves the vehicle and returns the one the policy should point to.
+
+        The edited vehicle is updated in place unless its placa/chassi
+        changed and either they belong to another registered vehicle or
+        other policies still use it. In those cases, and for new vehicles,
+        the vehicle is looked up by placa and chassi and created if missing.
+        A registered vehicle keeps its data; the fields that differ from the
+        form are left in `divergentes`.
+
+        Call inside a transaction: a concurrent insert of the same vehicle is
+        resolved by `get_or_create` through the unique constraint.
+        """
+        dados = self.cleaned_data
+        if self.instance.pk is not None:
+            if not self.identificacao_alterada():
+                return self.save()
+            registrado = Veiculo.objects.filter(placa=dados['placa'], chassi=dados['chassi']).exists()
+            if not registrado and not self.compartilhado():
+                return self.save()
+        veiculo, criado = Veiculo.objects.get_or_create(
+            placa=dados['placa'], chassi=dados['chassi'],
+            defaults={campo: dados[campo] for campo in self.ATRIBUTOS},
+        )
+        if not criado:
+            self.divergentes = [
+                self.fields[campo].label for campo in self.ATRIBUTOS
+                if getattr(veiculo, campo) != dados[campo]
+            ]
+        return veiculo
+
+
+class ImportacaoForm(forms.Form):
+    arquivo = forms.FileField(label='Arquivo CSV')
+    delimitador = forms.ChoiceField(choices=[(';', ';'), (',', ',')], initial=';')
+
+
+class AcaoEmMassaForm(forms.Form):
+    EXCLUIR = 'excluir'
+    REATRIBUIR = 'reatribuir'
+    COMISSAO = 'comissao'
+
+    acao = forms.ChoiceField(label='Ação', choices=[
+        (EXCLUIR, 'Excluir'),
+        (REATRIBUIR, 'Transferir para o segurado'),
+        (COMISSAO, 'Alterar % de comissão'),
+    ])
+    codigos = forms.Field(widget=forms.MultipleHiddenInput,
+                          error_messages={'required': 'Selecione ao menos uma apólice.'})
+    segurado = forms.ModelChoiceField(label='Segurado (id)', queryset=Segurado.objects.all(),
+                                      required=False, widget=forms.NumberInput)
+    perc_comissao = forms.IntegerField(label='Percentual Comissão', required=False,
+                                       min_value=0, max_value=50)
+
+    def clean(self):
+        dados = super().clean()
+        acao = dados.get('acao')
+        if acao == self.REATRIBUIR and not dados.get('segurado'):
+            self.add_error('segurado', 'Informe o segurado que receberá as apólices.')
+        if acao == self.COMISSAO and dados.get('perc_comissao') is None:
+            self.add_error('perc_comissao', 'Informe o novo percentual de comissão.')
+        return dados
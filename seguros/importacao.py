@@ -0,0 +1,160 @@
+import csv
+import time
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from django.db import transaction
+
+from . import ledger
+from .cache import invalidar_segurados
+from .forms import ApoliceForm, SeguradoForm, VeiculoForm
+from .models import Apolice, Segurado, Veiculo, calcular_comissao
+
+
+BATCH_SIZE = 1000
+
+COLUNAS = (
+    'nome', 'nascimento', 'telefone', 'email', 'cpf', 'endereco', 'estado_civil',
+    'modelo', 'placa', 'chassi', 'ano_modelo', 'alienado',
+    'codigo', 'seguradora', 'vigencia', 'premio', 'perc_comissao',
+)
+
+
+class ApoliceImportForm(ApoliceForm):
+    """
+    ApoliceForm without the per-row uniqueness query; codigo collisions are
+    checked once per batch instead.
+    """
+    def validate_unique(self):
+        pass
+
+
+class ResultadoImportacao:
+    """
+    Counters and per-row errors of an import run.
+
+    Attributes:
+        lidas: Data rows read from the file.
+        importadas: Policies written.
+        erros: (line number, messages) of each rejected row.
+        duracao: Wall time in seconds.
+    """
+    def __init__(self) -> None:
+        self.lidas = 0
+        self.importadas = 0
+        self.erros: List[Tuple[int, List[str]]] = []
+        self.duracao = 0.0
+
+    @property
+    def por_segundo(self) -> float:
+        return self.importadas / self.duracao if self.duracao else 0.0
+
+
+def _validar(dados: Dict[str, str]) -> Tuple[Optional[tuple], List[str]]:
+    """
+    Validates one row with the same forms the HTML views use.
+
+    Returns:
+        ((segurado, veiculo, apolice), []) with unsaved instances, or
+        (None, messages) if any form rejects the row.
+    """
+    formularios = (SeguradoForm(data=dados), VeiculoForm(data=dados), ApoliceImportForm(data=dados))
+    mensagens = [
+        f'{campo}: {erro}'
+        for form in formularios if not form.is_valid()
+        for campo, erros in form.errors.items() for erro in erros
+    ]
+    if mensagens:
+        return None, mensagens
+    return tuple(form.instance for form in formularios), []
+
+
+def _gravar_lote(lote: List[Tuple[int, tuple]], resultado: ResultadoImportacao) -> None:
+    """
+    Writes a batch of validated rows with one `bulk_create` per model inside
+    a transaction. Rows whose codigo already exists are reported and skipped.
+    Vehicles already registered, or repeated within the batch, are reused.
+    """
+    codigos = [apolice.codigo for _, (_, _, apolice) in lote]
+    existentes = set(Apolice.objects.filter(codigo__in=codigos).values_list('codigo', flat=True))
+    cpfs = {segurado.cpf for _, (segurado, _, _) in lote}
+    segurados = {}
+    for segurado in Segurado.objects.filter(cpf__in=cpfs).order_by('id'):
+        segurados.setdefault(segurado.cpf, segurado)
+    placas = {veiculo.placa for _, (_, veiculo, _) in lote}
+    veiculos = {(veiculo.placa, veiculo.chassi): veiculo
+                for veiculo in Veiculo.objects.filter(placa__in=placas)}
+
+    novos_segurados, novos_veiculos, apolices = [], [], []
+    for numero, (segurado, veiculo, apolice) in lote:
+        if apolice.codigo in existentes:
+            resultado.erros.append((numero, [f'codigo: Apólice {apolice.codigo} já existe.']))
+            continue
+        existentes.add(apolice.codigo)
+        if segurado.cpf not in segurados:
+            segurados[segurado.cpf] = segurado
+            novos_segurados.append(segurado)
+        chave = (veiculo.placa, veiculo.chassi)
+        if chave not in veiculos:
+            veiculos[chave] = veiculo
+            novos_veiculos.append(veiculo)
+        apolices.append((apolice, segurados[segurado.cpf], veiculos[chave]))
+
+    with transaction.atomic():
+        Segurado.objects.bulk_create(novos_segurados)
+        Veiculo.objects.bulk_create(novos_veiculos)
+        for apolice, segurado, veiculo in apolices:
+            apolice.segurado = segurado
+            apolice.veiculo = veiculo
+            apolice.comissao = calcular_comissao(apolice.premio, apolice.perc_comissao)
+        Apolice.objects.bulk_create([apolice for apolice, _, _ in apolices])
+        ledger.apply_many(apolice for apolice, _, _ in apolices)
+        # New policies of segurados that already existed change their detail page.
+        invalidar_segurados({segurado.pk for _, segurado, _ in apolices}
+                            - {segurado.pk for segurado in novos_segurados})
+    resultado.importadas += len(apolices)
+
+
+def _lotes(iterable: Iterable, tamanho: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while lote := list(islice(iterator, tamanho)):
+        yield lote
+
+
+def importar_csv(arquivo: TextIO, batch_size: int = BATCH_SIZE, delimiter: str = ';',
+                 progresso=None) -> ResultadoImportacao:
+    """
+    Imports segurados, veículos and apólices from a CSV with one policy per row.
+
+    The file is read lazily and written in batches of `batch_size`, so memory
+    does not grow with the file. Invalid rows are reported in the result and
+    do not abort their batch. A segurado whose CPF already exists is reused,
+    and so is a vehicle with the same placa and chassi.
+
+    Args:
+        arquivo: Text stream with a header row naming the columns in `COLUNAS`.
+        batch_size: Rows per transaction.
+        delimiter: CSV field separator.
+        progresso: Optional callable receiving the result after each batch.
+    """
+    resultado = ResultadoImportacao()
+    inicio = time.monotonic()
+    linhas = enumerate(csv.DictReader(arquivo, delimiter=delimiter), start=2)
+
+    for lote in _lotes(linhas, batch_size):
+        validas = []
+        for numero, dados in lote:
+            resultado.lidas += 1
+            instancias, mensagens = _validar(dados)
+            if mensagens:
+                resultado.erros.append((numero, mensagens))
+            else:
+                validas.append((numero, instancias))
+        if validas:
+            _gravar_lote(validas, resultado)
+        resultado.duracao = time.monotonic() - inicio
+        if progresso is not None:
+            progresso(resultado)
+
+    resultado.duracao = time.monotonic() - inicio
+    return resultado
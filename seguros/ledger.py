@@ -0,0 +1,153 @@
+from collections import defaultdict
+from decimal import Decimal
+from typing import Iterable, Optional
+
+from django.db import transaction
+from django.db.models import Count, F, QuerySet, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+
+def _entry(apolice) -> tuple:
+    """
+    Returns the ledger key and amounts an Apolice contributes.
+
+    Values go through `to_python` because instances built with
+    `objects.create()` may still hold the raw strings or floats passed in.
+    """
+    opts = apolice._meta
+    vigencia = opts.get_field('vigencia').to_python(apolice.vigencia)
+    premio = opts.get_field('premio').to_python(apolice.premio)
+    comissao = opts.get_field('comissao').to_python(apolice.comissao)
+    perc_comissao = opts.get_field('perc_comissao').to_python(apolice.perc_comissao)
+    key = (vigencia.year, vigencia.month, apolice.seguradora)
+    return key, premio, comissao, perc_comissao, vigencia
+
+
+def apply(apolice, sign: int = 1) -> None:
+    """
+    Adds (`sign=1`) or removes (`sign=-1`) an Apolice from the ledger with an
+    atomic `UPDATE ... SET total = total + x` on its (ano, mes, seguradora) row.
+    """
+    apply_many([apolice], sign)
+
+
+def _aplicar(deltas: dict, diarios: dict, sign: int) -> None:
+    # deltas: (ano, mes, seguradora) -> [quantidade, premio, comissao, perc];
+    # diarios: (vigencia, seguradora) -> quantidade.
+    from .cache import invalidar_relatorios
+    from .models import ComissaoMensal, VencimentoDiario
+
+    with transaction.atomic():
+        for (ano, mes, seguradora), (quantidade, premio, comissao, perc) in deltas.items():
+            ComissaoMensal.objects.get_or_create(ano=ano, mes=mes, seguradora=seguradora)
+            ComissaoMensal.objects.filter(ano=ano, mes=mes, seguradora=seguradora).update(
+                quantidade=F('quantidade') + sign * quantidade,
+                total_premio=F('total_premio') + sign * premio,
+                total_comissao=F('total_comissao') + sign * comissao,
+                soma_perc_comissao=F('soma_perc_comissao') + sign * perc,
+            )
+        for (vigencia, seguradora), quantidade in diarios.items():
+            VencimentoDiario.objects.get_or_create(vigencia=vigencia, seguradora=seguradora)
+            VencimentoDiario.objects.filter(vigencia=vigencia, seguradora=seguradora).update(
+                quantidade=F('quantidade') + sign * quantidade,
+            )
+    invalidar_relatorios((ano, mes) for ano, mes, _ in deltas)
+
+
+def apply_many(apolices: Iterable, sign: int = 1) -> None:
+    """
+    Same as `apply` for many policies at once, e.g. after `bulk_create`,
+    which does not send signals. Contributions are summed per ledger row
+    first, so the cost depends on the number of distinct months, not rows.
+
+    Also maintains the per-day VencimentoDiario counts.
+    """
+    deltas = defaultdict(lambda: [0, Decimal(0), Decimal(0), 0])
+    diarios = defaultdict(int)
+    for apolice in apolices:
+        key, premio, comissao, perc_comissao, vigencia = _entry(apolice)
+        delta = deltas[key]
+        delta[0] += 1
+        delta[1] += premio
+        delta[2] += comissao
+        delta[3] += perc_comissao
+        diarios[(vigencia, apolice.seguradora)] += 1
+    _aplicar(deltas, diarios, sign)
+
+
+def apply_queryset(apolices: QuerySet, sign: int = 1) -> None:
+    """
+    Same as `apply_many` for the policies of a queryset, summed by the
+    database with two grouped queries instead of loading the rows. Used
+    around set-based `update()` and `delete()`, which send no signals.
+    """
+    deltas = {
+        (linha['ano'], linha['mes'], linha['seguradora']): (
+            linha['quantidade'], linha['premio'] or 0, linha['comissao'] or 0, linha['perc'] or 0,
+        )
+        for linha in apolices.annotate(
+            ano=ExtractYear('vigencia'), mes=ExtractMonth('vigencia'),
+        ).values('ano', 'mes', 'seguradora').annotate(
+            quantidade=Count('codigo'),
+            premio=Sum('premio'),
+            comissao=Sum('comissao'),
+            perc=Sum('perc_comissao'),
+        ).order_by()
+    }
+    diarios = {
+        (linha['vigencia'], linha['seguradora']): linha['quantidade']
+        for linha in apolices.values('vigencia', 'seguradora').annotate(
+            quantidade=Count('codigo'),
+        ).order_by()
+    }
+    _aplicar(deltas, diarios, sign)
+
+
+def rebuild(ano: Optional[int] = None, mes: Optional[int] = None) -> int:
+    """
+    Recomputes the ledgers from Apolice with grouped aggregates, optionally
+    limited to a year or month. Needed after bulk writes that bypass signals.
+
+    Returns:
+        Number of ledger rows written.
+    """
+    from .cache import invalidar_relatorios
+    from .models import Apolice, ComissaoMensal, VencimentoDiario
+
+    apolices = Apolice.objects.all()
+    ledger = ComissaoMensal.objects.all()
+    diario = VencimentoDiario.objects.all()
+    if ano is not None:
+        apolices = apolices.filter(vigencia__year=ano)
+        ledger = ledger.filter(ano=ano)
+        diario = diario.filter(vigencia__year=ano)
+    if mes is not None:
+        apolices = apolices.filter(vigencia__month=mes)
+        ledger = ledger.filter(mes=mes)
+        diario = diario.filter(vigencia__month=mes)
+
+    linhas = apolices.annotate(
+        ano=ExtractYear('vigencia'), mes=ExtractMonth('vigencia'),
+    ).values('ano', 'mes', 'seguradora').annotate(
+        quantidade=Count('codigo'),
+        total_premio=Sum('premio'),
+        total_comissao=Sum('comissao'),
+        soma_perc_comissao=Sum('perc_comissao'),
+    ).order_by()
+
+    diarias = apolices.values('vigencia', 'seguradora').annotate(
+        quantidade=Count('codigo'),
+    ).order_by()
+
+    with transaction.atomic():
+        meses = set(ledger.values_list('ano', 'mes'))
+        ledger.delete()
+        diario.delete()
+        criadas = ComissaoMensal.objects.bulk_create(
+            ComissaoMensal(**linha) for linha in linhas
+        )
+        VencimentoDiario.objects.bulk_create(
+            VencimentoDiario(**linha) for linha in diarias
+        )
+        invalidar_relatorios(meses | {(linha.ano, linha.mes) for linha in criadas})
+    return len(criadas)
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from seguros.autocomplete import lru, sugerir
+from seguros.benchmark import formatar, medir
+from seguros.models import Apolice, Segurado, Veiculo
+
+
+class Command(BaseCommand):
+    help = ('Mede a latência do autocomplete com o LRU vazio (consulta aos índices de '
+            'prefixo) e aquecido, sobre prefixos tirados dos dados atuais do banco.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticoes', type=int, default=200)
+        parser.add_argument('--limite-ms', type=float, default=20.0,
+                            help='Falha se o p95 com o LRU vazio passar deste valor.')
+
+    def prefixos(self):
+        nomes = Segurado.objects.order_by('?').values_list('nome', flat=True)[:20]
+        codigos = Apolice.objects.order_by('?').values_list('codigo', flat=True)[:20]
+        placas = Veiculo.objects.order_by('?').values_list('placa', flat=True)[:20]
+        prefixos = [
+            valor[:tamanho]
+            for valor in (*nomes, *codigos, *placas)
+            for tamanho in (2, 3, 5)
+            if len(valor) >= tamanho
+        ]
+        if not prefixos:
+            raise CommandError('Banco vazio; rode gerar_dados antes.')
+        return prefixos
+
+    def handle(self, *args, **options):
+        prefixos = self.prefixos()
+        proximo = iter(range(10 ** 9))
+
+        def frio():
+            lru.limpar()
+            sugerir(prefixos[next(proximo) % len(prefixos)])
+
+        def quente():
+            sugerir(prefixos[next(proximo) % len(prefixos)])
+
+        resultados = [
+            medir('autocomplete frio', frio, options['repeticoes']),
+            medir('autocomplete quente', quente, options['repeticoes']),
+        ]
+        lru.limpar()
+        self.stdout.write(formatar(resultados))
+
+        if resultados[0]['p95_ms'] > options['limite_ms']:
+            raise CommandError(f'p95 frio de {resultados[0]["p95_ms"]}ms acima de '
+                               f'{options["limite_ms"]}ms.')
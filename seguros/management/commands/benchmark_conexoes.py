@@ -0,0 +1,75 @@
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.postgresql import base as postgresql
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+
+from core.postgresql_pool import base as postgresql_pool
+from seguros.benchmark import formatar, medir
+from seguros.models import Segurado
+
+
+class Command(BaseCommand):
+    help = ('Mede a latência por requisição das views principais abrindo uma conexão '
+            'nova a cada requisição e reaproveitando conexões do pool.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticoes', type=int, default=50)
+
+    def cenarios(self):
+        segurado = Segurado.objects.annotate(n=Count('apolices')).filter(n__gt=0).first()
+        if segurado is None:
+            raise CommandError('Banco vazio; rode gerar_dados antes.')
+        return [
+            ('index', reverse('index')),
+            ('clientes', reverse('clients_list')),
+            ('ver_segurado', reverse('ver_segurado', kwargs={'pk': segurado.pk})),
+        ]
+
+    def modos(self):
+        if connections['default'].vendor != 'postgresql':
+            self.stdout.write('pool: requer PostgreSQL; medindo só conexões novas.')
+            return [('conexão nova', None)]
+        return [('conexão nova', postgresql.DatabaseWrapper), ('pool', postgresql_pool.DatabaseWrapper)]
+
+    @contextmanager
+    def conexoes(self, classe):
+        # Every alias gets a wrapper of `classe` with the same settings, so
+        # requests the router sends to replicas are measured the same way.
+        if classe is None:
+            yield
+            return
+        originais = {alias: connections[alias] for alias in connections}
+        try:
+            for alias, original in originais.items():
+                connections[alias] = classe(dict(original.settings_dict), alias)
+            yield
+        finally:
+            for alias, original in originais.items():
+                connections[alias].close()
+                connections[alias] = original
+
+    def handle(self, *args, **options):
+        host = next((h.lstrip('.') for h in settings.ALLOWED_HOSTS if h != '*'), 'localhost')
+        client = Client(HTTP_HOST=host)
+        cenarios = self.cenarios()
+        resultados = []
+        for modo, classe in self.modos():
+            with self.conexoes(classe):
+                for nome, url in cenarios:
+                    def executar(url=url):
+                        response = client.get(url)
+                        # What request_finished does with CONN_MAX_AGE = 0: a
+                        # plain connection is closed, a pooled one returned.
+                        connections.close_all()
+                        if response.status_code != 200:
+                            raise CommandError(f'{url} respondeu {response.status_code}')
+                        return response
+
+                    resultados.append(medir(f'{modo} {nome}', executar, options['repeticoes']))
+
+        self.stdout.write(formatar(resultados))
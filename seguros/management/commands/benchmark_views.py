@@ -0,0 +1,60 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+
+from seguros.benchmark import formatar, medir
+from seguros.models import Apolice, Segurado
+
+
+class Command(BaseCommand):
+    help = ('Mede latência (p50/p95/p99), queries e memória de pico das views de '
+            'listagem, detalhe e relatório sobre os dados atuais do banco.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticoes', type=int, default=20)
+        parser.add_argument('--json', dest='saida_json',
+                            help='Grava os resultados neste arquivo para comparar entre commits.')
+
+    def cenarios(self):
+        apolice = Apolice.objects.order_by('-vigencia').only('vigencia').first()
+        segurado = Segurado.objects.annotate(n=Count('apolices')).filter(n__gt=0).first()
+        if apolice is None or segurado is None:
+            raise CommandError('Banco vazio; rode gerar_dados antes.')
+
+        index = reverse('index')
+        clientes = reverse('clients_list')
+        paginas = max(1, Apolice.objects.count() // 50)
+        return [
+            ('index', index),
+            ('index pagina final', f'{index}?page={paginas}'),
+            ('index cursor', f'{index}?cursor='),
+            ('index busca', f'{index}?search=silva'),
+            ('clientes', clientes),
+            ('clientes busca', f'{clientes}?search=joao'),
+            ('ver_segurado', reverse('ver_segurado', kwargs={'pk': segurado.pk})),
+            ('relatorio', f'{reverse("relatorio")}?mes={apolice.vigencia.month}&ano={apolice.vigencia.year}'),
+            ('relatorio 10 anos', f'{reverse("relatorio_periodo")}?de={apolice.vigencia.year - 9}-01'
+                                  f'&ate={apolice.vigencia.year}-12'),
+        ]
+
+    def handle(self, *args, **options):
+        host = next((h.lstrip('.') for h in settings.ALLOWED_HOSTS if h != '*'), 'localhost')
+        client = Client(HTTP_HOST=host)
+        resultados = []
+        for nome, url in self.cenarios():
+            def executar(url=url):
+                response = client.get(url)
+                if response.status_code != 200:
+                    raise CommandError(f'{url} respondeu {response.status_code}')
+                return response
+
+            resultados.append({**medir(nome, executar, options['repeticoes']), 'url': url})
+
+        self.stdout.write(formatar(resultados))
+        if options['saida_json']:
+            with open(options['saida_json'], 'w') as arquivo:
+                json.dump(resultados, arquivo, indent=2)
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from seguros.deduplicacao import BATCH_SIZE, mesclar_duplicados
+
+
+class Command(BaseCommand):
+    help = ('Mescla veículos com a mesma placa e chassi (ignorando caixa, espaços e hífens) '
+            'no mais antigo, movendo suas apólices, em lotes.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=BATCH_SIZE,
+                            help='Grupos de duplicados mesclados por transação.')
+
+    def handle(self, *args, **options):
+        def progresso(removidos):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{removidos} veículos duplicados removidos')
+
+        removidos = mesclar_duplicados(options['lote'], progresso=progresso)
+        self.stdout.write(self.style.SUCCESS(f'{removidos} veículos duplicados mesclados.'))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from seguros.dados_sinteticos import BATCH_SIZE, gerar_dados
+
+
+class Command(BaseCommand):
+    help = 'Gera segurados, veículos e apólices sintéticos para testes de carga.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--apolices', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--anos', type=int, default=4)
+        parser.add_argument('--lote', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if options['apolices'] < 1:
+            raise CommandError('--apolices deve ser maior que zero.')
+
+        def progresso(feitas):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{feitas} apólices criadas')
+
+        segurados = gerar_dados(
+            options['apolices'], seed=options['seed'], anos=options['anos'],
+            batch_size=options['lote'], progresso=progresso,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'{options["apolices"]} apólices e {segurados} segurados criados.'
+        ))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from seguros.importacao import BATCH_SIZE, importar_csv
+
+
+class Command(BaseCommand):
+    help = 'Importa segurados, veículos e apólices de um arquivo CSV (uma apólice por linha).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo')
+        parser.add_argument('--lote', type=int, default=BATCH_SIZE)
+        parser.add_argument('--delimitador', default=';')
+
+    def handle(self, *args, **options):
+        def progresso(resultado):
+            if options['verbosity'] > 1:
+                self.stdout.write(
+                    f'{resultado.lidas} linhas lidas, {resultado.importadas} importadas '
+                    f'({resultado.por_segundo:.0f} apólices/s)'
+                )
+
+        try:
+            with open(options['arquivo'], encoding='utf-8-sig', newline='') as arquivo:
+                resultado = importar_csv(
+                    arquivo, batch_size=options['lote'],
+                    delimiter=options['delimitador'], progresso=progresso,
+                )
+        except OSError as e:
+            raise CommandError(e)
+
+        for numero, mensagens in resultado.erros:
+            self.stderr.write(f'Linha {numero}: {"; ".join(mensagens)}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{resultado.importadas} de {resultado.lidas} apólices importadas em '
+            f'{resultado.duracao:.2f}s ({resultado.por_segundo:.0f} apólices/s), '
+            f'{len(resultado.erros)} linhas com erro.'
+        ))
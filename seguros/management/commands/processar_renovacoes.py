@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from seguros.renovacoes import BATCH_SIZE, processar
+
+
+class Command(BaseCommand):
+    help = ('Coloca na fila de renovação as apólices que vencem nos próximos dias, fecha as já '
+            'renovadas e envia os avisos pendentes, em lotes. Feito para rodar diariamente.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int,
+                            help='Antecedência da janela de renovação (padrão: RENOVACAO_ANTECEDENCIA).')
+        parser.add_argument('--lote', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        resultado = processar(options['dias'], batch_size=options['lote'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{resultado.enfileiradas} apólices enfileiradas, {resultado.renovadas} renovadas, '
+            f'{resultado.avisadas} avisos ({resultado.emails} e-mails enviados).'
+        ))
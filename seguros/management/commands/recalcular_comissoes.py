@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from seguros import ledger
+
+
+class Command(BaseCommand):
+    help = 'Recalcula o ledger de comissões mensais a partir das apólices.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ano', type=int)
+        parser.add_argument('--mes', type=int)
+
+    def handle(self, *args, **options):
+        linhas = ledger.rebuild(ano=options['ano'], mes=options['mes'])
+        self.stdout.write(self.style.SUCCESS(f'{linhas} linhas de comissão recalculadas.'))
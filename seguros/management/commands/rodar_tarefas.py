@@ -0,0 +1,88 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+
+from seguros.models import Tarefa
+from seguros.tarefas import executar, logger, reservar
+
+
+# Longest pause, in seconds, after repeated database errors.
+ESPERA_MAXIMA = 60
+
+
+class Command(BaseCommand):
+    help = ('Executa as tarefas em segundo plano da fila no banco, com um pool de workers '
+            'concorrentes. Não depende de nenhum broker externo.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=getattr(settings, 'TAREFAS_WORKERS', 2))
+        parser.add_argument('--intervalo', type=float,
+                            default=getattr(settings, 'TAREFAS_INTERVALO', 1.0),
+                            help='Segundos de espera quando a fila está vazia.')
+        parser.add_argument('--uma-vez', action='store_true',
+                            help='Sai quando não restarem tarefas pendentes ou em execução, '
+                                 'em vez de aguardar novas tarefas.')
+
+    def trabalhar(self, parar, intervalo, uma_vez):
+        falhas = 0
+        try:
+            while not parar.is_set():
+                try:
+                    # As between requests: drop connections past CONN_MAX_AGE or broken.
+                    close_old_connections()
+                    tarefa = reservar()
+                    if tarefa is None:
+                        # Jobs still running elsewhere may fail or lose their
+                        # lease and come back to the queue.
+                        if uma_vez and not Tarefa.objects.filter(
+                            status__in=(Tarefa.PENDENTE, Tarefa.EXECUTANDO)
+                        ).exists():
+                            return
+                        parar.wait(intervalo)
+                        continue
+                    self.stdout.write(f'Executando {tarefa} (tentativa {tarefa.tentativas})')
+                    executar(tarefa)
+                    falhas = 0
+                except Exception:
+                    # A dropped connection or a locked SQLite database must not
+                    # end the worker; an unfinished job is retried once its
+                    # lease expires.
+                    falhas += 1
+                    logger.exception('Erro no worker %s; nova tentativa em breve.',
+                                     threading.current_thread().name)
+                    connections.close_all()
+                    parar.wait(min(intervalo * 2 ** falhas, ESPERA_MAXIMA))
+        finally:
+            connections.close_all()
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers deve ser maior que zero.')
+        parar = threading.Event()
+        argumentos = (parar, options['intervalo'], options['uma_vez'])
+
+        if options['workers'] == 1:
+            self.trabalhar(*argumentos)
+            return
+
+        # SIGTERM lets each worker finish the job it is running before exiting.
+        anterior = signal.signal(signal.SIGTERM, lambda *_: parar.set())
+        workers = [
+            threading.Thread(target=self.trabalhar, args=argumentos, name=f'tarefas-{i}', daemon=True)
+            for i in range(options['workers'])
+        ]
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                while worker.is_alive():
+                    worker.join(0.5)
+        except KeyboardInterrupt:
+            parar.set()
+            for worker in workers:
+                worker.join()
+        finally:
+            signal.signal(signal.SIGTERM, anterior)
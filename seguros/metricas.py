@@ -0,0 +1,161 @@
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Tuple
+
+from django.db.models import Sum
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Registro:
+    """
+    In-process counters and histograms exported in the Prometheus text format.
+
+    Every thread writes to its own shard, so recording never takes a lock;
+    a scrape merges the shards. Values are per process, as with any
+    Prometheus client library without a multiprocess collector.
+    """
+    def __init__(self) -> None:
+        self._local = threading.local()
+        self._shards: List[dict] = []
+        self.descricoes: Dict[str, Tuple[str, str]] = {}
+
+    def _shard(self) -> dict:
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            self._shards.append(shard)
+        return shard
+
+    def declarar(self, nome: str, tipo: str, descricao: str) -> None:
+        self.descricoes[nome] = (tipo, descricao)
+
+    def incrementar(self, nome: str, rotulos: Labels = (), valor: float = 1) -> None:
+        shard = self._shard()
+        chave = (nome, rotulos)
+        shard[chave] = shard.get(chave, 0) + valor
+
+    def observar(self, nome: str, rotulos: Labels, valor: float) -> None:
+        shard = self._shard()
+        chave = (nome, rotulos)
+        histograma = shard.get(chave)
+        if histograma is None:
+            # One slot per bucket, one for +Inf, then the sum.
+            histograma = shard[chave] = [0] * (len(LATENCY_BUCKETS) + 2)
+        histograma[bisect_left(LATENCY_BUCKETS, valor)] += 1
+        histograma[-1] += valor
+
+    def coletar(self) -> dict:
+        """
+        Merges all shards into {(nome, rotulos): value or histogram list}.
+        """
+        total = {}
+        for shard in list(self._shards):
+            for chave, valor in dict(shard).items():
+                if isinstance(valor, list):
+                    acumulado = total.setdefault(chave, [0] * len(valor))
+                    for i, v in enumerate(valor):
+                        acumulado[i] += v
+                else:
+                    total[chave] = total.get(chave, 0) + valor
+        return total
+
+
+registro = Registro()
+registro.declarar('seguros_http_request_duration_seconds', 'histogram',
+                  'Latência das requisições por rota.')
+registro.declarar('seguros_http_requests_total', 'counter', 'Requisições por rota e status.')
+registro.declarar('seguros_db_queries_total', 'counter', 'Queries executadas por banco.')
+registro.declarar('seguros_db_query_seconds_total', 'counter', 'Tempo gasto em SQL por banco.')
+registro.declarar('seguros_db_connections_opened_total', 'counter', 'Conexões abertas por banco.')
+
+
+def contar_conexao(sender, connection, **kwargs) -> None:
+    """
+    `connection_created` receiver feeding seguros_db_connections_opened_total.
+    """
+    registro.incrementar('seguros_db_connections_opened_total', (('banco', connection.alias),))
+
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _rotulos(rotulos: Iterable[Tuple[str, str]]) -> str:
+    pares = ','.join(f'{nome}="{_escapar(valor)}"' for nome, valor in rotulos)
+    return f'{{{pares}}}' if pares else ''
+
+
+def _numero(valor: float) -> str:
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def gauges_negocio() -> List[Tuple[str, str, Labels, float]]:
+    """
+    Business gauges read from the ledger tables, never from Apolice: at most
+    one row per (mês, seguradora) and 31 rows per seguradora.
+    """
+    from .models import ComissaoMensal, SEGURADORAS, VencimentoDiario
+
+    por_seguradora = dict.fromkeys((codigo for codigo, _ in SEGURADORAS), 0)
+    por_seguradora.update(
+        ComissaoMensal.objects.values('seguradora').annotate(total=Sum('quantidade'))
+        .values_list('seguradora', 'total')
+    )
+    hoje = date.today()
+    vencendo = VencimentoDiario.objects.filter(
+        vigencia__gte=hoje, vigencia__lte=hoje + timedelta(days=30)
+    ).aggregate(total=Sum('quantidade'))['total'] or 0
+
+    gauges = [
+        ('seguros_apolices', 'Apólices por seguradora.', (('seguradora', codigo),), total)
+        for codigo, total in por_seguradora.items()
+    ]
+    gauges.append(('seguros_apolices_vencendo_30_dias', 'Apólices com vigência nos próximos 30 dias.',
+                   (), vencendo))
+    return gauges
+
+
+def exportar(rotas: Iterable[str] = ()) -> str:
+    """
+    Renders every metric in the Prometheus text exposition format (0.0.4).
+
+    `rotas` are route names whose latency series are emitted even before
+    their first request, so dashboards see every route from startup.
+    """
+    valores = registro.coletar()
+    for rota in rotas:
+        valores.setdefault(('seguros_http_request_duration_seconds', (('rota', rota),)),
+                           [0] * (len(LATENCY_BUCKETS) + 2))
+
+    series = defaultdict(list)
+    for (nome, rotulos), valor in sorted(valores.items()):
+        series[nome].append((rotulos, valor))
+
+    linhas = []
+    for nome, (tipo, descricao) in registro.descricoes.items():
+        linhas += [f'# HELP {nome} {descricao}', f'# TYPE {nome} {tipo}']
+        for rotulos, valor in series.get(nome, ()):
+            if tipo != 'histogram':
+                linhas.append(f'{nome}{_rotulos(rotulos)} {_numero(valor)}')
+                continue
+            acumulado = 0
+            for limite, quantidade in zip((*LATENCY_BUCKETS, '+Inf'), valor[:-1]):
+                acumulado += quantidade
+                le = limite if limite == '+Inf' else repr(limite)
+                linhas.append(f'{nome}_bucket{_rotulos((*rotulos, ("le", le)))} {acumulado}')
+            linhas.append(f'{nome}_sum{_rotulos(rotulos)} {_numero(float(valor[-1]))}')
+            linhas.append(f'{nome}_count{_rotulos(rotulos)} {acumulado}')
+
+    anteriores = set()
+    for nome, descricao, rotulos, valor in gauges_negocio():
+        if nome not in anteriores:
+            linhas += [f'# HELP {nome} {descricao}', f'# TYPE {nome} gauge']
+            anteriores.add(nome)
+        linhas.append(f'{nome}{_rotulos(rotulos)} {_numero(valor)}')
+    return '\n'.join(linhas) + '\n'
@@ -0,0 +1,277 @@
+import asyncio
+import json
+import logging
+import random
+import time
+from abc import ABC, abstractmethod
+from collections import Counter
+from contextlib import ExitStack, asynccontextmanager, contextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .metricas import registro
+from .routers import Leitura, leitura_atual
+
+
+logger = logging.getLogger('seguros.instrumentacao')
+
+
+class QueryRecorder:
+    """
+    `execute_wrapper` that counts queries, SQL time and repeated statements.
+
+    Statements are compared by their SQL template (parameters not
+    interpolated), so the same query run once per row shows up as a repeat.
+    """
+    def __init__(self) -> None:
+        self.count = 0
+        self.duration = 0.0
+        self.signatures = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - inicio
+            self.count += 1
+            self.signatures[sql] += 1
+
+    def duplicates(self, limit: int = 5):
+        return [(sql, vezes) for sql, vezes in self.signatures.most_common(limit) if vezes > 1]
+
+
+@contextmanager
+def instalar_wrapper(wrapper):
+    """
+    Installs `wrapper` with `execute_wrapper()` on the calling thread's
+    connection to every database until the block exits.
+    """
+    with ExitStack() as pilha:
+        for alias in connections:
+            pilha.enter_context(connections[alias].execute_wrapper(wrapper))
+        yield wrapper
+
+
+@asynccontextmanager
+async def instalar_wrapper_async(wrapper):
+    """
+    `instalar_wrapper` for async middleware. It runs through sync_to_async,
+    in the thread where the request's ORM calls and template rendering also
+    run: the ASGI handler gives each request its own ThreadSensitiveContext.
+    """
+    pilha = ExitStack()
+    await sync_to_async(pilha.enter_context)(instalar_wrapper(wrapper))
+    try:
+        yield wrapper
+    finally:
+        await sync_to_async(pilha.close)()
+
+
+class _HibridoMiddleware(ABC):
+    """
+    Base for middleware usable in both WSGI and ASGI chains, following the
+    protocol of django.utils.deprecation.MiddlewareMixin, so serving the app
+    through core.asgi does not add a sync/async switch per middleware.
+
+    Subclasses implement the request both ways: `processar` when the rest of
+    the chain is sync and `__acall__` when it is async.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        return self.processar(request)
+
+    @abstractmethod
+    def processar(self, request):
+        ...
+
+    @abstractmethod
+    async def __acall__(self, request):
+        ...
+
+
+class InstrumentacaoMiddleware(_HibridoMiddleware):
+    """
+    Reports per-request query count, SQL time, repeated queries (N+1
+    signatures) and template render time.
+
+    Disabled unless `INSTRUMENTACAO_ATIVA` is set, in which case Django drops
+    it from the chain at startup. When enabled, only a fraction
+    `INSTRUMENTACAO_AMOSTRAGEM` of requests is measured; those get a
+    `Server-Timing` header and a JSON line on the `seguros.instrumentacao`
+    logger.
+    """
+    def __init__(self, get_response):
+        if not getattr(settings, 'INSTRUMENTACAO_ATIVA', False):
+            raise MiddlewareNotUsed()
+        super().__init__(get_response)
+        self.amostragem = getattr(settings, 'INSTRUMENTACAO_AMOSTRAGEM', 1.0)
+        self.limite_repeticoes = getattr(settings, 'INSTRUMENTACAO_LIMITE_REPETICOES', 5)
+
+    def processar(self, request):
+        if random.random() >= self.amostragem:
+            return self.get_response(request)
+
+        inicio = time.perf_counter()
+        request._instrumentacao_render = 0.0
+        with instalar_wrapper(QueryRecorder()) as recorder:
+            response = self.get_response(request)
+        return self.relatar(request, response, recorder, inicio)
+
+    async def __acall__(self, request):
+        if random.random() >= self.amostragem:
+            return await self.get_response(request)
+
+        inicio = time.perf_counter()
+        request._instrumentacao_render = 0.0
+        async with instalar_wrapper_async(QueryRecorder()) as recorder:
+            response = await self.get_response(request)
+        return self.relatar(request, response, recorder, inicio)
+
+    def process_template_response(self, request, response):
+        # The handler renders TemplateResponses after this hook and before
+        # the response reaches __call__, so the timing wraps `render` itself.
+        if not hasattr(request, '_instrumentacao_render'):
+            return response
+        renderizar = response.render
+
+        def render():
+            inicio = time.perf_counter()
+            try:
+                return renderizar()
+            finally:
+                request._instrumentacao_render += time.perf_counter() - inicio
+
+        response.render = render
+        return response
+
+    def relatar(self, request, response, recorder, inicio):
+        total = time.perf_counter() - inicio
+        render = request._instrumentacao_render
+        view = total - render
+        duplicadas = recorder.duplicates()
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries"',
+            f'view;dur={view * 1000:.1f}',
+            f'render;dur={render * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ))
+
+        dados = {
+            'metodo': request.method,
+            'caminho': request.path,
+            'rota': getattr(request.resolver_match, 'url_name', None),
+            'status': response.status_code,
+            'queries': recorder.count,
+            'sql_ms': round(recorder.duration * 1000, 2),
+            'render_ms': round(render * 1000, 2),
+            'total_ms': round(total * 1000, 2),
+            'duplicadas': [{'sql': sql, 'vezes': vezes} for sql, vezes in duplicadas],
+        }
+        suspeita_n_mais_1 = any(vezes >= self.limite_repeticoes for _, vezes in duplicadas)
+        logger.log(logging.WARNING if suspeita_n_mais_1 else logging.INFO,
+                   json.dumps(dados, ensure_ascii=False))
+        return response
+
+
+def _medir_query(execute, sql, params, many, context):
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        banco = (('banco', context['connection'].alias),)
+        registro.incrementar('seguros_db_queries_total', banco)
+        registro.incrementar('seguros_db_query_seconds_total', banco, time.perf_counter() - inicio)
+
+
+class MetricasMiddleware(_HibridoMiddleware):
+    """
+    Feeds the in-process metrics served at /metrics: latency histogram and
+    request count per route, and query count/time per database.
+
+    Enabled unless `METRICAS_ATIVAS` is False. Recording only touches
+    thread-local counters (see seguros.metricas.Registro).
+    """
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICAS_ATIVAS', True):
+            raise MiddlewareNotUsed()
+        super().__init__(get_response)
+
+    def processar(self, request):
+        inicio = time.perf_counter()
+        with instalar_wrapper(_medir_query):
+            response = self.get_response(request)
+        return self.registrar(request, response, inicio)
+
+    async def __acall__(self, request):
+        inicio = time.perf_counter()
+        async with instalar_wrapper_async(_medir_query):
+            response = await self.get_response(request)
+        return self.registrar(request, response, inicio)
+
+    def registrar(self, request, response, inicio):
+        duracao = time.perf_counter() - inicio
+        rota = getattr(request.resolver_match, 'url_name', None) or 'desconhecida'
+        registro.observar('seguros_http_request_duration_seconds', (('rota', rota),), duracao)
+        registro.incrementar('seguros_http_requests_total',
+                             (('rota', rota), ('status', str(response.status_code))))
+        return response
+
+
+class ReplicaMiddleware(_HibridoMiddleware):
+    """
+    Lets GET requests to views marked with `seguros.routers.ler_da_replica`
+    read from the replicas, template rendering included.
+
+    Any other method pins the client to the primary for
+    `REPLICA_ATRASO_MAXIMO` seconds through a cookie, so the redirect after a
+    POST reads its own writes instead of a replica that may lag behind.
+    Dropped from the chain when no replica is configured.
+    """
+    cookie = 'seguros_primario'
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'DATABASE_REPLICAS', None):
+            raise MiddlewareNotUsed()
+        super().__init__(get_response)
+        self.atraso_maximo = getattr(settings, 'REPLICA_ATRASO_MAXIMO', 5)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        leitura = leitura_atual.get()
+        if (leitura is not None and getattr(view_func, 'ler_da_replica', False)
+                and request.method in ('GET', 'HEAD') and self.cookie not in request.COOKIES):
+            leitura.replica = True
+
+    def processar(self, request):
+        token = leitura_atual.set(Leitura())
+        try:
+            response = self.get_response(request)
+        finally:
+            leitura_atual.reset(token)
+        return self.fixar_primario(request, response)
+
+    async def __acall__(self, request):
+        token = leitura_atual.set(Leitura())
+        try:
+            response = await self.get_response(request)
+        finally:
+            leitura_atual.reset(token)
+        return self.fixar_primario(request, response)
+
+    def fixar_primario(self, request, response):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE'):
+            response.set_cookie(self.cookie, '1', max_age=self.atraso_maximo,
+                                httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,32 @@
+# Generated by Django 4.0.4 on 2026-10-17 23:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seguros', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='apolice',
+            name='segurado',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='apolices', to='seguros.segurado'),
+        ),
+        migrations.AlterField(
+            model_name='apolice',
+            name='veiculo',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='apolices', to='seguros.veiculo'),
+        ),
+        migrations.AddIndex(
+            model_name='apolice',
+            index=models.Index(fields=['vigencia', 'codigo'], name='apolice_vigencia_codigo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='segurado',
+            index=models.Index(fields=['nome', 'id'], name='segurado_nome_id_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+from django.contrib.postgres.operations import TrigramExtension, UnaccentExtension
+from django.db import migrations
+
+
+# unaccent() is only STABLE, so it cannot appear in an index expression. This
+# wrapper pins the dictionary and is declared IMMUTABLE so it can.
+CREATE_FUNCTION = """
+CREATE OR REPLACE FUNCTION seguros_unaccent(text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$;
+"""
+
+CREATE_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS segurado_nome_trgm_idx ON seguros_segurado '
+    'USING gin (seguros_unaccent(lower(nome)) gin_trgm_ops);',
+    'CREATE INDEX IF NOT EXISTS apolice_codigo_trgm_idx ON seguros_apolice '
+    'USING gin (seguros_unaccent(lower(codigo)) gin_trgm_ops);',
+]
+
+DROP = [
+    'DROP INDEX IF EXISTS apolice_codigo_trgm_idx;',
+    'DROP INDEX IF EXISTS segurado_nome_trgm_idx;',
+    'DROP FUNCTION IF EXISTS seguros_unaccent(text);',
+]
+
+
+def criar_indices_busca(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(CREATE_FUNCTION)
+    for sql in CREATE_INDEXES:
+        schema_editor.execute(sql)
+
+
+def remover_indices_busca(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in DROP:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seguros', '0002_cursor_indexes'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        UnaccentExtension(),
+        migrations.RunPython(criar_indices_busca, remover_indices_busca),
+    ]
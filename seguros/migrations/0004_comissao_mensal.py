@@ -0,0 +1,46 @@
+# Generated by Django 4.0.4 on 2026-10-17 23:13
+
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+
+def preencher_comissoes(apps, schema_editor):
+    Apolice = apps.get_model('seguros', 'Apolice')
+    ComissaoMensal = apps.get_model('seguros', 'ComissaoMensal')
+
+    linhas = Apolice.objects.annotate(
+        ano=ExtractYear('vigencia'), mes=ExtractMonth('vigencia'),
+    ).values('ano', 'mes', 'seguradora').annotate(
+        quantidade=Count('codigo'),
+        total_premio=Sum('premio'),
+        total_comissao=Sum(F('premio') * F('perc_comissao') / 100),
+    ).order_by()
+    ComissaoMensal.objects.bulk_create(ComissaoMensal(**linha) for linha in linhas)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seguros', '0003_trigram_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ComissaoMensal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ano', models.PositiveSmallIntegerField()),
+                ('mes', models.PositiveSmallIntegerField()),
+                ('seguradora', models.CharField(choices=[('BR', 'Bradesco'), ('PS', 'Porto Seguro'), ('AZ', 'Azul Seguros'), ('MA', 'Mapfre'), ('SA', 'Santander'), ('TM', 'Tokio Marine'), ('AL', 'Allianz')], max_length=2)),
+                ('quantidade', models.PositiveIntegerField(default=0)),
+                ('total_premio', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Total Prêmio')),
+                ('total_comissao', models.DecimalField(decimal_places=4, default=0, max_digits=16, verbose_name='Total Comissão')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='comissaomensal',
+            constraint=models.UniqueConstraint(fields=('ano', 'mes', 'seguradora'), name='comissao_mensal_unica'),
+        ),
+        migrations.RunPython(preencher_comissoes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.0.4 on 2026-10-17 23:14
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+CREATE_TRIGGER = """
+CREATE OR REPLACE FUNCTION seguros_apolice_comissao() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.comissao := NEW.premio * NEW.perc_comissao / 100;
+    RETURN NEW;
+END
+$$;
+CREATE TRIGGER apolice_comissao_trg
+    BEFORE INSERT OR UPDATE OF premio, perc_comissao, comissao ON seguros_apolice
+    FOR EACH ROW EXECUTE FUNCTION seguros_apolice_comissao();
+"""
+
+DROP_TRIGGER = """
+DROP TRIGGER IF EXISTS apolice_comissao_trg ON seguros_apolice;
+DROP FUNCTION IF EXISTS seguros_apolice_comissao();
+"""
+
+
+def preencher_comissao(apps, schema_editor):
+    Apolice = apps.get_model('seguros', 'Apolice')
+    Apolice.objects.update(comissao=F('premio') * F('perc_comissao') / 100)
+
+
+def criar_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_TRIGGER)
+
+
+def remover_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_TRIGGER)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seguros', '0004_comissao_mensal'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apolice',
+            name='comissao',
+            field=models.DecimalField(db_index=True, decimal_places=4, default=0, editable=False, max_digits=10, verbose_name='Comissão'),
+        ),
+        migrations.RunPython(preencher_comissao, migrations.RunPython.noop),
+        migrations.RunPython(criar_trigger, remover_trigger),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.0.4 on 2026-10-17 23:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seguros', '0005_apolice_comissao'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='apolice',
+            index=models.Index(fields=['vigencia', 'seguradora'], name='apolice_vigencia_seg_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='segurado',
+            index=models.Index(fields=['cpf'], name='segurado_cpf_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='veiculo',
+            index=models.Index(fields=['placa'], name='veiculo_placa_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.0.4 on 2026-10-17 23:21
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def preencher_vencimentos(apps, schema_editor):
+    Apolice = apps.get_model('seguros', 'Apolice')
+    VencimentoDiario = apps.get_model('seguros', 'VencimentoDiario')
+
+    linhas = Apolice.objects.values('vigencia', 'seguradora').annotate(
+        quantidade=Count('codigo'),
+    ).order_by()
+    VencimentoDiario.objects.bulk_create(VencimentoDiario(**linha) for linha in linhas)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seguros', '0006_indices_consultas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VencimentoDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('vigencia', models.DateField(verbose_name='Vigência')),
+                ('seguradora', models.CharField(choices=[('BR', 'Bradesco'), ('PS', 'Porto Seguro'), ('AZ', 'Azul Seguros'), ('MA', 'Mapfre'), ('SA', 'Santander'), ('TM', 'Tokio Marine'), ('AL', 'Allianz')], max_length=2)),
+                ('quantidade', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='vencimentodiario',
+            constraint=models.UniqueConstraint(fields=('vigencia', 'seguradora'), name='vencimento_diario_unico'),
+        ),
+        migrations.RunPython(preencher_vencimentos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.0.4 on 2026-10-17 23:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seguros', '0007_vencimento_diario'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apolice',
+            name='versao',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.0.4 on 2026-10-17 23:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seguros', '0008_apolice_versao'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='segurado',
+            name='versao',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -0,0 +1,45 @@
+from django.db import migrations
+
+
+# btree indexes with pattern_ops opclasses serve `LIKE 'abc%'` regardless of
+# the database collation. Expressions match the autocomplete lookups in
+# seguros.autocomplete; the UPPER/LOWER casts mirror the SQL Django emits.
+CREATE_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS segurado_nome_prefixo_idx ON seguros_segurado '
+    '(seguros_unaccent(lower(nome)) text_pattern_ops, id);',
+    'CREATE INDEX IF NOT EXISTS apolice_codigo_prefixo_idx ON seguros_apolice '
+    '(upper(codigo) text_pattern_ops);',
+    'CREATE INDEX IF NOT EXISTS veiculo_placa_prefixo_idx ON seguros_veiculo '
+    '(placa varchar_pattern_ops, id);',
+]
+
+DROP = [
+    'DROP INDEX IF EXISTS veiculo_placa_prefixo_idx;',
+    'DROP INDEX IF EXISTS apolice_codigo_prefixo_idx;',
+    'DROP INDEX IF EXISTS segurado_nome_prefixo_idx;',
+]
+
+
+def criar_indices_prefixo(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in CREATE_INDEXES:
+        schema_editor.execute(sql)
+
+
+def remover_indices_prefixo(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in DROP:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seguros', '0009_segurado_versao'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_indices_prefixo, remover_indices_prefixo),
+    ]
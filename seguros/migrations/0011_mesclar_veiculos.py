@@ -0,0 +1,66 @@
+from collections import defaultdict
+
+from django.db import migrations, transaction
+from django.db.models import Case, Count, F, IntegerField, Min, Value, When
+from django.db.models.functions import Replace, Upper
+
+
+BATCH_SIZE = 1000
+
+
+def normalizado(campo):
+    return Upper(Replace(Replace(campo, Value('-'), Value('')), Value(' '), Value('')))
+
+
+def mesclar_veiculos(apps, schema_editor):
+    """
+    Same as seguros.deduplicacao.mesclar_duplicados, for databases where
+    `deduplicar_veiculos` was not run before the unique constraint in 0012.
+    """
+    Veiculo = apps.get_model('seguros', 'Veiculo')
+    Apolice = apps.get_model('seguros', 'Apolice')
+
+    Veiculo.objects.exclude(placa=normalizado('placa'), chassi=normalizado('chassi')).update(
+        placa=normalizado('placa'), chassi=normalizado('chassi')
+    )
+    grupos = Veiculo.objects.values('placa', 'chassi').annotate(
+        manter=Min('id'), total=Count('id')
+    ).filter(total__gt=1).order_by('manter')
+
+    while lote := list(grupos[:BATCH_SIZE]):
+        manter = {(grupo['placa'], grupo['chassi']): grupo['manter'] for grupo in lote}
+        mescla = defaultdict(list)
+        veiculos = Veiculo.objects.filter(placa__in={placa for placa, _ in manter}).values_list(
+            'id', 'placa', 'chassi'
+        )
+        for id_, placa, chassi in veiculos:
+            destino = manter.get((placa, chassi))
+            if destino is not None and id_ != destino:
+                mescla[destino].append(id_)
+
+        duplicados = [id_ for ids in mescla.values() for id_ in ids]
+        with transaction.atomic():
+            Apolice.objects.filter(veiculo_id__in=duplicados).update(
+                veiculo=Case(
+                    *(When(veiculo_id=id_, then=Value(destino))
+                      for destino, ids in mescla.items() for id_ in ids),
+                    output_field=IntegerField(),
+                ),
+                versao=F('versao') + 1,
+            )
+            Veiculo.objects.filter(id__in=duplicados).delete()
+
+
+class Migration(migrations.Migration):
+    # Each batch commits on its own; the constraint is added by 0012 in a
+    # separate transaction, as Postgres refuses ALTER TABLE with the deferred
+    # foreign key checks of the UPDATEs still pending.
+    atomic = False
+
+    dependencies = [
+        ('seguros', '0010_indices_prefixo'),
+    ]
+
+    operations = [
+        migrations.RunPython(mesclar_veiculos, migrations.RunPython.noop),
+    ]
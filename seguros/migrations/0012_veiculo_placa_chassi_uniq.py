@@ -0,0 +1,17 @@
+# Generated by Django 4.0.4 on 2026-10-17 23:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seguros', '0011_mesclar_veiculos'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='veiculo',
+            constraint=models.UniqueConstraint(fields=('placa', 'chassi'), name='veiculo_placa_chassi_uniq'),
+        ),
+    ]
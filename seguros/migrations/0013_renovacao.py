@@ -0,0 +1,31 @@
+# Generated by Django 4.0.4 on 2026-10-17 23:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seguros', '0012_veiculo_placa_chassi_uniq'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Renovacao',
+            fields=[
+                ('apolice', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='renovacao', serialize=False, to='seguros.apolice')),
+                ('vencimento', models.DateField()),
+                ('status', models.CharField(choices=[('PE', 'Pendente'), ('AV', 'Avisada'), ('RE', 'Renovada')], default='PE', max_length=2)),
+                ('avisada_em', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='renovacao',
+            index=models.Index(condition=models.Q(('status', 'RE'), _negated=True), fields=['vencimento', 'apolice'], name='renovacao_aberta_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='renovacao',
+            index=models.Index(condition=models.Q(('status', 'PE')), fields=['vencimento'], name='renovacao_pendente_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.0.4 on 2026-10-17 23:48
+
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+
+def preencher_soma_perc(apps, schema_editor):
+    Apolice = apps.get_model('seguros', 'Apolice')
+    ComissaoMensal = apps.get_model('seguros', 'ComissaoMensal')
+
+    somas = {
+        (linha['ano'], linha['mes'], linha['seguradora']): linha['soma']
+        for linha in Apolice.objects.annotate(
+            ano=ExtractYear('vigencia'), mes=ExtractMonth('vigencia'),
+        ).values('ano', 'mes', 'seguradora').annotate(soma=Sum('perc_comissao')).order_by()
+    }
+    linhas = list(ComissaoMensal.objects.only('ano', 'mes', 'seguradora'))
+    for linha in linhas:
+        linha.soma_perc_comissao = somas.get((linha.ano, linha.mes, linha.seguradora)) or 0
+    ComissaoMensal.objects.bulk_update(linhas, ['soma_perc_comissao'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seguros', '0014_tarefa'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comissaomensal',
+            name='soma_perc_comissao',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.RunPython(preencher_soma_perc, migrations.RunPython.noop),
+    ]
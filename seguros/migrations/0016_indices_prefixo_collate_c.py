@@ -0,0 +1,61 @@
+from django.db import migrations
+
+
+# The text_pattern_ops indexes of migration 0010 serve `LIKE 'abc%'` but not
+# ORDER BY, so the autocomplete sorted every match before applying LIMIT.
+# Indexes on the default opclass with COLLATE "C" serve both: the prefix
+# range scan and `ORDER BY ... COLLATE "C"` (seguros.search.OrdemBinaria).
+CREATE_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS segurado_nome_prefixo_c_idx ON seguros_segurado '
+    '(seguros_unaccent(lower(nome)) COLLATE "C", id);',
+    'CREATE INDEX IF NOT EXISTS apolice_codigo_prefixo_c_idx ON seguros_apolice '
+    '(upper(codigo) COLLATE "C");',
+    'CREATE INDEX IF NOT EXISTS veiculo_placa_prefixo_c_idx ON seguros_veiculo '
+    '(placa COLLATE "C", id);',
+]
+
+DROP_INDEXES = [
+    'DROP INDEX IF EXISTS veiculo_placa_prefixo_c_idx;',
+    'DROP INDEX IF EXISTS apolice_codigo_prefixo_c_idx;',
+    'DROP INDEX IF EXISTS segurado_nome_prefixo_c_idx;',
+]
+
+CREATE_PATTERN_OPS = [
+    'CREATE INDEX IF NOT EXISTS segurado_nome_prefixo_idx ON seguros_segurado '
+    '(seguros_unaccent(lower(nome)) text_pattern_ops, id);',
+    'CREATE INDEX IF NOT EXISTS apolice_codigo_prefixo_idx ON seguros_apolice '
+    '(upper(codigo) text_pattern_ops);',
+    'CREATE INDEX IF NOT EXISTS veiculo_placa_prefixo_idx ON seguros_veiculo '
+    '(placa varchar_pattern_ops, id);',
+]
+
+DROP_PATTERN_OPS = [
+    'DROP INDEX IF EXISTS veiculo_placa_prefixo_idx;',
+    'DROP INDEX IF EXISTS apolice_codigo_prefixo_idx;',
+    'DROP INDEX IF EXISTS segurado_nome_prefixo_idx;',
+]
+
+
+def trocar_indices_prefixo(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in CREATE_INDEXES + DROP_PATTERN_OPS:
+        schema_editor.execute(sql)
+
+
+def restaurar_indices_prefixo(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in CREATE_PATTERN_OPS + DROP_INDEXES:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seguros', '0015_comissaomensal_soma_perc_comissao'),
+    ]
+
+    operations = [
+        migrations.RunPython(trocar_indices_prefixo, restaurar_indices_prefixo),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.0.4 on 2026-10-18 00:14
+
+from django.db import migrations, models
+import seguros.search
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seguros', '0016_indices_prefixo_collate_c'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='segurado',
+            index=models.Index(seguros.search.Digitos('cpf'), name='segurado_cpf_digitos_idx'),
+        ),
+    ]
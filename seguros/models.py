@@ -1,6 +1,9 @@
+from decimal import Decimal
 from django.db import models
+from django.utils import timezone
 from django.urls import reverse
 from django.core.validators import MaxValueValidator
+from .search import Digitos
 
 
 SEGURADORAS = [
@@ -22,6 +25,18 @@ ESTADO_CIVIL = [
 ]
 
 
+def calcular_comissao(premio: Decimal, perc_comissao: int) -> Decimal:
+    return (premio * perc_comissao / 100).quantize(Decimal('0.0001'))
+
+
+def normalizar_identificacao(valor: str) -> str:
+    """
+    Canonical form of a placa or chassi: uppercase, without spaces or
+    hyphens, so "abc-1234" and "ABC1234" identify the same vehicle.
+    """
+    return valor.replace('-', '').replace(' ', '').upper()
+
+
 class Segurado(models.Model):
     nome = models.CharField(max_length=50)
     nascimento = models.DateField('Data de Nascimento')
@@ -30,6 +45,14 @@ class Segurado(models.Model):
     cpf = models.CharField('CPF', max_length=12)
     endereco = models.CharField('Endereço', max_length=50)
     estado_civil = models.CharField(max_length=2, choices=ESTADO_CIVIL, default='NI')
+    versao = models.PositiveIntegerField(default=1, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['nome', 'id'], name='segurado_nome_id_idx'),
+            models.Index(fields=['cpf'], name='segurado_cpf_idx'),
+            models.Index(Digitos('cpf'), name='segurado_cpf_digitos_idx'),
+        ]
 
     def __str__(self):
         return self.nome
@@ -37,6 +60,17 @@ class Segurado(models.Model):
     def get_absolute_url(self):
         return reverse("ver_segurado", kwargs={"pk": self.pk})    
 
+    def save(self, *args, **kwargs):
+        # The detail page's ETag; its policies bump it too (seguros.signals).
+        if self._state.adding:
+            return super().save(*args, **kwargs)
+        self.versao = models.F('versao') + 1
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'versao'}
+        super().save(*args, **kwargs)
+        # Replaces the F() expression with the number it produced.
+        self.refresh_from_db(fields=['versao'])
+
 
 class Veiculo(models.Model):
     modelo = models.CharField(max_length=50)
@@ -45,6 +79,14 @@ class Veiculo(models.Model):
     ano_modelo = models.PositiveIntegerField(validators=[MaxValueValidator(2099)])
     alienado = models.BooleanField(null=True, default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['placa'], name='veiculo_placa_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['placa', 'chassi'], name='veiculo_placa_chassi_uniq'),
+        ]
+
     def __str__(self):
         return self.placa
 
@@ -57,6 +99,15 @@ class Apolice(models.Model):
     vigencia = models.DateField('Vigência')
     premio = models.DecimalField('Prêmio Líquido', max_digits=8, decimal_places=2)
     perc_comissao = models.PositiveIntegerField('Percentual Comissão', validators=[MaxValueValidator(50)])    
+    comissao = models.DecimalField('Comissão', max_digits=10, decimal_places=4, default=0,
+                                   editable=False, db_index=True)
+    versao = models.PositiveIntegerField(default=1, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['vigencia', 'codigo'], name='apolice_vigencia_codigo_idx'),
+            models.Index(fields=['vigencia', 'seguradora'], name='apolice_vigencia_seg_idx'),
+        ]
 
     def __str__(self):
         return f'{self.codigo}'
@@ -64,7 +115,163 @@ class Apolice(models.Model):
     def get_absolute_url(self):
         return reverse("ver_apolice", kwargs={"pk": self.codigo})    
 
+    def save(self, *args, **kwargs):
+        # On Postgres the apolice_comissao_trg trigger (migration 0005) is the
+        # source of truth; this keeps the in-memory instance in step with it.
+        premio = self._meta.get_field('premio').to_python(self.premio)
+        self.comissao = calcular_comissao(premio, int(self.perc_comissao))
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'premio', 'perc_comissao'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'comissao'}
+        if self._state.adding:
+            return super().save(*args, **kwargs)
+        # Incremented in SQL so concurrent edits never share a version,
+        # which keys the cached table rows (seguros.cache) and the ETag.
+        self.versao = models.F('versao') + 1
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'versao'}
+        super().save(*args, **kwargs)
+        # Replaces the F() expression with the number it produced.
+        self.refresh_from_db(fields=['versao'])
+
     @property
     def total_comissao(self):
-        valor = (self.premio * self.perc_comissao) / 100
-        return valor
+        return self.comissao
+
+
+class ComissaoMensal(models.Model):
+    """
+    Ledger of policy totals per (ano, mes, seguradora) of vigência.
+
+    Kept up to date incrementally by the Apolice save/delete signals, so
+    monthly reports read a handful of rows instead of aggregating Apolice.
+    """
+    ano = models.PositiveSmallIntegerField()
+    mes = models.PositiveSmallIntegerField()
+    seguradora = models.CharField(max_length=2, choices=SEGURADORAS)
+    quantidade = models.PositiveIntegerField(default=0)
+    total_premio = models.DecimalField('Total Prêmio', max_digits=16, decimal_places=2, default=0)
+    total_comissao = models.DecimalField('Total Comissão', max_digits=16, decimal_places=4, default=0)
+    # Sum of perc_comissao, so the average rate is soma_perc_comissao / quantidade.
+    soma_perc_comissao = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['ano', 'mes', 'seguradora'], name='comissao_mensal_unica'),
+        ]
+
+    def __str__(self):
+        return f'{self.mes:02}/{self.ano} {self.seguradora}'
+
+
+class VencimentoDiario(models.Model):
+    """
+    Number of policies per (vigencia, seguradora), maintained alongside
+    ComissaoMensal so "expiring soon" counts are a short indexed range read.
+    """
+    vigencia = models.DateField('Vigência')
+    seguradora = models.CharField(max_length=2, choices=SEGURADORAS)
+    quantidade = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['vigencia', 'seguradora'], name='vencimento_diario_unico'),
+        ]
+
+    def __str__(self):
+        return f'{self.vigencia} {self.seguradora}'
+
+
+class Renovacao(models.Model):
+    """
+    Renewal queue entry of an Apolice nearing the end of its vigência.
+
+    Entries are added by `processar_renovacoes` once the policy enters the
+    renewal window and move from pendente to avisada when the reminder is
+    sent, or to renovada once the vehicle has a policy with a later vigência.
+    Open entries are read through partial indexes on `vencimento`, so the
+    queue costs a short range scan however many policies exist.
+    """
+    PENDENTE = 'PE'
+    AVISADA = 'AV'
+    RENOVADA = 'RE'
+    STATUS = [
+        (PENDENTE, 'Pendente'),
+        (AVISADA, 'Avisada'),
+        (RENOVADA, 'Renovada'),
+    ]
+
+    apolice = models.OneToOneField(Apolice, on_delete=models.CASCADE, primary_key=True,
+                                   related_name='renovacao')
+    vencimento = models.DateField()
+    status = models.CharField(max_length=2, choices=STATUS, default=PENDENTE)
+    avisada_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['vencimento', 'apolice'], name='renovacao_aberta_idx',
+                         condition=~models.Q(status='RE')),
+            models.Index(fields=['vencimento'], name='renovacao_pendente_idx',
+                         condition=models.Q(status='PE')),
+        ]
+
+    def __str__(self):
+        return f'{self.apolice_id} {self.vencimento}'
+
+
+class Tarefa(models.Model):
+    """
+    Background job, run by the `rodar_tarefas` workers (seguros.tarefas).
+
+    While a job runs, `executar_em` holds the end of its lease: a job whose
+    worker died is picked up again once it passes. Otherwise it is the time
+    of the next attempt, pushed back after each failure.
+    """
+    PENDENTE = 'PE'
+    EXECUTANDO = 'EX'
+    CONCLUIDA = 'OK'
+    FALHOU = 'FA'
+    STATUS = [
+        (PENDENTE, 'Pendente'),
+        (EXECUTANDO, 'Executando'),
+        (CONCLUIDA, 'Concluída'),
+        (FALHOU, 'Falhou'),
+    ]
+
+    tipo = models.CharField(max_length=50)
+    parametros = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=2, choices=STATUS, default=PENDENTE)
+    tentativas = models.PositiveSmallIntegerField(default=0)
+    max_tentativas = models.PositiveSmallIntegerField(default=3)
+    executar_em = models.DateTimeField(default=timezone.now)
+    feitos = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(null=True, blank=True)
+    mensagem = models.CharField(max_length=200, blank=True)
+    resultado = models.JSONField(null=True, blank=True)
+    erro = models.TextField(blank=True)
+    criada_em = models.DateTimeField(auto_now_add=True)
+    concluida_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['executar_em', 'id'], name='tarefa_fila_idx',
+                         condition=models.Q(status__in=['PE', 'EX'])),
+        ]
+
+    def __str__(self):
+        return f'{self.tipo} #{self.pk}'
+
+    def get_absolute_url(self):
+        return reverse("ver_tarefa", kwargs={"pk": self.pk})
+
+    @property
+    def percentual(self):
+        if self.status == self.CONCLUIDA:
+            return 100
+        if not self.total:
+            return None
+        return min(100, self.feitos * 100 // self.total)
+
+    @property
+    def em_andamento(self):
+        return self.status in (self.PENDENTE, self.EXECUTANDO)
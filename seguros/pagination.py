@@ -0,0 +1,160 @@
+import base64
+import binascii
+import json
+from functools import partial
+from typing import Any, List, Optional, Sequence, Tuple
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q, QuerySet
+from django.http import Http404
+
+
+FORWARD = 'n'
+BACKWARD = 'p'
+
+
+def encode_cursor(values: Sequence[Any], direction: str = FORWARD) -> str:
+    """
+    Serializes the ordering values of a boundary row into an opaque token.
+    """
+    payload = json.dumps({'d': direction, 'v': list(values)}, cls=DjangoJSONEncoder)
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(token: str) -> Tuple[List[Any], str]:
+    """
+    Reverses `encode_cursor`.
+
+    Raises:
+        ValueError: If the token is malformed.
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+        values, direction = payload['v'], payload['d']
+    except (binascii.Error, UnicodeError, ValueError, TypeError, KeyError) as exc:
+        raise ValueError('Cursor inválido.') from exc
+    if direction not in (FORWARD, BACKWARD) or not isinstance(values, list):
+        raise ValueError('Cursor inválido.')
+    return values, direction
+
+
+def keyset_filter(fields: Sequence[str], values: Sequence[Any], forward: bool = True) -> Q:
+    """
+    Builds the row-value comparison `(f1, f2, ...) > (v1, v2, ...)` as a Q object.
+
+    Written as an OR of prefixes so it works on every backend and can be
+    satisfied by a composite index on `fields`.
+    """
+    lookup = 'gt' if forward else 'lt'
+    condition = Q()
+    for i, field in enumerate(fields):
+        equal = {f: v for f, v in zip(fields[:i], values[:i])}
+        condition |= Q(**equal, **{f'{field}__{lookup}': values[i]})
+    return condition
+
+
+class CursorPage:
+    """
+    A page of results obtained by keyset pagination.
+
+    Mirrors the parts of `django.core.paginator.Page` the templates use, plus
+    the opaque tokens for the neighbouring pages.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list: List[Any], next_cursor: Optional[str],
+                 previous_cursor: Optional[str]) -> None:
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self) -> int:
+        return len(self.object_list)
+
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+
+def paginate_by_cursor(queryset: QuerySet, fields: Sequence[str], page_size: int,
+                       token: Optional[str] = None) -> CursorPage:
+    """
+    Returns the page of `queryset` that follows (or precedes) `token`.
+
+    Each page is a single indexed range scan of `page_size + 1` rows ordered
+    by `fields`, so its cost does not depend on how deep the user has paged.
+    `fields` must be unique together for the ordering to be total.
+
+    Raises:
+        ValueError: If the token is malformed.
+    """
+    values, direction = decode_cursor(token) if token else (None, FORWARD)
+    if values is not None and len(values) != len(fields):
+        raise ValueError('Cursor inválido.')
+    forward = direction == FORWARD
+
+    ordering = fields if forward else [f'-{f}' for f in fields]
+    queryset = queryset.order_by(*ordering)
+    if values is not None:
+        queryset = queryset.filter(keyset_filter(fields, values, forward))
+
+    rows = list(queryset[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if not forward:
+        rows.reverse()
+
+    def boundary(obj, to):
+        # Rows are model instances, or dicts when the queryset uses values().
+        get = obj.get if isinstance(obj, dict) else partial(getattr, obj)
+        return encode_cursor([get(f) for f in fields], to)
+
+    next_cursor = previous_cursor = None
+    if rows:
+        if has_more or not forward:
+            next_cursor = boundary(rows[-1], FORWARD)
+        if (has_more and not forward) or (forward and values is not None):
+            previous_cursor = boundary(rows[0], BACKWARD)
+    return CursorPage(rows, next_cursor, previous_cursor)
+
+
+class CursorPaginationMixin:
+    """
+    Adds a keyset pagination mode to a paginated ListView.
+
+    The mode is enabled by the `cursor` querystring parameter; an empty value
+    requests the first page. Without it the view keeps Django's offset
+    pagination. Either way the remaining querystring is exposed to templates
+    as `querystring` so page links keep the current search and ordering.
+
+    Attributes:
+        cursor_ordering: Fields, unique together, the keyset is ordered on.
+        cursor_kwarg: Querystring parameter holding the token.
+    """
+    cursor_ordering: Tuple[str, ...] = ()
+    cursor_kwarg = 'cursor'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        params = self.request.GET.copy()
+        for key in (self.page_kwarg, self.cursor_kwarg):
+            params.pop(key, None)
+        context['querystring'] = f'{params.urlencode()}&' if params else ''
+        return context
+
+    def paginate_queryset(self, queryset, page_size):
+        if self.cursor_kwarg not in self.request.GET:
+            return super().paginate_queryset(queryset, page_size)
+        try:
+            page = paginate_by_cursor(
+                queryset, self.cursor_ordering, page_size,
+                self.request.GET.get(self.cursor_kwarg),
+            )
+        except ValueError as e:
+            raise Http404(str(e))
+        return (None, page, page.object_list, True)
@@ -0,0 +1,216 @@
+from datetime import date
+from decimal import Decimal
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from django.db.models import Q
+
+from .models import SEGURADORAS, ComissaoMensal
+
+
+# Longest range accepted, in months.
+MAX_MESES = 240
+# Months shown by the dashboard when no range is given.
+DASHBOARD_MESES = 36
+
+Mes = Tuple[int, int]
+
+
+class Totais:
+    """
+    Policy count, prêmio and comissão summed over a set of ledger rows.
+    """
+    def __init__(self) -> None:
+        self.quantidade = 0
+        self.premio = Decimal(0)
+        self.comissao = Decimal(0)
+
+    def somar(self, quantidade: int, premio: Decimal, comissao: Decimal) -> None:
+        self.quantidade += quantidade
+        self.premio += premio
+        self.comissao += comissao
+
+
+class RelatorioPeriodo:
+    """
+    Ledger totals of a range of months, broken down by month and seguradora.
+
+    Attributes:
+        inicio: First month of the range, as (ano, mes).
+        fim: Last month of the range, inclusive.
+        seguradoras: (codigo, nome) of every seguradora, in column order.
+        meses: One (ano, mes, [Totais per seguradora], Totais of the month)
+            per month of the range, months without policies included.
+        por_seguradora: Totais of each seguradora over the whole range.
+        total: Totais of the whole range.
+    """
+    def __init__(self, inicio: Mes, fim: Mes) -> None:
+        self.inicio = inicio
+        self.fim = fim
+        self.seguradoras = list(SEGURADORAS)
+        self.meses: List[tuple] = []
+        self.por_seguradora = [Totais() for _ in self.seguradoras]
+        self.total = Totais()
+
+    def linhas(self) -> Iterator[tuple]:
+        """
+        Yields (mês, seguradora, apólices, prêmio, comissão) for each month
+        and seguradora with policies, for the CSV export.
+        """
+        for ano, mes, celulas, _ in self.meses:
+            for (_, nome), celula in zip(self.seguradoras, celulas):
+                if celula.quantidade:
+                    yield f'{mes:02d}/{ano}', nome, celula.quantidade, celula.premio, celula.comissao
+
+
+def ler_mes(valor: Optional[str]) -> Optional[date]:
+    """
+    First day of a month given as AAAA-MM, as sent by <input type="month">,
+    or None if `valor` is missing or malformed.
+    """
+    try:
+        ano, mes = valor.split('-')
+        return date(int(ano), int(mes), 1)
+    except (AttributeError, ValueError):
+        return None
+
+
+def meses_entre(inicio: Mes, fim: Mes) -> Iterator[Mes]:
+    ano, mes = inicio
+    while (ano, mes) <= fim:
+        yield ano, mes
+        ano, mes = (ano + 1, 1) if mes == 12 else (ano, mes + 1)
+
+
+def _intervalo(inicio: date, fim: date) -> Tuple[Mes, Mes]:
+    de, ate = (inicio.year, inicio.month), (fim.year, fim.month)
+    if ate < de:
+        raise ValueError('O fim do período é anterior ao início.')
+    if (ate[0] - de[0]) * 12 + ate[1] - de[1] >= MAX_MESES:
+        raise ValueError(f'O período pode ter no máximo {MAX_MESES} meses.')
+    return de, ate
+
+
+def _do_periodo(de: Mes, ate: Mes):
+    # Range scan on the (ano, mes, seguradora) unique index.
+    return ComissaoMensal.objects.filter(
+        Q(ano__gt=de[0]) | Q(ano=de[0], mes__gte=de[1]),
+        Q(ano__lt=ate[0]) | Q(ano=ate[0], mes__lte=ate[1]),
+    )
+
+
+def relatorio_periodo(inicio: date, fim: date) -> RelatorioPeriodo:
+    """
+    Totals per month and seguradora from the first month of `inicio` to the
+    last month of `fim`, inclusive.
+
+    Reads only the ComissaoMensal ledger in a single query, a range scan on
+    its (ano, mes, seguradora) unique index of at most one row per month and
+    seguradora, so its cost depends on the length of the range and not on
+    the number of policies.
+
+    Raises:
+        ValueError: If `fim` precedes `inicio` or the range exceeds MAX_MESES.
+    """
+    de, ate = _intervalo(inicio, fim)
+    linhas = _do_periodo(de, ate).values_list(
+        'ano', 'mes', 'seguradora', 'quantidade', 'total_premio', 'total_comissao'
+    )
+
+    relatorio = RelatorioPeriodo(de, ate)
+    coluna = {codigo: i for i, (codigo, _) in enumerate(relatorio.seguradoras)}
+    celulas: Dict[tuple, Totais] = {}
+    for ano, mes, seguradora, quantidade, premio, comissao in linhas:
+        if seguradora not in coluna:
+            continue
+        celulas.setdefault((ano, mes, seguradora), Totais()).somar(quantidade, premio, comissao)
+
+    for ano, mes in meses_entre(de, ate):
+        do_mes = []
+        total_mes = Totais()
+        for codigo, _ in relatorio.seguradoras:
+            celula = celulas.get((ano, mes, codigo), Totais())
+            do_mes.append(celula)
+            total_mes.somar(celula.quantidade, celula.premio, celula.comissao)
+            relatorio.por_seguradora[coluna[codigo]].somar(celula.quantidade, celula.premio, celula.comissao)
+        relatorio.total.somar(total_mes.quantidade, total_mes.premio, total_mes.comissao)
+        relatorio.meses.append((ano, mes, do_mes, total_mes))
+    return relatorio
+
+
+def _centavos(valor) -> float:
+    return float(round(Decimal(valor), 2))
+
+
+def serie_mensal(inicio: date, fim: date) -> dict:
+    """
+    Month-by-month series per seguradora for the dashboard charts, read
+    from the ComissaoMensal ledger in a single query like `relatorio_periodo`.
+
+    The result is column-oriented so it serializes to a few flat JSON arrays:
+    each metric holds one list per seguradora, aligned with `meses`. Amounts
+    are rounded to cents, and `media_perc` is None in months without policies.
+
+    Returns:
+        {'meses': ['AAAA-MM', ...], 'seguradoras': [[codigo, nome], ...],
+        'quantidade': [[...], ...], 'premio': [[...], ...],
+        'comissao': [[...], ...], 'media_perc': [[...], ...]}
+
+    Raises:
+        ValueError: If `fim` precedes `inicio` or the range exceeds MAX_MESES.
+    """
+    de, ate = _intervalo(inicio, fim)
+    meses = list(meses_entre(de, ate))
+    posicao = {mes: i for i, mes in enumerate(meses)}
+    seguradoras = [list(seguradora) for seguradora in SEGURADORAS]
+    coluna = {codigo: i for i, (codigo, _) in enumerate(seguradoras)}
+
+    def vazia() -> List[list]:
+        return [[0] * len(meses) for _ in seguradoras]
+
+    quantidade, premio, comissao, soma_perc = vazia(), vazia(), vazia(), vazia()
+    linhas = _do_periodo(de, ate).values_list(
+        'ano', 'mes', 'seguradora', 'quantidade', 'total_premio', 'total_comissao',
+        'soma_perc_comissao',
+    )
+    for ano, mes, seguradora, qtd, total_premio, total_comissao, perc in linhas:
+        if seguradora not in coluna:
+            continue
+        i, j = coluna[seguradora], posicao[(ano, mes)]
+        quantidade[i][j] += qtd
+        premio[i][j] += total_premio
+        comissao[i][j] += total_comissao
+        soma_perc[i][j] += perc
+
+    return {
+        'meses': [f'{ano}-{mes:02d}' for ano, mes in meses],
+        'seguradoras': seguradoras,
+        'quantidade': quantidade,
+        'premio': [[_centavos(valor) for valor in linha] for linha in premio],
+        'comissao': [[_centavos(valor) for valor in linha] for linha in comissao],
+        'media_perc': [
+            [round(perc / qtd, 2) if qtd else None for perc, qtd in zip(percs, qtds)]
+            for percs, qtds in zip(soma_perc, quantidade)
+        ],
+    }
+
+
+def periodo_dashboard(de: Optional[str], ate: Optional[str],
+                      hoje: Optional[date] = None) -> Tuple[date, date]:
+    """
+    Range of the dashboard from its `de` and `ate` parameters (AAAA-MM). A
+    missing `ate` means the current month and a missing `de` the
+    DASHBOARD_MESES months up to `ate`.
+
+    Raises:
+        ValueError: If a parameter is malformed.
+    """
+    fim = ler_mes(ate) if ate else (hoje or date.today()).replace(day=1)
+    if fim is None:
+        raise ValueError('Mês final inválido, use AAAA-MM.')
+    if not de:
+        indice = fim.year * 12 + fim.month - DASHBOARD_MESES
+        return date(indice // 12, indice % 12 + 1, 1), fim
+    inicio = ler_mes(de)
+    if inicio is None:
+        raise ValueError('Mês inicial inválido, use AAAA-MM.')
+    return inicio, fim
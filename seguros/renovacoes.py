@@ -0,0 +1,158 @@
+from datetime import date, timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Exists, OuterRef, QuerySet
+from django.utils import timezone
+
+from .models import Apolice, Renovacao
+
+
+BATCH_SIZE = 500
+
+
+class ResultadoRenovacoes:
+    """
+    Counters of a `processar` run.
+
+    Attributes:
+        enfileiradas: Policies added to the queue.
+        renovadas: Entries closed because the vehicle has a newer policy.
+        avisadas: Reminders processed, with or without an e-mail sent.
+        emails: E-mails sent to segurados.
+    """
+    def __init__(self) -> None:
+        self.enfileiradas = 0
+        self.renovadas = 0
+        self.avisadas = 0
+        self.emails = 0
+
+
+def limite(dias: Optional[int] = None, hoje: Optional[date] = None) -> date:
+    """
+    Last vigência inside the renewal window, `RENOVACAO_ANTECEDENCIA` days
+    from today by default.
+    """
+    if dias is None:
+        dias = getattr(settings, 'RENOVACAO_ANTECEDENCIA', 30)
+    return (hoje or date.today()) + timedelta(days=dias)
+
+
+def em_aberto(ate: date) -> QuerySet:
+    """
+    Queue entries not yet renewed with vencimento up to `ate`, overdue ones
+    included; served by the renovacao_aberta_idx partial index.
+    """
+    return Renovacao.objects.exclude(status=Renovacao.RENOVADA).filter(vencimento__lte=ate)
+
+
+def enfileirar(hoje: date, ate: date, batch_size: int = BATCH_SIZE) -> int:
+    """
+    Adds the policies with vigência between `hoje` and `ate` that are not
+    queued yet, reading them through the (vigencia, codigo) index.
+
+    Returns:
+        Number of entries created.
+    """
+    novas = Apolice.objects.filter(
+        vigencia__gte=hoje, vigencia__lte=ate, renovacao__isnull=True
+    ).order_by('vigencia', 'codigo').values_list('codigo', 'vigencia')
+
+    criadas = 0
+    while lote := list(novas[:batch_size]):
+        # ignore_conflicts: another run may have queued the same policy.
+        Renovacao.objects.bulk_create(
+            [Renovacao(apolice_id=codigo, vencimento=vigencia) for codigo, vigencia in lote],
+            ignore_conflicts=True,
+        )
+        criadas += len(lote)
+    return criadas
+
+
+def marcar_renovadas() -> int:
+    """
+    Closes the open entries whose vehicle already has a policy with a later
+    vigência, so brokers are not reminded of policies they have renewed.
+
+    Returns:
+        Number of entries closed.
+    """
+    posterior = Apolice.objects.filter(
+        veiculo=OuterRef('apolice__veiculo'), vigencia__gt=OuterRef('vencimento')
+    )
+    return Renovacao.objects.exclude(status=Renovacao.RENOVADA).filter(
+        Exists(posterior)
+    ).update(status=Renovacao.RENOVADA)
+
+
+def _mensagem(renovacao: Renovacao) -> Optional[EmailMessage]:
+    apolice = renovacao.apolice
+    if not apolice.segurado.email:
+        return None
+    return EmailMessage(
+        subject=f'Renovação do seguro do veículo {apolice.veiculo.placa}',
+        body=(f'Olá, {apolice.segurado.nome}.\n\n'
+              f'A apólice {apolice.codigo} ({apolice.get_seguradora_display()}) do veículo '
+              f'{apolice.veiculo.modelo} {apolice.veiculo.placa} vence em '
+              f'{renovacao.vencimento:%d/%m/%Y}. Entre em contato para renová-la.\n'),
+        to=[apolice.segurado.email],
+    )
+
+
+def avisar(ate: date, batch_size: int = BATCH_SIZE,
+           resultado: Optional[ResultadoRenovacoes] = None) -> ResultadoRenovacoes:
+    """
+    Sends the reminders of pending entries with vencimento up to `ate`,
+    `batch_size` at a time.
+
+    Each batch is locked with SKIP LOCKED and marked as avisada in a short
+    transaction before any e-mail goes out, so several workers can run at
+    once and a failure halfway through a batch never reminds anyone twice.
+    If sending fails, the entries not yet sent go back to pending and the
+    error is raised.
+    """
+    resultado = resultado or ResultadoRenovacoes()
+    pendentes = Renovacao.objects.filter(
+        status=Renovacao.PENDENTE, vencimento__lte=ate
+    ).select_related('apolice__segurado', 'apolice__veiculo').order_by('vencimento')
+    conexao = get_connection()
+
+    while True:
+        with transaction.atomic():
+            lote = list(pendentes.select_for_update(skip_locked=True, of=('self',))[:batch_size])
+            if not lote:
+                break
+            Renovacao.objects.filter(pk__in=[r.pk for r in lote]).update(
+                status=Renovacao.AVISADA, avisada_em=timezone.now()
+            )
+        enviadas = 0
+        try:
+            with conexao:
+                for renovacao in lote:
+                    mensagem = _mensagem(renovacao)
+                    if mensagem is not None:
+                        resultado.emails += conexao.send_messages([mensagem]) or 0
+                    enviadas += 1
+        except Exception:
+            Renovacao.objects.filter(pk__in=[r.pk for r in lote[enviadas:]]).update(
+                status=Renovacao.PENDENTE, avisada_em=None
+            )
+            raise
+        resultado.avisadas += len(lote)
+    return resultado
+
+
+def processar(dias: Optional[int] = None, hoje: Optional[date] = None,
+              batch_size: int = BATCH_SIZE) -> ResultadoRenovacoes:
+    """
+    Runs the renewal pipeline: queues the policies entering the window,
+    closes the renewed ones and sends the due reminders.
+    """
+    hoje = hoje or date.today()
+    ate = limite(dias, hoje)
+    resultado = ResultadoRenovacoes()
+    resultado.enfileiradas = enfileirar(hoje, ate, batch_size)
+    resultado.renovadas = marcar_renovadas()
+    return avisar(ate, batch_size, resultado)
@@ -0,0 +1,54 @@
+import random
+from contextvars import ContextVar
+from typing import Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+
+class Leitura:
+    """
+    Per-request routing decision, filled in by ReplicaMiddleware.
+
+    Kept as a mutable object inside the ContextVar because Django may run the
+    middleware's `process_view` in a copy of the request's context.
+    """
+    def __init__(self) -> None:
+        self.replica = False
+
+
+leitura_atual: ContextVar[Optional[Leitura]] = ContextVar('seguros_leitura', default=None)
+
+
+def ler_da_replica(view):
+    """
+    Marks a view whose GET requests may read from a replica.
+    """
+    view.ler_da_replica = True
+    return view
+
+
+class ReplicaRouter:
+    """
+    Sends reads of the seguros models to a random replica while serving a view
+    marked with `ler_da_replica`; every other read and every write goes to
+    the primary.
+
+    Replicas are the aliases listed in `DATABASE_REPLICAS`. Other apps'
+    models (sessions, auth) always stay on the primary, since they are read
+    right after being written.
+    """
+    def db_for_read(self, model, **hints):
+        leitura = leitura_atual.get()
+        if leitura is None or not leitura.replica or model._meta.app_label != 'seguros':
+            return None
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        bancos = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in bancos and obj2._state.db in bancos:
+            return True
+        return None
@@ -0,0 +1,160 @@
+import unicodedata
+
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db.models import CharField, Func, Q, QuerySet
+from django.db.models.functions import Collate, Greatest, Lower
+
+
+UNACCENT_FUNCTION = 'seguros_unaccent'
+SEPARADORES_CPF = ('.', '-', ' ')
+
+
+class Unaccent(Func):
+    """
+    Strips diacritics from a text expression.
+
+    On Postgres this calls the IMMUTABLE wrapper around `unaccent()` created by
+    migration 0003, which is also the expression the trigram GIN indexes are
+    built on. On SQLite the same name is registered as a Python function.
+    """
+    function = UNACCENT_FUNCTION
+    output_field = CharField()
+
+
+class OrdemBinaria(Collate):
+    """
+    Orders a text expression byte by byte (`COLLATE "C"`), the order of the
+    prefix indexes from migration 0016, so `ORDER BY ... LIMIT` walks the
+    index instead of sorting every match in the database's collation.
+
+    SQLite already compares text byte by byte, so there it is a no-op.
+    """
+    def __init__(self, expression):
+        super().__init__(expression, 'C')
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return compiler.compile(self.get_source_expressions()[0])
+
+
+def normalize(text: str) -> str:
+    """
+    Lowercases `text` and removes its accents, so "João" becomes "joao".
+    """
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def searchable(field: str) -> Unaccent:
+    """
+    Returns the indexed search expression for `field`.
+    """
+    return Unaccent(Lower(field))
+
+
+class Digitos(Func):
+    """
+    A text expression without the separators of a formatted CPF, so
+    "123456789-01" becomes "12345678901". Indexed on Segurado.cpf as
+    segurado_cpf_digitos_idx.
+
+    The separators are written into the SQL rather than passed as
+    parameters: SQLite only uses an expression index when the query spells
+    the expression exactly like the index does.
+    """
+    output_field = CharField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        sql, params = compiler.compile(self.source_expressions[0])
+        for separador in SEPARADORES_CPF:
+            sql = f"REPLACE({sql}, '{separador}', '')"
+        return sql, params
+
+
+def _trigrams(text: str) -> set:
+    trigrams = set()
+    for word in normalize(text).split():
+        padded = f'  {word} '
+        trigrams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return trigrams
+
+
+def similarity(a: str, b: str) -> float:
+    """
+    Python port of pg_trgm's `similarity()`, used as the SQLite fallback.
+    """
+    if a is None or b is None:
+        return 0.0
+    ta, tb = _trigrams(a), _trigrams(b)
+    if not ta or not tb:
+        return 0.0
+    return len(ta & tb) / len(ta | tb)
+
+
+def register_sqlite_functions(sender, connection, **kwargs) -> None:
+    """
+    `connection_created` receiver that provides the Postgres search functions
+    on SQLite, so test runs exercise the same queries.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    connection.connection.create_function(
+        UNACCENT_FUNCTION, 1, lambda text: None if text is None else normalize(text),
+        deterministic=True,
+    )
+    connection.connection.create_function('SIMILARITY', 2, similarity, deterministic=True)
+
+
+def search_apolices(queryset: QuerySet, term: str) -> QuerySet:
+    """
+    Filters Apolice by segurado name, codigo or exact vehicle plate, most
+    relevant first.
+
+    Name and plate matches run as subqueries so each branch of the OR can
+    use its own index instead of scanning the join.
+    """
+    from .models import Segurado, Veiculo, normalizar_identificacao
+
+    placa = normalizar_identificacao(term.strip())
+    term = normalize(term)
+    segurados = Segurado.objects.annotate(
+        nome_busca=searchable('nome')
+    ).filter(nome_busca__contains=term).values('id')
+    veiculos = Veiculo.objects.filter(placa=placa).values('id')
+
+    return queryset.annotate(
+        codigo_busca=searchable('codigo'),
+        relevancia=Greatest(
+            TrigramSimilarity(searchable('segurado__nome'), term),
+            TrigramSimilarity(searchable('codigo'), term),
+        ),
+    ).filter(
+        Q(segurado__in=segurados) | Q(codigo_busca__contains=term) | Q(veiculo__in=veiculos)
+    ).order_by('-relevancia', 'codigo')
+
+
+def search_segurados(queryset: QuerySet, term: str) -> QuerySet:
+    """
+    Filters Segurado by name, or by CPF when the term is a CPF, most
+    relevant first.
+    """
+    cpf = ''.join(c for c in term if c.isdigit())
+    if len(cpf) == 11 and not any(c.isalpha() for c in term):
+        # CPFs are stored as typed, with or without punctuation.
+        return queryset.annotate(cpf_digitos=Digitos('cpf')).filter(
+            cpf_digitos=cpf
+        ).order_by('nome', 'id')
+
+    term = normalize(term)
+    return queryset.annotate(
+        nome_busca=searchable('nome'),
+        relevancia=TrigramSimilarity(searchable('nome'), term),
+    ).filter(nome_busca__contains=term).order_by('-relevancia', 'nome', 'id')
+
+
+def search_veiculos(queryset: QuerySet, term: str) -> QuerySet:
+    """
+    Filters Veiculo by exact plate, the vehicle criterion of `search_apolices`.
+    """
+    from .models import normalizar_identificacao
+
+    return queryset.filter(placa=normalizar_identificacao(term.strip()))
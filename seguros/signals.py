@@ -0,0 +1,100 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import ledger
+from .cache import descartar_linhas, invalidar_linhas, invalidar_relatorios, invalidar_segurados
+from .models import Apolice, Renovacao, Segurado, Veiculo
+
+
+_ledger_em_lote: ContextVar[bool] = ContextVar('seguros_ledger_em_lote', default=False)
+
+
+@contextmanager
+def ledger_em_lote():
+    """
+    Makes `remover_do_ledger` skip the policies deleted inside the block,
+    for callers that already took them out of the ledger, the cached rows
+    and the segurado pages in bulk (see seguros.em_massa.excluir).
+    """
+    token = _ledger_em_lote.set(True)
+    try:
+        yield
+    finally:
+        _ledger_em_lote.reset(token)
+
+
+@receiver(pre_save, sender=Apolice)
+def capturar_apolice_anterior(sender, instance, raw=False, **kwargs):
+    """
+    Remembers the stored version of the Apolice so its old contribution can
+    be taken out of the ledger once the new one is saved.
+    """
+    if raw:
+        return
+    instance._apolice_anterior = Apolice.objects.filter(pk=instance.pk).only(
+        'vigencia', 'seguradora', 'premio', 'perc_comissao', 'comissao', 'segurado'
+    ).first()
+
+
+@receiver(post_save, sender=Apolice)
+def reagendar_renovacao(sender, instance, raw=False, **kwargs):
+    """
+    Moves a queued renewal along with the policy's vigência and reopens it.
+    Connected before `atualizar_ledger`, which discards the stored version.
+    """
+    anterior = getattr(instance, '_apolice_anterior', None)
+    if raw or anterior is None:
+        return
+    vigencia = sender._meta.get_field('vigencia').to_python(instance.vigencia)
+    if vigencia != anterior.vigencia:
+        Renovacao.objects.filter(apolice=instance).update(
+            vencimento=vigencia, status=Renovacao.PENDENTE, avisada_em=None
+        )
+
+
+@receiver(post_save, sender=Apolice)
+def atualizar_ledger(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    anterior = getattr(instance, '_apolice_anterior', None)
+    if anterior is not None:
+        ledger.apply(anterior, sign=-1)
+    ledger.apply(instance)
+    invalidar_segurados({instance.segurado_id, getattr(anterior, 'segurado_id', instance.segurado_id)})
+    instance._apolice_anterior = None
+
+
+@receiver(post_delete, sender=Apolice)
+def remover_do_ledger(sender, instance, **kwargs):
+    if _ledger_em_lote.get():
+        return
+    ledger.apply(instance, sign=-1)
+    descartar_linhas(instance.codigo, instance.versao)
+    invalidar_segurados([instance.segurado_id])
+
+
+def _invalidar_relatorios_de(**filtros):
+    # Cached reports hold the segurado and veiculo of each policy.
+    meses = Apolice.objects.filter(**filtros).dates('vigencia', 'month')
+    invalidar_relatorios((mes.year, mes.month) for mes in meses)
+
+
+@receiver(post_save, sender=Segurado)
+def invalidar_linhas_do_segurado(sender, instance, created=False, raw=False, **kwargs):
+    """
+    The policy rows show the segurado's name and phone; an Apolice invalidates
+    its own rows by bumping `versao` on save.
+    """
+    if not (created or raw):
+        invalidar_linhas(segurado=instance)
+        _invalidar_relatorios_de(segurado=instance)
+
+
+@receiver(post_save, sender=Veiculo)
+def invalidar_linhas_do_veiculo(sender, instance, created=False, raw=False, **kwargs):
+    if not (created or raw):
+        invalidar_linhas(veiculo=instance)
+        _invalidar_relatorios_de(veiculo=instance)
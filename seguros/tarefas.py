@@ -0,0 +1,227 @@
+import logging
+import os
+import threading
+import traceback
+from contextlib import contextmanager, suppress
+from datetime import timedelta
+from typing import Callable, Dict, Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import ledger
+from .deduplicacao import mesclar_duplicados
+from .importacao import importar_csv
+from .models import Tarefa
+from .renovacoes import processar
+
+
+logger = logging.getLogger('seguros.tarefas')
+
+# Handlers by Tarefa.tipo, registered with @tarefa.
+TAREFAS: Dict[str, Callable[..., str]] = {}
+
+
+def tarefa(nome: str):
+    """
+    Registers the decorated function as the handler of jobs of type `nome`.
+
+    Handlers receive an `Execucao` followed by the job's `parametros` as
+    keyword arguments, and return the message shown once the job completes.
+    They may run more than once, so they must be safe to retry.
+    """
+    def registrar(funcao):
+        TAREFAS[nome] = funcao
+        return funcao
+    return registrar
+
+
+def enfileirar(tipo: str, max_tentativas: int = 3, **parametros) -> Tarefa:
+    """
+    Creates a pending job; `parametros` must be JSON-serializable.
+
+    Raises:
+        ValueError: If no handler is registered for `tipo`.
+    """
+    if tipo not in TAREFAS:
+        raise ValueError(f'Tarefa desconhecida: {tipo}.')
+    return Tarefa.objects.create(tipo=tipo, parametros=parametros, max_tentativas=max_tentativas)
+
+
+def _tempo_limite() -> timedelta:
+    return timedelta(seconds=getattr(settings, 'TAREFAS_TEMPO_LIMITE', 600))
+
+
+def _atual(tarefa: Tarefa):
+    # Matches only while this worker still holds the job: once its lease
+    # expires and another worker takes it over, `tentativas` moves on.
+    return Tarefa.objects.filter(pk=tarefa.pk, status=Tarefa.EXECUTANDO, tentativas=tarefa.tentativas)
+
+
+class Execucao:
+    """
+    Handle a job's handler uses to report progress and its result.
+
+    Attributes:
+        tarefa: The job being run.
+        resultado: JSON-serializable data stored with the job on success.
+    """
+    def __init__(self, tarefa: Tarefa) -> None:
+        self.tarefa = tarefa
+        self.resultado = None
+
+    @property
+    def ultima_tentativa(self) -> bool:
+        return self.tarefa.tentativas >= self.tarefa.max_tentativas
+
+    def progresso(self, feitos: int, total: Optional[int] = None, mensagem: str = '') -> None:
+        """
+        Records progress; the lease itself is renewed by `executar`.
+        """
+        campos = {'feitos': feitos}
+        if total is not None:
+            campos['total'] = total
+        if mensagem:
+            campos['mensagem'] = mensagem[:200]
+        _atual(self.tarefa).update(**campos)
+
+
+@contextmanager
+def _mantendo_reserva(tarefa: Tarefa):
+    """
+    Renews the job's lease every third of TAREFAS_TEMPO_LIMITE from a
+    background thread while the block runs, so a long handler that reports
+    no progress is not taken over by another worker while still alive.
+    """
+    parar = threading.Event()
+
+    def renovar():
+        try:
+            while not parar.wait(_tempo_limite().total_seconds() / 3):
+                try:
+                    _atual(tarefa).update(executar_em=timezone.now() + _tempo_limite())
+                except Exception:
+                    # Retried on the next beat, well before the lease runs out.
+                    logger.exception('Falha ao renovar a reserva da tarefa %s.', tarefa)
+                    connection.close()
+        finally:
+            connection.close()
+
+    pulso = threading.Thread(target=renovar, name=f'{threading.current_thread().name}-reserva',
+                             daemon=True)
+    pulso.start()
+    try:
+        yield
+    finally:
+        parar.set()
+        pulso.join()
+
+
+def reservar() -> Optional[Tarefa]:
+    """
+    Takes the next due job, or one whose lease expired, and marks it as
+    running under a new lease.
+
+    The row is read with `FOR UPDATE SKIP LOCKED`, so concurrent workers
+    each take a different job without waiting on one another. A job that
+    expired on its last attempt is marked as failed instead.
+
+    Returns:
+        The job to run, or None when the queue is empty.
+    """
+    while True:
+        agora = timezone.now()
+        with transaction.atomic():
+            tarefa = Tarefa.objects.select_for_update(skip_locked=True).filter(
+                status__in=(Tarefa.PENDENTE, Tarefa.EXECUTANDO), executar_em__lte=agora
+            ).order_by('executar_em', 'id').first()
+            if tarefa is None:
+                return None
+            if tarefa.status == Tarefa.EXECUTANDO and tarefa.tentativas >= tarefa.max_tentativas:
+                tarefa.status = Tarefa.FALHOU
+                tarefa.erro = 'Tempo limite excedido.'
+                tarefa.concluida_em = agora
+                tarefa.save(update_fields=['status', 'erro', 'concluida_em'])
+                continue
+            tarefa.status = Tarefa.EXECUTANDO
+            tarefa.tentativas += 1
+            tarefa.executar_em = agora + _tempo_limite()
+            tarefa.save(update_fields=['status', 'tentativas', 'executar_em'])
+            return tarefa
+
+
+def executar(tarefa: Tarefa) -> None:
+    """
+    Runs a reserved job and records its outcome, keeping its lease while
+    the handler runs.
+
+    A failed job goes back to the queue after `TAREFAS_ESPERA * 2 ** n`
+    seconds, n being the attempts so far, until `max_tentativas` is reached.
+    """
+    execucao = Execucao(tarefa)
+    try:
+        with _mantendo_reserva(tarefa):
+            mensagem = TAREFAS[tarefa.tipo](execucao, **tarefa.parametros)
+    except Exception:
+        erro = traceback.format_exc()
+        logger.exception('Tarefa %s falhou na tentativa %s.', tarefa, tarefa.tentativas)
+        agora = timezone.now()
+        if execucao.ultima_tentativa:
+            _atual(tarefa).update(status=Tarefa.FALHOU, erro=erro, concluida_em=agora)
+        else:
+            espera = getattr(settings, 'TAREFAS_ESPERA', 30) * 2 ** (tarefa.tentativas - 1)
+            _atual(tarefa).update(status=Tarefa.PENDENTE, erro=erro,
+                                  executar_em=agora + timedelta(seconds=espera))
+        return
+
+    _atual(tarefa).update(
+        status=Tarefa.CONCLUIDA, mensagem=(mensagem or '')[:200], resultado=execucao.resultado,
+        erro='', concluida_em=timezone.now(),
+    )
+
+
+@tarefa('importar_apolices')
+def importar_apolices(execucao: Execucao, caminho: str, delimitador: str = ';') -> str:
+    """
+    Imports a CSV saved by the importar_apolices view, then deletes it. On a
+    retry, rows written by the failed attempt are reported as existing.
+    """
+    concluida = False
+    try:
+        with open(caminho, encoding='utf-8-sig', newline='') as arquivo:
+            total = max(0, sum(1 for _ in arquivo) - 1)
+            arquivo.seek(0)
+            resultado = importar_csv(
+                arquivo, delimiter=delimitador,
+                progresso=lambda r: execucao.progresso(r.lidas, total, f'{r.importadas} importadas'),
+            )
+        concluida = True
+    finally:
+        if concluida or execucao.ultima_tentativa:
+            with suppress(FileNotFoundError):
+                os.remove(caminho)
+    execucao.resultado = {'erros': resultado.erros[:1000]}
+    return (f'{resultado.importadas} de {resultado.lidas} apólices importadas, '
+            f'{len(resultado.erros)} linhas com erro.')
+
+
+@tarefa('recalcular_comissoes')
+def recalcular_comissoes(execucao: Execucao, ano: Optional[int] = None,
+                         mes: Optional[int] = None) -> str:
+    return f'{ledger.rebuild(ano=ano, mes=mes)} linhas de comissão recalculadas.'
+
+
+@tarefa('deduplicar_veiculos')
+def deduplicar_veiculos(execucao: Execucao) -> str:
+    removidos = mesclar_duplicados(
+        progresso=lambda feitos: execucao.progresso(feitos, mensagem=f'{feitos} removidos')
+    )
+    return f'{removidos} veículos duplicados mesclados.'
+
+
+@tarefa('processar_renovacoes')
+def processar_renovacoes(execucao: Execucao, dias: Optional[int] = None) -> str:
+    resultado = processar(dias)
+    return (f'{resultado.enfileiradas} apólices enfileiradas, {resultado.renovadas} renovadas, '
+            f'{resultado.avisadas} avisos.')
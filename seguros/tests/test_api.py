@@ -0,0 +1,169 @@
+import json
+from unittest import mock
+
+from django.test import TestCase, Client
+from django.urls import reverse
+from seguros.autocomplete import LRU_TTL, CacheLRU, lru
+from seguros.models import Segurado, Veiculo, Apolice
+
+
+class ApiTest(TestCase):
+
+    def setUp(self) -> None:
+        self.joao = Segurado.objects.create(
+            nome = 'João Silva',
+            nascimento = '2000-01-01',
+            telefone = 'TesteTelefone',            
+            cpf = '12345678901',
+            endereco = 'TesteEndereço',
+            estado_civil = 'NI'
+        )
+        maria = Segurado.objects.create(
+            nome = 'Maria Souza',
+            nascimento = '2000-01-01',
+            telefone = 'TesteTelefone',            
+            cpf = '98765432100',
+            endereco = 'TesteEndereço',
+            estado_civil = 'NI'
+        )
+        for i in range(5):
+            veiculo = Veiculo.objects.create(
+                modelo = 'TestModelo1',
+                placa = f'ABC123{i}',
+                chassi = 'TestChassi1',
+                ano_modelo = 2000,
+                alienado = False
+            )
+            Apolice.objects.create(
+                segurado = self.joao if i % 2 else maria,
+                veiculo = veiculo,
+                codigo = f'Codigo{i}',
+                seguradora = 'BR',
+                vigencia = f'2022-0{i + 1}-01',
+                premio = 1000.00,
+                perc_comissao = 10,
+            )
+        self.client = Client()
+
+    def get_json(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(b''.join(response.streaming_content) if response.streaming else response.content)
+
+    def test_pages_follow_cursor_with_one_query_each(self):
+        url = reverse('api_apolices')
+        codigos = []
+        with self.assertNumQueries(1):
+            pagina = self.get_json(url, limit=2, fields='codigo,segurado_nome')
+        while True:
+            codigos += [linha['codigo'] for linha in pagina['results']]
+            if not pagina['next']:
+                break
+            pagina = self.get_json(pagina['next'])
+
+        self.assertEqual(codigos, [f'Codigo{i}' for i in range(5)])
+        self.assertEqual(pagina['results'][0], {'codigo': 'Codigo4', 'segurado_nome': 'Maria Souza'})
+        self.assertIsNotNone(pagina['previous'])
+
+    def test_default_fields_serialize_decimals_and_dates(self):
+        linha = self.get_json(reverse('api_apolices'), limit=1)['results'][0]
+
+        self.assertEqual(linha['vigencia'], '2022-01-01')
+        self.assertEqual(linha['premio'], '1000.00')
+        self.assertEqual(linha['placa'], 'ABC1230')
+
+    def test_search_matches_html_views(self):
+        apolices = self.get_json(reverse('api_apolices'), search='joao', fields='codigo')['results']
+        segurados = self.get_json(reverse('api_segurados'), search='123.456.789-01')['results']
+        veiculos = self.get_json(reverse('api_veiculos'), search='abc1232')['results']
+
+        self.assertEqual([a['codigo'] for a in apolices], ['Codigo1', 'Codigo3'])
+        self.assertEqual([s['nome'] for s in segurados], ['João Silva'])
+        self.assertEqual([v['placa'] for v in veiculos], ['ABC1232'])
+
+    def test_cpf_search_ignores_punctuation_of_stored_cpfs(self):
+        Segurado.objects.filter(pk=self.joao.pk).update(cpf='123456789-01')
+
+        for termo in ('12345678901', '123.456.789-01'):
+            segurados = self.get_json(reverse('api_segurados'), search=termo)['results']
+            self.assertEqual([s['nome'] for s in segurados], ['João Silva'])
+
+    def test_detail_endpoints(self):
+        apolice = self.get_json(reverse('api_apolice', kwargs={'pk': 'Codigo1'}), fields='segurado')
+        segurado = self.get_json(reverse('api_segurado', kwargs={'pk': self.joao.pk}), fields='nome')
+
+        self.assertEqual(apolice, {'segurado': self.joao.pk})
+        self.assertEqual(segurado, {'nome': 'João Silva'})
+        self.assertEqual(self.client.get(reverse('api_apolice', kwargs={'pk': 'Nada'})).status_code, 404)
+
+    def test_invalid_field_or_cursor_returns_400(self):
+        self.assertEqual(self.client.get(reverse('api_apolices'), {'fields': 'senha'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('api_apolices'), {'cursor': 'xx'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('api_veiculos'), {'limit': '0'}).status_code, 400)
+
+    def test_autocomplete_matches_prefixes_ignoring_accents_and_case(self):
+        lru.limpar()
+        dados = self.get_json(reverse('api_autocomplete'), q='joa')
+        self.assertEqual([s['nome'] for s in dados['segurados']], ['João Silva'])
+
+        dados = self.get_json(reverse('api_autocomplete'), q='codigo1')
+        self.assertEqual([a['codigo'] for a in dados['apolices']], ['Codigo1'])
+
+        dados = self.get_json(reverse('api_autocomplete'), q='abc12')
+        self.assertEqual(len(dados['placas']), 5)
+
+    def test_hyphenated_plate_is_found(self):
+        lru.limpar()
+        dados = self.get_json(reverse('api_autocomplete'), q='abc-123')
+        self.assertEqual(len(dados['placas']), 5)
+
+        veiculos = self.get_json(reverse('api_veiculos'), search='abc-1232')['results']
+        apolices = self.get_json(reverse('api_apolices'), search='ABC 1232', fields='codigo')['results']
+
+        self.assertEqual([v['placa'] for v in veiculos], ['ABC1232'])
+        self.assertEqual([a['codigo'] for a in apolices], ['Codigo2'])
+
+    def test_autocomplete_short_terms_return_nothing_without_queries(self):
+        with self.assertNumQueries(0):
+            dados = self.get_json(reverse('api_autocomplete'), q='j')
+        self.assertEqual(dados, {'segurados': [], 'apolices': [], 'placas': []})
+
+    def test_autocomplete_hot_and_refined_prefixes_are_served_from_lru(self):
+        lru.limpar()
+        with self.assertNumQueries(3):
+            self.get_json(reverse('api_autocomplete'), q='ab')
+        with self.assertNumQueries(0):
+            self.get_json(reverse('api_autocomplete'), q='ab')
+        with self.assertNumQueries(0):
+            dados = self.get_json(reverse('api_autocomplete'), q='abc1232')
+        self.assertEqual([p['placa'] for p in dados['placas']], ['ABC1232'])
+
+    def test_autocomplete_refined_prefix_expires_with_its_source(self):
+        lru.limpar()
+        with mock.patch('seguros.autocomplete.time.monotonic', return_value=1000.0):
+            self.get_json(reverse('api_autocomplete'), q='ab')
+        with mock.patch('seguros.autocomplete.time.monotonic', return_value=1000.0 + LRU_TTL - 1):
+            self.get_json(reverse('api_autocomplete'), q='abc')
+        with mock.patch('seguros.autocomplete.time.monotonic', return_value=1000.0 + LRU_TTL + 1):
+            with self.assertNumQueries(3):
+                self.get_json(reverse('api_autocomplete'), q='abc')
+
+
+class CacheLRUTest(TestCase):
+
+    def test_evicts_least_recently_used(self):
+        cache = CacheLRU(tamanho=2)
+        cache.guardar('a', 1)
+        cache.guardar('b', 2)
+        cache.obter('a')
+        cache.guardar('c', 3)
+
+        self.assertEqual(cache.obter('a'), 1)
+        self.assertIsNone(cache.obter('b'))
+        self.assertEqual(cache.obter('c'), 3)
+
+    def test_entries_expire(self):
+        cache = CacheLRU(ttl=-1)
+        cache.guardar('a', 1)
+
+        self.assertIsNone(cache.obter('a'))
@@ -0,0 +1,183 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.db import connections
+from django.test import TestCase
+from core.postgresql_pool import base as postgresql_pool
+from seguros.management.commands import benchmark_conexoes
+from seguros.models import Segurado, Veiculo, Apolice, ComissaoMensal, Renovacao
+
+
+CABECALHO = ('nome;nascimento;telefone;email;cpf;endereco;estado_civil;modelo;placa;chassi;'
+             'ano_modelo;alienado;codigo;seguradora;vigencia;premio;perc_comissao\n')
+
+
+def linha_csv(codigo, cpf='11122233344', seguradora='BR', ano_modelo='2020'):
+    return (f'Fulano;1990-01-01;11999999999;;{cpf};Rua A;SL;Gol;ABC1234;9BW0000000000000;'
+            f'{ano_modelo};False;{codigo};{seguradora};2022-05-10;1000.00;10\n')
+
+
+class ImportarApolicesCommandTest(TestCase):
+
+    def setUp(self) -> None:
+        arquivo = tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8')
+        arquivo.write(CABECALHO)
+        arquivo.write(linha_csv('IMP1'))
+        arquivo.write(linha_csv('IMP2'))
+        arquivo.write(linha_csv('IMP3', seguradora='XX'))
+        arquivo.write(linha_csv('IMP1', cpf='99988877766'))
+        arquivo.write(linha_csv('IMP4', cpf='99988877766', ano_modelo='3000'))
+        arquivo.close()
+        self.caminho = arquivo.name
+        self.addCleanup(os.remove, self.caminho)
+
+    def test_valid_rows_are_imported_and_invalid_rows_reported(self):
+        out, err = StringIO(), StringIO()
+        call_command('importar_apolices', self.caminho, '--lote', '2', stdout=out, stderr=err)
+
+        self.assertEqual(sorted(Apolice.objects.values_list('codigo', flat=True)), ['IMP1', 'IMP2'])
+        self.assertIn('2 de 5 apólices importadas', out.getvalue())
+        self.assertIn('Linha 4: seguradora', err.getvalue())
+        self.assertIn('Linha 5: codigo', err.getvalue())
+        self.assertIn('Linha 6: ano_modelo', err.getvalue())
+
+    def test_segurado_with_same_cpf_and_vehicle_with_same_placa_are_reused(self):
+        call_command('importar_apolices', self.caminho, stdout=StringIO(), stderr=StringIO())
+
+        self.assertEqual(Segurado.objects.count(), 1)
+        self.assertEqual(Veiculo.objects.count(), 1)
+
+    def test_import_updates_comissao_and_ledger(self):
+        call_command('importar_apolices', self.caminho, stdout=StringIO(), stderr=StringIO())
+        linha = ComissaoMensal.objects.get(ano=2022, mes=5, seguradora='BR')
+
+        self.assertEqual(Apolice.objects.get(codigo='IMP1').comissao, 100)
+        self.assertEqual(linha.quantidade, 2)
+        self.assertEqual(linha.total_comissao, 200)
+
+
+class GerarDadosCommandTest(TestCase):
+
+    def test_generates_requested_volume_with_valid_choices(self):
+        call_command('gerar_dados', '--apolices', '130', '--lote', '50', stdout=StringIO())
+
+        self.assertEqual(Apolice.objects.count(), 130)
+        self.assertEqual(Veiculo.objects.count(), 130)
+        self.assertEqual(Segurado.objects.count(), 100)
+        for apolice in Apolice.objects.all()[:20]:
+            apolice.full_clean()
+        for segurado in Segurado.objects.all()[:20]:
+            segurado.full_clean()
+
+    def test_ledger_matches_generated_policies(self):
+        call_command('gerar_dados', '--apolices', '50', stdout=StringIO())
+        total = sum(ComissaoMensal.objects.values_list('quantidade', flat=True))
+
+        self.assertEqual(total, 50)
+
+
+class BenchmarkViewsCommandTest(TestCase):
+
+    def test_reports_every_view(self):
+        call_command('gerar_dados', '--apolices', '60', stdout=StringIO())
+        out = StringIO()
+        call_command('benchmark_views', '--repeticoes', '2', stdout=out)
+
+        for nome in ('index', 'clientes', 'ver_segurado', 'relatorio'):
+            self.assertIn(nome, out.getvalue())
+
+
+class BenchmarkConexoesCommandTest(TestCase):
+
+    def test_reports_per_request_view_latency(self):
+        call_command('gerar_dados', '--apolices', '30', stdout=StringIO())
+        out = StringIO()
+        call_command('benchmark_conexoes', '--repeticoes', '3', stdout=out)
+
+        self.assertIn('conexão nova index', out.getvalue())
+        self.assertIn('conexão nova ver_segurado', out.getvalue())
+
+    def test_requires_data(self):
+        with self.assertRaises(CommandError):
+            call_command('benchmark_conexoes', '--repeticoes', '3', stdout=StringIO())
+
+    def test_pooled_mode_swaps_and_restores_the_connections(self):
+        original = connections['default']
+        with benchmark_conexoes.Command().conexoes(postgresql_pool.DatabaseWrapper):
+            self.assertIsInstance(connections['default'], postgresql_pool.DatabaseWrapper)
+            self.assertEqual(connections['default'].settings_dict['NAME'], original.settings_dict['NAME'])
+        self.assertIs(connections['default'], original)
+
+
+class BenchmarkAutocompleteCommandTest(TestCase):
+
+    def test_reports_cold_and_warm_latency(self):
+        call_command('gerar_dados', '--apolices', '30', stdout=StringIO())
+        out = StringIO()
+        call_command('benchmark_autocomplete', '--repeticoes', '3', '--limite-ms', '10000', stdout=out)
+
+        self.assertIn('autocomplete frio', out.getvalue())
+        self.assertIn('autocomplete quente', out.getvalue())
+
+
+class DeduplicarVeiculosCommandTest(TestCase):
+
+    def setUp(self) -> None:
+        segurado = Segurado.objects.create(
+            nome = 'TesteNome',
+            nascimento = '2000-01-01',
+            telefone = 'TesteTelefone',
+            cpf = 'TesteCPF',
+            endereco = 'TesteEndereço',
+            estado_civil = 'NI'
+        )
+        # Written as they were before the unique constraint and normalization.
+        veiculos = Veiculo.objects.bulk_create([
+            Veiculo(modelo = 'Gol', placa = 'ABC1234', chassi = '9BW000', ano_modelo = 2020),
+            Veiculo(modelo = 'Gol 1.0', placa = 'abc1234', chassi = '9bw000', ano_modelo = 2020),
+            Veiculo(modelo = 'Gol', placa = 'ABC-1234', chassi = '9BW 000', ano_modelo = 2020),
+            Veiculo(modelo = 'Uno', placa = 'XYZ9876', chassi = '9BD111', ano_modelo = 2015),
+        ], ignore_conflicts = True)
+        self.assertEqual(Veiculo.objects.count(), 4)
+        for i, placa in enumerate(('ABC1234', 'abc1234', 'ABC-1234', 'XYZ9876')):
+            Apolice.objects.create(
+                segurado = segurado,
+                veiculo = Veiculo.objects.get(placa = placa),
+                codigo = f'Codigo{i}',
+                seguradora = 'BR',
+                vigencia = '2022-05-10',
+                premio = 1000.00,
+                perc_comissao = 10,
+            )
+
+    def test_duplicates_are_merged_into_oldest_vehicle(self):
+        primeiro = Veiculo.objects.get(placa = 'ABC1234')
+        versoes = dict(Apolice.objects.values_list('codigo', 'versao'))
+        out = StringIO()
+        call_command('deduplicar_veiculos', '--lote', '1', stdout=out)
+
+        self.assertIn('2 veículos duplicados mesclados', out.getvalue())
+        self.assertEqual(sorted(Veiculo.objects.values_list('placa', flat=True)), ['ABC1234', 'XYZ9876'])
+        self.assertEqual(Apolice.objects.filter(veiculo = primeiro).count(), 3)
+        self.assertEqual(Apolice.objects.get(codigo = 'Codigo1').versao, versoes['Codigo1'] + 1)
+        self.assertEqual(ComissaoMensal.objects.get().quantidade, 4)
+
+    def test_nothing_to_merge_is_a_no_op(self):
+        call_command('deduplicar_veiculos', stdout=StringIO())
+        out = StringIO()
+        call_command('deduplicar_veiculos', stdout=out)
+
+        self.assertIn('0 veículos duplicados mesclados', out.getvalue())
+
+
+class ProcessarRenovacoesCommandTest(TestCase):
+
+    def test_reports_queued_and_reminded_policies(self):
+        call_command('gerar_dados', '--apolices', '200', stdout=StringIO())
+        out = StringIO()
+        call_command('processar_renovacoes', '--dias', '60', '--lote', '7', stdout=out)
+
+        self.assertTrue(Renovacao.objects.exists())
+        self.assertIn(f'{Renovacao.objects.count()} apólices enfileiradas', out.getvalue())
@@ -0,0 +1,132 @@
+import json
+from datetime import date, timedelta
+
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from seguros.middleware import QueryRecorder, _HibridoMiddleware
+from seguros.models import Segurado, Veiculo, Apolice
+
+
+class InstrumentacaoMiddlewareTest(TestCase):
+
+    def setUp(self) -> None:
+        self.segurado = Segurado.objects.create(
+            nome = 'TesteNome',
+            nascimento = '2000-01-01',
+            telefone = 'TesteTelefone',            
+            cpf = 'TesteCPF',
+            endereco = 'TesteEndereço',
+            estado_civil = 'NI'
+        )
+        self.client = Client()
+
+    def test_disabled_by_default(self):
+        response = self.client.get(reverse('index'))
+
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(INSTRUMENTACAO_ATIVA=True, INSTRUMENTACAO_AMOSTRAGEM=1.0)
+    def test_server_timing_and_log_when_enabled(self):
+        with self.assertLogs('seguros.instrumentacao', 'INFO') as logs:
+            response = self.client.get(reverse('index'))
+        registro = json.loads(logs.records[0].getMessage())
+
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('render;dur=', response['Server-Timing'])
+        self.assertEqual(registro['rota'], 'index')
+        self.assertGreater(registro['queries'], 0)
+        self.assertGreater(registro['render_ms'], 0)
+        self.assertNotIn('render;dur=0.0,', response['Server-Timing'])
+
+    @override_settings(INSTRUMENTACAO_ATIVA=True, INSTRUMENTACAO_AMOSTRAGEM=0.0)
+    def test_unsampled_requests_are_not_measured(self):
+        response = self.client.get(reverse('index'))
+
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(INSTRUMENTACAO_ATIVA=True, INSTRUMENTACAO_AMOSTRAGEM=1.0)
+    def test_wrappers_are_removed_after_the_request(self):
+        with self.assertLogs('seguros.instrumentacao', 'INFO'):
+            self.client.get(reverse('index'))
+
+        self.assertEqual(connection.execute_wrappers, [])
+
+    def test_hybrid_middleware_requires_both_paths(self):
+        class SoSincrono(_HibridoMiddleware):
+            def processar(self, request):
+                return self.get_response(request)
+
+        with self.assertRaises(TypeError):
+            SoSincrono(lambda request: None)
+
+    def test_recorder_detects_repeated_statements(self):
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            for i in range(3):
+                Segurado.objects.filter(pk=i).first()
+            Veiculo.objects.count()
+
+        self.assertEqual(recorder.count, 4)
+        self.assertEqual(len(recorder.duplicates()), 1)
+        self.assertEqual(recorder.duplicates()[0][1], 3)
+
+
+class MetricasTest(TestCase):
+
+    def setUp(self) -> None:
+        self.segurado = Segurado.objects.create(
+            nome = 'TesteNome',
+            nascimento = '2000-01-01',
+            telefone = 'TesteTelefone',            
+            cpf = 'TesteCPF',
+            endereco = 'TesteEndereço',
+            estado_civil = 'NI'
+        )
+        veiculo = Veiculo.objects.create(
+            modelo = 'TestModelo1',
+            placa = 'Placa1',
+            chassi = 'TestChassi1',
+            ano_modelo = 2000,
+            alienado = False
+        )
+        Apolice.objects.create(
+            segurado = self.segurado,
+            veiculo = veiculo,
+            codigo = 'Vencendo',
+            seguradora = 'PS',
+            vigencia = date.today() + timedelta(days=10),
+            premio = 1000.00,
+            perc_comissao = 10,
+        )
+        self.client = Client()
+
+    def test_metrics_endpoint_uses_prometheus_text_format(self):
+        response = self.client.get('/metrics')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn('# TYPE seguros_http_request_duration_seconds histogram', response.content.decode())
+
+    def test_every_route_has_a_latency_series(self):
+        conteudo = self.client.get('/metrics').content.decode()
+
+        for rota in ('index', 'clients_list', 'ver_apolice', 'relatorio'):
+            self.assertIn(f'seguros_http_request_duration_seconds_count{{rota="{rota}"}}', conteudo)
+
+    def test_requests_are_counted(self):
+        self.client.get(reverse('relatorio'))
+        conteudo = self.client.get('/metrics').content.decode()
+
+        self.assertRegex(conteudo, r'seguros_http_requests_total\{rota="relatorio",status="200"\} \d+')
+        self.assertRegex(conteudo, r'seguros_db_queries_total\{banco="default"\} \d+')
+
+    def test_business_gauges_come_from_ledger_tables(self):
+        with CaptureQueriesContext(connection) as queries:
+            conteudo = self.client.get('/metrics').content.decode()
+
+        self.assertIn('seguros_apolices{seguradora="PS"} 1', conteudo)
+        self.assertIn('seguros_apolices{seguradora="BR"} 0', conteudo)
+        self.assertIn('seguros_apolices_vencendo_30_dias 1', conteudo)
+        self.assertFalse(any('seguros_apolice"' in q['sql'] for q in queries.captured_queries))
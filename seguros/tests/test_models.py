@@ -1,6 +1,14 @@
 from django.test import TestCase
-from seguros.models import Segurado, Veiculo, Apolice
+from seguros.models import Segurado, Veiculo, Apolice, ComissaoMensal
+from seguros import ledger
+from seguros.search import Digitos
+from decimal import Decimal
 from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import Sum
+from django.core.cache import caches
+from django.core.cache.utils import make_template_fragment_key
+from seguros.cache import FRAGMENTOS_CACHE
 
 
 class ModelSeguradoTest(TestCase):
@@ -25,6 +33,13 @@ class ModelSeguradoTest(TestCase):
         segurado = Segurado.objects.get(id=1)
         self.assertEqual(segurado.get_absolute_url(), '/segurado/1')
 
+    def test_versao_is_a_number_after_save(self):
+        segurado = Segurado.objects.get(id=1)
+        versao = segurado.versao
+        segurado.save(update_fields=['nome'])
+
+        self.assertEqual(segurado.versao, versao + 1)
+
 
 class ModelVeiculoTest(TestCase):
 
@@ -95,9 +110,161 @@ class ModelApoliceTest(TestCase):
         valor = (apolice.premio * apolice.perc_comissao) / 100
         self.assertEqual(apolice.total_comissao, valor)
     
+    def test_comissao_is_stored_on_save(self):
+        apolice = Apolice.objects.get(codigo='TesteCodigo')
+        apolice.perc_comissao = 15
+        apolice.save(update_fields=['perc_comissao'])
+
+        stored = Apolice.objects.values_list('comissao', flat=True).get(codigo='TesteCodigo')
+        self.assertEqual(stored, Decimal('300'))
+
+    def test_versao_is_a_number_after_save(self):
+        apolice = Apolice.objects.get(codigo='TesteCodigo')
+        versao = apolice.versao
+        apolice.save()
+        apolice.save()
+
+        self.assertEqual(apolice.versao, versao + 2)
+
+    def test_delete_after_save_discards_the_cached_row(self):
+        fragmentos = caches[FRAGMENTOS_CACHE]
+        apolice = Apolice.objects.get(codigo='TesteCodigo')
+        apolice.save()
+        versao = Apolice.objects.values_list('versao', flat=True).get(codigo='TesteCodigo')
+        chave = make_template_fragment_key('celulas_apolice', [apolice.codigo, versao])
+        fragmentos.set(chave, '<td>...</td>')
+
+        apolice.delete()
+
+        self.assertIsNone(fragmentos.get(chave))
+
+    def test_comissao_can_be_aggregated_in_sql(self):
+        total = Apolice.objects.aggregate(total=Sum('comissao'))['total']
+
+        self.assertEqual(total, Decimal('200'))
+
     def test_perc_comissao_modelo_apolice_validator(self):
         apolice = Apolice.objects.get(codigo='TesteCodigo')
         apolice.full_clean() 
         apolice.perc_comissao = 51        
         self.assertRaises(ValidationError, apolice.full_clean)
 
+
+
+class ComissaoMensalLedgerTest(TestCase):
+
+    def setUp(self) -> None:
+        self.segurado = Segurado.objects.create(
+            nome = 'TesteNome',
+            nascimento = '2000-01-01',
+            telefone = 'TesteTelefone',            
+            cpf = 'TesteCPF',
+            endereco = 'TesteEndereço',
+            estado_civil = 'NI'
+        ) 
+        self.veiculo = Veiculo.objects.create(
+            modelo = 'TestModelo1',
+            placa = 'Placa1',
+            chassi = 'TestChassi1',
+            ano_modelo = 2000,
+            alienado = False
+        )    
+        self.apolice = Apolice.objects.create(
+            segurado = self.segurado,
+            veiculo = self.veiculo,
+            codigo = 'TesteCodigo',
+            seguradora = 'BR',
+            vigencia = '2022-05-10',
+            premio = 2000.00,
+            perc_comissao = 10,            
+        )
+
+    def test_create_adds_policy_to_its_month(self):
+        linha = ComissaoMensal.objects.get(ano=2022, mes=5, seguradora='BR')
+
+        self.assertEqual(linha.quantidade, 1)
+        self.assertEqual(linha.total_comissao, Decimal('200'))
+
+    def test_edit_moves_policy_between_months(self):
+        self.apolice.vigencia = '2022-06-01'
+        self.apolice.perc_comissao = 15
+        self.apolice.save()
+
+        maio = ComissaoMensal.objects.get(ano=2022, mes=5, seguradora='BR')
+        junho = ComissaoMensal.objects.get(ano=2022, mes=6, seguradora='BR')
+        self.assertEqual(maio.quantidade, 0)
+        self.assertEqual(maio.total_comissao, 0)
+        self.assertEqual(maio.soma_perc_comissao, 0)
+        self.assertEqual(junho.total_comissao, Decimal('300'))
+        self.assertEqual(junho.soma_perc_comissao, 15)
+
+    def test_delete_removes_policy(self):
+        self.apolice.delete()
+        linha = ComissaoMensal.objects.get(ano=2022, mes=5, seguradora='BR')
+
+        self.assertEqual(linha.quantidade, 0)
+        self.assertEqual(linha.total_premio, 0)
+
+    def test_rebuild_matches_incremental_ledger(self):
+        Apolice.objects.create(
+            segurado = self.segurado,
+            veiculo = self.veiculo,
+            codigo = 'TesteCodigo2',
+            seguradora = 'AZ',
+            vigencia = '2022-05-20',
+            premio = 1000.55,
+            perc_comissao = 15,            
+        )
+        incremental = list(ComissaoMensal.objects.order_by('seguradora').values_list(
+            'seguradora', 'quantidade', 'total_comissao', 'soma_perc_comissao'))
+
+        ledger.rebuild()
+
+        recalculado = list(ComissaoMensal.objects.order_by('seguradora').values_list(
+            'seguradora', 'quantidade', 'total_comissao', 'soma_perc_comissao'))
+        self.assertEqual(incremental, recalculado)
+
+
+class IndicesConsultasTest(TestCase):
+    """
+    Checks with EXPLAIN that the hot lookups are served by an index.
+    """
+
+    def plano(self, queryset):
+        if connection.vendor == 'postgresql':
+            # Tiny test tables would otherwise always be read sequentially.
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+    def test_segurado_by_cpf_uses_index(self):
+        self.assertIn('segurado_cpf_idx', self.plano(Segurado.objects.filter(cpf='12345678901')))
+
+    def test_segurado_by_cpf_digits_uses_index(self):
+        plano = self.plano(
+            Segurado.objects.annotate(cpf_digitos=Digitos('cpf')).filter(cpf_digitos='12345678901')
+        )
+
+        self.assertIn('segurado_cpf_digitos_idx', plano)
+
+    def test_veiculo_by_placa_uses_index(self):
+        self.assertIn('veiculo_placa_idx', self.plano(Veiculo.objects.filter(placa='ABC1D23')))
+
+    def test_segurado_listing_by_nome_uses_index(self):
+        plano = self.plano(Segurado.objects.order_by('nome', 'id')[:50])
+
+        self.assertIn('segurado_nome_id_idx', plano)
+
+    def test_apolice_month_by_seguradora_uses_composite_index(self):
+        plano = self.plano(Apolice.objects.filter(
+            vigencia__gte='2022-05-01', vigencia__lt='2022-06-01', seguradora='BR'
+        ).values('seguradora').annotate(Sum('comissao')))
+
+        self.assertRegex(plano, 'apolice_vigencia_(seg|codigo)_idx')
+
+    def test_relatorio_month_range_uses_vigencia_index(self):
+        plano = self.plano(Apolice.objects.filter(
+            vigencia__gte='2022-05-01', vigencia__lt='2022-06-01'
+        ).order_by('vigencia'))
+
+        self.assertRegex(plano, 'apolice_vigencia_(seg|codigo)_idx')
@@ -0,0 +1,196 @@
+import os
+import runpy
+import threading
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase
+from core.postgresql_pool import base
+from core.postgresql_pool.pool import PoolConexoes, PoolEsgotado, saudavel
+
+
+class ConexaoFalsa:
+
+    def __init__(self, saudavel=True):
+        self.saudavel = saudavel
+        self.fechada = False
+        self.rollbacks = 0
+        self.isolation_level = 1
+
+    @property
+    def closed(self):
+        return int(self.fechada)
+
+    def cursor(self):
+        if not self.saudavel:
+            raise ConnectionError('servidor encerrou a conexão')
+        return mock.MagicMock()
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.fechada = True
+
+
+class PoolConexoesTest(SimpleTestCase):
+
+    def setUp(self) -> None:
+        self.criadas = []
+        self.agora = 1000.0
+        patcher = mock.patch('core.postgresql_pool.pool.time.monotonic', lambda: self.agora)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def criar(self):
+        conexao = ConexaoFalsa()
+        self.criadas.append(conexao)
+        return conexao
+
+    def test_returned_connection_is_reused(self):
+        pool = PoolConexoes(self.criar, tamanho = 2)
+        conexao = pool.obter()
+        pool.devolver(conexao)
+
+        self.assertIs(pool.obter(), conexao)
+        self.assertEqual(len(self.criadas), 1)
+        self.assertEqual(conexao.rollbacks, 1)
+
+    def test_connection_older_than_max_age_is_recycled(self):
+        pool = PoolConexoes(self.criar, max_idade = 60)
+        antiga = pool.obter()
+        pool.devolver(antiga)
+        self.agora += 61
+
+        nova = pool.obter()
+        self.assertIsNot(nova, antiga)
+        self.assertTrue(antiga.fechada)
+
+    def test_unhealthy_idle_connection_is_replaced(self):
+        pool = PoolConexoes(self.criar, checar_apos = 5)
+        quebrada = pool.obter()
+        pool.devolver(quebrada)
+        quebrada.saudavel = False
+        self.agora += 6
+
+        nova = pool.obter()
+        self.assertIsNot(nova, quebrada)
+        self.assertTrue(quebrada.fechada)
+
+    def test_health_check_leaves_no_transaction_open(self):
+        conexao = ConexaoFalsa()
+
+        self.assertTrue(saudavel(conexao))
+        self.assertEqual(conexao.rollbacks, 1)
+
+    def test_discarded_connection_is_closed_and_frees_its_slot(self):
+        pool = PoolConexoes(self.criar, tamanho = 1, timeout = 0)
+        conexao = pool.obter()
+        pool.devolver(conexao, descartar = True)
+
+        self.assertTrue(conexao.fechada)
+        self.assertIsNot(pool.obter(), conexao)
+
+    def test_exhausted_pool_raises_after_timeout(self):
+        pool = PoolConexoes(self.criar, tamanho = 1, timeout = 0.01)
+        pool.obter()
+
+        with self.assertRaises(PoolEsgotado):
+            pool.obter()
+
+    def test_waiting_caller_gets_connection_when_one_is_returned(self):
+        pool = PoolConexoes(self.criar, tamanho = 1, timeout = 5)
+        conexao = pool.obter()
+        obtidas = []
+        espera = threading.Thread(target=lambda: obtidas.append(pool.obter()))
+        espera.start()
+        pool.devolver(conexao)
+        espera.join()
+
+        self.assertEqual(obtidas, [conexao])
+
+
+class DatabaseWrapperTest(SimpleTestCase):
+
+    def setUp(self) -> None:
+        self.criadas = []
+        for patcher in (
+            mock.patch.dict('core.postgresql_pool.base._pools', clear=True),
+            mock.patch.object(base.base.DatabaseWrapper, 'get_new_connection', self.criar),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def criar(self, conn_params):
+        conexao = ConexaoFalsa()
+        self.criadas.append((conn_params['database'], conexao))
+        return conexao
+
+    def wrapper(self, nome='banco'):
+        return base.DatabaseWrapper({
+            'NAME': nome, 'USER': 'usuario', 'PASSWORD': '', 'HOST': 'localhost', 'PORT': '',
+            'OPTIONS': {}, 'POOL': {'TAMANHO': 2},
+        }, alias='pool_teste')
+
+    def conectar(self, wrapper):
+        wrapper.connection = wrapper.get_new_connection(wrapper.get_connection_params())
+        return wrapper.connection
+
+    def fechar(self, wrapper):
+        wrapper._close()
+        wrapper.connection = None
+
+    def test_closing_returns_the_connection_for_the_next_request(self):
+        wrapper = self.wrapper()
+        conexao = self.conectar(wrapper)
+        self.fechar(wrapper)
+
+        self.assertIs(self.conectar(wrapper), conexao)
+        self.assertEqual(len(self.criadas), 1)
+        self.assertFalse(conexao.fechada)
+        self.assertEqual(wrapper.isolation_level, 1)
+
+    def test_connection_closed_by_the_server_is_discarded(self):
+        wrapper = self.wrapper()
+        conexao = self.conectar(wrapper)
+        conexao.fechada = True
+        self.fechar(wrapper)
+
+        self.assertIsNot(self.conectar(wrapper), conexao)
+
+    def test_changed_settings_get_a_new_pool(self):
+        wrapper = self.wrapper()
+        antiga = self.conectar(wrapper)
+        self.fechar(wrapper)
+        wrapper.settings_dict['NAME'] = 'test_banco'
+
+        self.assertIsNot(self.conectar(wrapper), antiga)
+        self.assertEqual([banco for banco, _ in self.criadas], ['banco', 'test_banco'])
+        self.assertTrue(antiga.fechada)
+
+    def test_connection_of_a_retired_pool_is_closed_when_returned(self):
+        wrapper = self.wrapper()
+        conexao = self.conectar(wrapper)
+        outro = self.wrapper('test_banco')
+        outro.alias = wrapper.alias
+        self.conectar(outro)
+
+        self.fechar(wrapper)
+
+        self.assertTrue(conexao.fechada)
+
+
+class ConfiguracaoPoolTest(SimpleTestCase):
+
+    def carregar(self, **env):
+        with mock.patch.dict(os.environ, {'SECRET_KEY': 'x', **env}):
+            return runpy.run_module('core.settings')
+
+    def test_pool_with_another_engine_is_rejected(self):
+        with self.assertRaisesMessage(ImproperlyConfigured, 'django.db.backends.sqlite3'):
+            self.carregar(DB_POOL='True', SQL_ENGINE='django.db.backends.sqlite3')
+
+    def test_pool_with_postgresql_uses_the_pool_backend(self):
+        configuracao = self.carregar(DB_POOL='True', SQL_ENGINE='django.db.backends.postgresql')
+
+        self.assertEqual(configuracao['DATABASES']['default']['ENGINE'], 'core.postgresql_pool')
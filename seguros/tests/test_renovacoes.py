@@ -0,0 +1,129 @@
+from datetime import date, timedelta
+from smtplib import SMTPException
+from unittest import mock
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, Client
+from django.urls import reverse
+from seguros import renovacoes
+from seguros.models import Segurado, Veiculo, Apolice, Renovacao
+
+
+class RenovacaoTest(TestCase):
+
+    def setUp(self) -> None:
+        self.hoje = date.today()
+        self.segurado = Segurado.objects.create(
+            nome = 'TesteNome',
+            nascimento = '2000-01-01',
+            telefone = 'TesteTelefone',
+            email = 'teste@example.com',
+            cpf = 'TesteCPF',
+            endereco = 'TesteEndereço',
+            estado_civil = 'NI'
+        )
+        for codigo, dias in (('Vence10', 10), ('Vence25', 25), ('Vence90', 90), ('Venceu', -5)):
+            self.criar_apolice(codigo, dias)
+        self.client = Client()
+
+    def criar_apolice(self, codigo, dias, veiculo=None):
+        return Apolice.objects.create(
+            segurado = self.segurado,
+            veiculo = veiculo or Veiculo.objects.create(
+                modelo = 'TestModelo1',
+                placa = codigo[:7].upper(),
+                chassi = 'TestChassi1',
+                ano_modelo = 2000,
+                alienado = False
+            ),
+            codigo = codigo,
+            seguradora = 'BR',
+            vigencia = self.hoje + timedelta(days=dias),
+            premio = 1000.00,
+            perc_comissao = 10,
+        )
+
+    def test_policies_in_window_are_queued_once_and_reminded(self):
+        resultado = renovacoes.processar(30)
+
+        self.assertEqual(resultado.enfileiradas, 2)
+        self.assertEqual(resultado.avisadas, 2)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(set(Renovacao.objects.values_list('apolice', 'status')),
+                         {('Vence10', Renovacao.AVISADA), ('Vence25', Renovacao.AVISADA)})
+
+        resultado = renovacoes.processar(30)
+        self.assertEqual((resultado.enfileiradas, resultado.avisadas), (0, 0))
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_failed_send_reopens_only_unsent_reminders(self):
+        renovacoes.enfileirar(self.hoje, renovacoes.limite(30, self.hoje))
+        enviar = EmailBackend.send_messages
+        chamadas = []
+
+        def falhar_na_segunda(conexao, mensagens):
+            chamadas.append(mensagens)
+            if len(chamadas) == 2:
+                raise SMTPException('conexão perdida')
+            return enviar(conexao, mensagens)
+
+        with mock.patch.object(EmailBackend, 'send_messages', falhar_na_segunda):
+            with self.assertRaises(SMTPException):
+                renovacoes.avisar(renovacoes.limite(30, self.hoje))
+
+        self.assertEqual(dict(Renovacao.objects.values_list('apolice_id', 'status')),
+                         {'Vence10': Renovacao.AVISADA, 'Vence25': Renovacao.PENDENTE})
+        resultado = renovacoes.avisar(renovacoes.limite(30, self.hoje))
+        self.assertEqual((resultado.avisadas, len(mail.outbox)), (1, 2))
+        self.assertEqual([m.subject for m in mail.outbox],
+                         ['Renovação do seguro do veículo VENCE10', 'Renovação do seguro do veículo VENCE25'])
+
+    def test_batches_cover_the_whole_window(self):
+        resultado = renovacoes.processar(100, batch_size=1)
+
+        self.assertEqual(resultado.enfileiradas, 3)
+        self.assertEqual(resultado.avisadas, 3)
+
+    def test_newer_policy_for_the_vehicle_closes_the_entry(self):
+        renovacoes.processar(30)
+        vence10 = Apolice.objects.get(codigo='Vence10')
+        self.criar_apolice('Renovada', 375, veiculo=vence10.veiculo)
+        resultado = renovacoes.processar(30)
+
+        self.assertEqual(resultado.renovadas, 1)
+        self.assertEqual(Renovacao.objects.get(apolice=vence10).status, Renovacao.RENOVADA)
+
+    def test_changing_vigencia_reschedules_entry(self):
+        renovacoes.processar(30)
+        apolice = Apolice.objects.get(codigo='Vence10')
+        apolice.vigencia = self.hoje + timedelta(days=20)
+        apolice.save()
+        renovacao = Renovacao.objects.get(apolice=apolice)
+
+        self.assertEqual(renovacao.vencimento, self.hoje + timedelta(days=20))
+        self.assertEqual(renovacao.status, Renovacao.PENDENTE)
+        self.assertIsNone(renovacao.avisada_em)
+
+    def test_view_lists_open_entries_soonest_first(self):
+        renovacoes.processar(30)
+        Renovacao.objects.create(apolice_id='Venceu', vencimento=self.hoje - timedelta(days=5))
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('renovacoes'))
+
+        self.assertEqual([r.apolice_id for r in response.context['renovacoes']],
+                         ['Venceu', 'Vence10', 'Vence25'])
+        self.assertContains(response, 'VENCE10')
+
+        response = self.client.get(reverse('renovacoes'), {'dias': 15, 'cursor': ''})
+        self.assertEqual([r.apolice_id for r in response.context['renovacoes']], ['Venceu', 'Vence10'])
+
+    def test_view_clamps_dias_to_a_year(self):
+        renovacoes.processar(100)
+
+        response = self.client.get(reverse('renovacoes'), {'dias': 3000000})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['renovacoes']), 3)
+
+        response = self.client.get(reverse('renovacoes'), {'dias': -30})
+        self.assertEqual([r.apolice_id for r in response.context['renovacoes']], [])
@@ -0,0 +1,106 @@
+from unittest import skipUnless
+
+from django.conf import settings
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from seguros.models import Segurado, Veiculo, Apolice
+from seguros.routers import Leitura, ReplicaRouter, leitura_atual
+
+
+# Only core.settings_teste_replicas has a replica that is not a test mirror.
+REPLICA_SEPARADA = ('replica_1' in settings.DATABASES
+                    and 'MIRROR' not in settings.DATABASES['replica_1'].get('TEST', {}))
+
+
+def criar_apolice(codigo, using='default'):
+    segurado = Segurado.objects.using(using).create(
+        nome = f'Segurado {codigo}',
+        nascimento = '2000-01-01',
+        telefone = 'TesteTelefone',            
+        cpf = 'TesteCPF',
+        endereco = 'TesteEndereço',
+        estado_civil = 'NI'
+    )
+    veiculo = Veiculo.objects.using(using).create(
+        modelo = 'TestModelo1',
+        placa = 'ABC1234',
+        chassi = 'TestChassi1',
+        ano_modelo = 2000,
+        alienado = False
+    )
+    apolice = Apolice(
+        segurado = segurado,
+        veiculo = veiculo,
+        codigo = codigo,
+        seguradora = 'BR',
+        vigencia = '2000-01-10',
+        premio = 2000.00,
+        perc_comissao = 10,
+    )
+    apolice.save(using=using)
+    return apolice
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1'])
+class ReplicaRouterTest(TestCase):
+
+    def setUp(self) -> None:
+        self.router = ReplicaRouter()
+        self.leitura = Leitura()
+        token = leitura_atual.set(self.leitura)
+        self.addCleanup(leitura_atual.reset, token)
+
+    def test_reads_go_to_primary_unless_view_is_marked(self):
+        self.assertIsNone(self.router.db_for_read(Apolice))
+
+        self.leitura.replica = True
+        self.assertEqual(self.router.db_for_read(Apolice), 'replica_1')
+
+    def test_other_apps_never_read_from_replica(self):
+        from django.contrib.sessions.models import Session
+        self.leitura.replica = True
+
+        self.assertIsNone(self.router.db_for_read(Session))
+
+    def test_writes_always_go_to_primary(self):
+        self.leitura.replica = True
+
+        self.assertEqual(self.router.db_for_write(Apolice), 'default')
+
+
+@skipUnless(REPLICA_SEPARADA, 'Requer --settings=core.settings_teste_replicas')
+class LeituraReplicaViewsTest(TestCase):
+    databases = {'default', 'replica_1'} if REPLICA_SEPARADA else {'default'}
+
+    def setUp(self) -> None:
+        criar_apolice('SoNoPrimario')
+        criar_apolice('SoNaReplica', using='replica_1')
+        self.client = Client()
+
+    def test_listings_and_report_read_from_replica(self):
+        for url in (reverse('index'), f'{reverse("relatorio")}?mes=1&ano=2000'):
+            response = self.client.get(url)
+
+            self.assertContains(response, 'SoNaReplica')
+            self.assertNotContains(response, 'SoNoPrimario')
+
+        response = self.client.get(reverse('clients_list'))
+        self.assertContains(response, 'Segurado SoNaReplica')
+
+    def test_detail_views_read_from_primary(self):
+        response = self.client.get(reverse('ver_apolice', kwargs={'pk': 'SoNoPrimario'}))
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_client_reads_its_own_writes_after_post(self):
+        segurado = Segurado.objects.get(nome='Segurado SoNoPrimario')
+        response = self.client.post(reverse('nova_apolice', kwargs={'pk': segurado.pk}), {
+            'modelo': 'Novo', 'placa': 'XYZ9876', 'chassi': 'ChassiNovo', 'ano_modelo': 2020,
+            'codigo': 'RecemCriada', 'seguradora': 'BR', 'vigencia': '2000-01-20',
+            'premio': 1500.00, 'perc_comissao': 10,
+        })
+        self.assertIn('seguros_primario', response.cookies)
+
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'RecemCriada')
+        self.assertFalse(Apolice.objects.using('replica_1').filter(codigo='RecemCriada').exists())
@@ -0,0 +1,137 @@
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import OperationalError
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from seguros import tarefas
+from seguros.models import Tarefa
+
+
+@tarefas.tarefa('teste_contar')
+def contar(execucao, ate):
+    for i in range(1, ate + 1):
+        execucao.progresso(i, ate)
+    execucao.resultado = {'ate': ate}
+    return f'Contou até {ate}.'
+
+
+@tarefas.tarefa('teste_falhar')
+def falhar(execucao):
+    raise RuntimeError('falhou')
+
+
+@tarefas.tarefa('teste_dormir')
+def dormir(execucao, segundos):
+    time.sleep(segundos)
+    execucao.resultado = Tarefa.objects.filter(
+        pk=execucao.tarefa.pk, executar_em__gt=timezone.now()
+    ).exists()
+    return 'Acordou.'
+
+
+class TarefaTest(TestCase):
+
+    def test_reserved_job_runs_and_records_progress(self):
+        tarefa = tarefas.enfileirar('teste_contar', ate=3)
+        reservada = tarefas.reservar()
+
+        self.assertEqual(reservada.pk, tarefa.pk)
+        self.assertIsNone(tarefas.reservar())
+        tarefas.executar(reservada)
+
+        tarefa.refresh_from_db()
+        self.assertEqual(tarefa.status, Tarefa.CONCLUIDA)
+        self.assertEqual((tarefa.feitos, tarefa.total, tarefa.percentual), (3, 3, 100))
+        self.assertEqual(tarefa.mensagem, 'Contou até 3.')
+        self.assertEqual(tarefa.resultado, {'ate': 3})
+
+    def test_unknown_type_is_rejected(self):
+        with self.assertRaises(ValueError):
+            tarefas.enfileirar('inexistente')
+
+    @override_settings(TAREFAS_ESPERA=0)
+    def test_failed_job_is_retried_until_max_attempts(self):
+        tarefa = tarefas.enfileirar('teste_falhar', max_tentativas=2)
+        for status in (Tarefa.PENDENTE, Tarefa.FALHOU):
+            tarefas.executar(tarefas.reservar())
+            tarefa.refresh_from_db()
+            self.assertEqual(tarefa.status, status)
+
+        self.assertEqual(tarefa.tentativas, 2)
+        self.assertIn('RuntimeError: falhou', tarefa.erro)
+        self.assertIsNone(tarefas.reservar())
+
+    def test_retry_waits_for_backoff(self):
+        tarefas.enfileirar('teste_falhar')
+        tarefas.executar(tarefas.reservar())
+
+        self.assertIsNone(tarefas.reservar())
+
+    def test_expired_lease_is_taken_over_and_stale_worker_ignored(self):
+        tarefa = tarefas.enfileirar('teste_contar', ate=1)
+        antiga = tarefas.reservar()
+        Tarefa.objects.filter(pk=tarefa.pk).update(executar_em=timezone.now() - timedelta(seconds=1))
+        nova = tarefas.reservar()
+
+        self.assertEqual((nova.pk, nova.tentativas), (tarefa.pk, 2))
+        tarefas.executar(antiga)
+        tarefa.refresh_from_db()
+        self.assertEqual(tarefa.status, Tarefa.EXECUTANDO)
+
+    def test_expired_last_attempt_fails(self):
+        tarefa = tarefas.enfileirar('teste_contar', max_tentativas=1, ate=1)
+        tarefas.reservar()
+        Tarefa.objects.filter(pk=tarefa.pk).update(executar_em=timezone.now() - timedelta(seconds=1))
+
+        self.assertIsNone(tarefas.reservar())
+        tarefa.refresh_from_db()
+        self.assertEqual(tarefa.status, Tarefa.FALHOU)
+
+
+class ReservaTest(TransactionTestCase):
+
+    @override_settings(TAREFAS_TEMPO_LIMITE=0.3)
+    def test_lease_is_renewed_while_a_silent_handler_runs(self):
+        tarefa = tarefas.enfileirar('teste_dormir', segundos=0.8)
+        tarefas.executar(tarefas.reservar())
+
+        tarefa.refresh_from_db()
+        self.assertEqual(tarefa.status, Tarefa.CONCLUIDA)
+        self.assertIs(tarefa.resultado, True)
+
+
+class RodarTarefasCommandTest(TransactionTestCase):
+
+    def test_worker_drains_queue(self):
+        for ate in (1, 2, 3):
+            tarefas.enfileirar('teste_contar', ate=ate)
+        call_command('rodar_tarefas', '--workers', '1', '--uma-vez', stdout=StringIO())
+
+        self.assertEqual(Tarefa.objects.filter(status=Tarefa.CONCLUIDA).count(), 3)
+
+    # A short lease: on SQLite a worker may lose the final write of a job to
+    # "table is locked", and the job is then retried once the lease expires.
+    @override_settings(TAREFAS_ESPERA=0, TAREFAS_TEMPO_LIMITE=0.5)
+    def test_worker_pool_drains_queue(self):
+        for ate in range(1, 7):
+            tarefas.enfileirar('teste_contar', ate=ate)
+        call_command('rodar_tarefas', '--workers', '3', '--intervalo', '0.01', '--uma-vez',
+                     stdout=StringIO())
+
+        self.assertEqual(Tarefa.objects.filter(status=Tarefa.CONCLUIDA).count(), 6)
+
+    def test_worker_survives_database_errors(self):
+        tarefas.enfileirar('teste_contar', ate=1)
+        reservar = tarefas.reservar
+        with mock.patch('seguros.management.commands.rodar_tarefas.reservar',
+                        side_effect=[OperationalError('database is locked'), reservar(), None, None]), \
+                self.assertLogs('seguros.tarefas', 'ERROR') as logs:
+            call_command('rodar_tarefas', '--workers', '1', '--intervalo', '0.01', '--uma-vez',
+                         stdout=StringIO())
+
+        self.assertIn('database is locked', logs.output[0])
+        self.assertEqual(Tarefa.objects.get().status, Tarefa.CONCLUIDA)
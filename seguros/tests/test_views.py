@@ -1,8 +1,23 @@
-from django.test import TestCase, Client
-from seguros.models import Segurado, Veiculo, Apolice
+import asyncio
+import json
+import os
+import tempfile
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import cache, caches
+from django.db import IntegrityError, connection
+from django.core.handlers.asgi import ASGIHandler
+from django.test import TestCase, TransactionTestCase, Client, AsyncClient, override_settings
+from seguros.cache import INVALIDADO, chave_relatorio
+from seguros import ledger, relatorios, tarefas
+from seguros.models import (calcular_comissao, Segurado, Veiculo, Apolice, Tarefa, ComissaoMensal, Renovacao,
+                             VencimentoDiario)
 from seguros.forms import ApoliceForm, VeiculoForm, SeguradoForm
 from django.urls import reverse
-from django.contrib.messages import get_messages
+from django.contrib.messages import WARNING, get_messages
+from django.core.files.uploadedfile import SimpleUploadedFile
 
 
 class IndexViewTest(TestCase):
@@ -73,6 +88,290 @@ class IndexViewTest(TestCase):
         self.assertNotIn(apolice, response.context['apolices'])
         self.assertIn(busca_apolice, response.context['apolices'])        
 
+    def test_index_query_count_does_not_grow_with_rows(self):
+        segurado = Segurado.objects.first()
+        for i in range(30):
+            veiculo = Veiculo.objects.create(
+                modelo = f'Modelo{i}',
+                placa = f'PLC{i:04}',
+                chassi = f'Chassi{i}',
+                ano_modelo = 2000,
+                alienado = False
+            )
+            Apolice.objects.create(
+                segurado = segurado,
+                veiculo = veiculo,
+                codigo = f'Extra{i:03}',
+                seguradora = 'PS',
+                vigencia = '2022-02-01',
+                premio = 500.00,
+                perc_comissao = 10,
+            )
+
+        # One COUNT for the paginator and one joined SELECT for the page.
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+            response.render()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'PLC0000')
+
+    def test_index_sorts_by_stored_comissao(self):
+        response = self.client.get(self.url, {'ordem': '-comissao'})
+        codigos = [a.codigo for a in response.context['apolices']]
+
+        self.assertEqual(codigos, ['TesteCodigo', 'TesteBusca'])
+
+        response = self.client.get(self.url, {'ordem': 'comissao'})
+        codigos = [a.codigo for a in response.context['apolices']]
+
+        self.assertEqual(codigos, ['TesteBusca', 'TesteCodigo'])
+
+    def test_search_results_honour_ordem(self):
+        for ordem, esperado in (('-comissao', ['TesteCodigo', 'TesteBusca']),
+                                ('comissao', ['TesteBusca', 'TesteCodigo'])):
+            response = self.client.get(self.url, {'search': 'teste', 'ordem': ordem})
+            codigos = [a.codigo for a in response.context['apolices']]
+
+            self.assertEqual(codigos, esperado)
+
+    def test_index_is_paginated(self):
+        response = self.client.get(self.url)
+
+        self.assertIn('page_obj', response.context)
+        self.assertEqual(response.context['paginator'].per_page, 50)
+
+
+class FragmentoLinhaCacheTest(TestCase):
+
+    def setUp(self) -> None:
+        caches['fragmentos'].clear()
+        self.segurado = Segurado.objects.create(
+            nome = 'NomeOriginal',
+            nascimento = '2000-01-01',
+            telefone = 'TesteTelefone',            
+            cpf = 'TesteCPF',
+            endereco = 'TesteEndereço',
+            estado_civil = 'NI'
+        ) 
+        self.veiculo = Veiculo.objects.create(
+            modelo = 'ModeloOriginal',
+            placa = 'Placa1',
+            chassi = 'TestChassi1',
+            ano_modelo = 2000,
+            alienado = False
+        )    
+        self.apolice = Apolice.objects.create(
+            segurado = self.segurado,
+            veiculo = self.veiculo,
+            codigo = 'TesteCodigo',
+            seguradora = 'BR',
+            vigencia = '2022-04-01',
+            premio = 2000.00,
+            perc_comissao = 10,            
+        )
+        self.client = Client()
+
+    def test_rows_are_served_from_cache(self):
+        self.client.get(reverse('index'))
+        Segurado.objects.update(nome='AlteradoSemSinal')
+
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'NomeOriginal')
+
+    def test_apolice_save_bumps_version(self):
+        self.client.get(reverse('index'))
+        self.apolice.premio = 3000
+        self.apolice.save()
+
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'R$3000')
+        self.assertEqual(Apolice.objects.get(pk='TesteCodigo').versao, 2)
+
+    def test_segurado_and_veiculo_save_invalidate_their_rows(self):
+        url = f'{reverse("relatorio")}?mes=4&ano=2022'
+        self.client.get(reverse('index'))
+        self.client.get(url)
+        self.segurado.nome = 'NomeNovo'
+        self.segurado.save()
+        self.veiculo.modelo = 'ModeloNovo'
+        self.veiculo.save()
+
+        for response in (self.client.get(reverse('index')), self.client.get(url)):
+            self.assertContains(response, 'NomeNovo')
+            self.assertContains(response, 'ModeloNovo')
+
+    def test_recreated_codigo_does_not_reuse_deleted_row(self):
+        self.client.get(reverse('index'))
+        self.apolice.delete()
+        Apolice.objects.create(
+            segurado = self.segurado,
+            veiculo = self.veiculo,
+            codigo = 'TesteCodigo',
+            seguradora = 'PS',
+            vigencia = '2022-04-01',
+            premio = 2000.00,
+            perc_comissao = 10,            
+        )
+
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'Porto Seguro')
+
+
+class BuscaTextualTest(TestCase):
+
+    def setUp(self) -> None:
+        veiculo = Veiculo.objects.create(
+            modelo = 'TestModelo1',
+            placa = 'ABC1D23',
+            chassi = 'TestChassi1',
+            ano_modelo = 2000,
+            alienado = False
+        )
+        for codigo, nome in (('A1', 'João da Silva'), ('A2', 'Joana Souza'), ('A3', 'Maria Conceição')):
+            segurado = Segurado.objects.create(
+                nome = nome,
+                nascimento = '2000-01-01',
+                telefone = 'TesteTelefone',            
+                cpf = 'TesteCPF',
+                endereco = 'TesteEndereço',
+                estado_civil = 'NI'
+            )
+            Apolice.objects.create(
+                segurado = segurado,
+                veiculo = veiculo,
+                codigo = codigo,
+                seguradora = 'BR',
+                vigencia = '2022-01-01',
+                premio = 1000.00,
+                perc_comissao = 10,
+            )
+        self.client = Client()
+        return super().setUp()
+
+    def test_busca_ignora_acentos(self):
+        response = self.client.get(reverse('index'), {'search': 'Joao'})
+
+        self.assertEqual([a.codigo for a in response.context['apolices']], ['A1'])
+
+    def test_busca_com_acento_encontra_nome_com_acento(self):
+        response = self.client.get(reverse('clients_list'), {'search': 'conceição'})
+
+        self.assertEqual([s.nome for s in response.context['segurados']], ['Maria Conceição'])
+
+    def test_busca_por_placa_e_cpf(self):
+        Segurado.objects.filter(nome='Joana Souza').update(cpf='12345678901')
+        response = self.client.get(reverse('index'), {'search': 'abc1d23'})
+
+        self.assertEqual(len(response.context['apolices']), 3)
+
+        response = self.client.get(reverse('clients_list'), {'search': '123.456.789-01'})
+
+        self.assertEqual([s.nome for s in response.context['segurados']], ['Joana Souza'])
+
+    def test_busca_ordena_por_relevancia(self):
+        response = self.client.get(reverse('clients_list'), {'search': 'joana'})
+        nomes = [s.nome for s in response.context['segurados']]
+
+        self.assertEqual(nomes, ['Joana Souza'])
+
+        response = self.client.get(reverse('clients_list'), {'search': 'jo'})
+        nomes = [s.nome for s in response.context['segurados']]
+
+        self.assertEqual(set(nomes), {'João da Silva', 'Joana Souza'})
+        self.assertEqual(nomes[0], 'Joana Souza')
+
+
+class CursorPaginationApoliceTest(TestCase):
+
+    def setUp(self) -> None:
+        segurado = Segurado.objects.create(
+            nome = 'TesteNome',
+            nascimento = '2000-01-01',
+            telefone = 'TesteTelefone',            
+            cpf = 'TesteCPF',
+            endereco = 'TesteEndereço',
+            estado_civil = 'NI'
+        ) 
+        veiculo = Veiculo.objects.create(
+            modelo = 'TestModelo1',
+            placa = 'Placa1',
+            chassi = 'TestChassi1',
+            ano_modelo = 2000,
+            alienado = False
+        )
+        for i in range(120):
+            Apolice.objects.create(
+                segurado = segurado,
+                veiculo = veiculo,
+                codigo = f'Cod{i:03}',
+                seguradora = 'BR',
+                vigencia = f'2022-{i % 12 + 1:02}-01',
+                premio = 1000.00,
+                perc_comissao = 10,
+            )
+        self.ordered = list(Apolice.objects.order_by('vigencia', 'codigo'))
+        self.client = Client()
+        self.url = reverse('index')
+        return super().setUp()
+
+    def test_first_page_follows_keyset_ordering(self):
+        response = self.client.get(self.url, {'cursor': ''})
+        page = response.context['page_obj']
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['apolices']), self.ordered[:50])
+        self.assertTrue(page.has_next())
+        self.assertFalse(page.has_previous())
+
+    def test_next_and_previous_tokens_walk_the_pages(self):
+        first = self.client.get(self.url, {'cursor': ''}).context['page_obj']
+        second = self.client.get(self.url, {'cursor': first.next_cursor}).context['page_obj']
+        third = self.client.get(self.url, {'cursor': second.next_cursor}).context['page_obj']
+        back = self.client.get(self.url, {'cursor': third.previous_cursor}).context['page_obj']
+
+        self.assertEqual(list(second), self.ordered[50:100])
+        self.assertEqual(list(third), self.ordered[100:])
+        self.assertFalse(third.has_next())
+        self.assertEqual(list(back), self.ordered[50:100])
+        self.assertTrue(back.has_previous())
+
+    def test_deep_page_costs_a_single_query(self):
+        first = self.client.get(self.url, {'cursor': ''}).context['page_obj']
+
+        with self.assertNumQueries(1):
+            self.client.get(self.url, {'cursor': first.next_cursor})
+
+    def test_invalid_cursor_returns_404(self):
+        response = self.client.get(self.url, {'cursor': 'invalido'})
+
+        self.assertEqual(response.status_code, 404)
+
+
+class CursorPaginationSeguradoTest(TestCase):
+
+    def setUp(self) -> None:
+        for i in range(60):
+            Segurado.objects.create(
+                nome = 'Mesmo Nome' if i % 2 else f'Nome{i:02}',
+                nascimento = '2000-01-01',
+                telefone = 'TesteTelefone',            
+                cpf = 'TesteCPF',
+                endereco = 'TesteEndereço',
+                estado_civil = 'NI'
+            )
+        self.ordered = list(Segurado.objects.order_by('nome', 'id'))
+        self.client = Client()
+        self.url = reverse('clients_list')
+        return super().setUp()
+
+    def test_pages_do_not_skip_or_repeat_ties_on_nome(self):
+        first = self.client.get(self.url, {'cursor': ''}).context['page_obj']
+        second = self.client.get(self.url, {'cursor': first.next_cursor}).context['page_obj']
+
+        self.assertEqual(list(first) + list(second), self.ordered)
+        self.assertFalse(second.has_next())
+
 
 class ListaSeguradosViewTest(TestCase):
 
@@ -210,6 +509,33 @@ class NovaApoliceViewTest(TestCase):
         self.assertEqual(len(message), 1)
         self.assertEqual(str(message[0]), 'Cadastro efetuado.')        
 
+    def test_existing_vehicle_is_reused_by_normalized_placa_and_chassi(self):
+        self.client.post(self.url, self.valid_data)
+        outra = {**self.valid_data, 'codigo': 'outrocodigo', 'placa': 'aaa-000', 'chassi': 'TESTE CHASSI'}
+        self.client.post(self.url, outra)
+
+        self.assertEqual(Veiculo.objects.count(), 1)
+        self.assertEqual(Apolice.objects.filter(veiculo=Veiculo.objects.get()).count(), 2)
+        self.assertEqual(Veiculo.objects.get().placa, 'AAA000')
+
+    def test_existing_vehicle_with_other_data_is_kept_and_reported(self):
+        self.client.post(self.url, self.valid_data)
+        outra = {**self.valid_data, 'codigo': 'outrocodigo', 'modelo': 'outromodelo', 'ano_modelo': 2001}
+        response = self.client.post(self.url, outra)
+        avisos = [str(m) for m in get_messages(response.wsgi_request) if m.level == WARNING]
+
+        self.assertEqual(Veiculo.objects.get().modelo, 'testemodelo')
+        self.assertEqual(len(avisos), 1)
+        self.assertIn('AAA000', avisos[0])
+        self.assertIn('Modelo', avisos[0])
+
+    def test_vehicle_is_not_saved_when_apolice_fails(self):
+        with mock.patch.object(Apolice, 'save', side_effect=IntegrityError):
+            with self.assertRaises(IntegrityError):
+                self.client.post(self.url, self.valid_data)
+
+        self.assertEqual(Veiculo.objects.count(), 0)
+
 
 class NovoSeguradoViewTest(TestCase):
 
@@ -314,6 +640,98 @@ class VerApoliceViewTest(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(apolice, response.context['apolice'])
 
+    def test_unchanged_apolice_returns_304_after_one_query(self):
+        etag = self.client.get(self.url)['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.templates, [])
+
+    def test_stale_etag_does_not_read_messages(self):
+        with mock.patch('seguros.views.get_messages') as get_messages_view:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH='"desatualizada"')
+
+        self.assertEqual(response.status_code, 200)
+        get_messages_view.assert_not_called()
+
+    def test_matching_etag_with_pending_messages_is_rendered(self):
+        etag = self.client.get(self.url)['ETag']
+
+        with mock.patch('seguros.views.get_messages', return_value=['Apólice editada.']):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_edited_apolice_or_vehicle_is_rendered_again(self):
+        etag = self.client.get(self.url)['ETag']
+        apolice = Apolice.objects.get(codigo='TesteCodigo')
+        apolice.veiculo.modelo = 'OutroModelo'
+        apolice.veiculo.save()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'OutroModelo')
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class AsgiViewsTest(TestCase):
+
+    def setUp(self) -> None:
+        self.segurado = Segurado.objects.create(
+            nome = 'TesteNome',
+            nascimento = '2000-01-01',
+            telefone = 'TesteTelefone',            
+            cpf = 'TesteCPF',
+            endereco = 'TesteEndereço',
+            estado_civil = 'NI'
+        ) 
+        veiculo = Veiculo.objects.create(
+            modelo = 'TestModelo1',
+            placa = 'Placa1',
+            chassi = 'TestChassi1',
+            ano_modelo = 2000,
+            alienado = False
+        )    
+        Apolice.objects.create(
+            segurado = self.segurado,
+            veiculo = veiculo,
+            codigo = 'TesteCodigo',
+            seguradora = 'BR',
+            vigencia = '2000-01-01',
+            premio = 2000.00,
+            perc_comissao = 10,            
+        )
+        self.client = AsyncClient()
+
+    async def test_read_only_views_are_served_under_asgi(self):
+        urls = (
+            reverse('index'),
+            reverse('clients_list'),
+            reverse('ver_segurado', kwargs={'pk': self.segurado.pk}),
+            reverse('ver_apolice', kwargs={'pk': 'TesteCodigo'}),
+            f'{reverse("relatorio")}?mes=1&ano=2000',
+        )
+        respostas = await asyncio.gather(*(self.client.get(url) for url in urls))
+
+        self.assertEqual([r.status_code for r in respostas], [200] * len(urls))
+        self.assertContains(respostas[0], 'TesteCodigo')
+        self.assertContains(respostas[3], 'TestModelo1')
+        self.assertContains(respostas[4], 'TesteCodigo')
+
+    async def test_missing_apolice_returns_404(self):
+        response = await self.client.get(reverse('ver_apolice', kwargs={'pk': 'codigoinvalido'}))
+
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(INSTRUMENTACAO_ATIVA=True, INSTRUMENTACAO_AMOSTRAGEM=1.0)
+    async def test_async_chain_still_counts_queries(self):
+        with self.assertLogs('seguros.instrumentacao', 'INFO') as logs:
+            response = await self.client.get(reverse('ver_apolice', kwargs={'pk': 'TesteCodigo'}))
+
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
+        self.assertGreater(json.loads(logs.records[0].getMessage())['render_ms'], 0)
+
 
 class VerSeguradoViewTest(TestCase):
     
@@ -379,6 +797,23 @@ class VerSeguradoViewTest(TestCase):
             [apolice],
         )
 
+    def test_unchanged_segurado_returns_304_after_one_query(self):
+        etag = self.client.get(self.url)['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.templates, [])
+
+    def test_new_or_deleted_policy_changes_segurado_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        apolice = Apolice.objects.get(codigo='TesteCodigo')
+        apolice.delete()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'TesteCodigo')
+
 
 class EditarApoliceViewTest(TestCase):
 
@@ -483,6 +918,50 @@ class EditarApoliceViewTest(TestCase):
         self.assertEqual(len(message), 1)
         self.assertEqual(str(message[0]), 'Apólice editada com sucesso.')        
 
+    def outra_apolice_no_veiculo(self):
+        return Apolice.objects.create(
+            segurado = self.apolice.segurado,
+            veiculo = self.apolice.veiculo,
+            codigo = 'OutroCodigo',
+            seguradora = 'BR',
+            vigencia = '2000-02-01',
+            premio = 1000.00,
+            perc_comissao = 10,
+        )
+
+    def test_shared_vehicle_data_cannot_be_changed_from_one_policy(self):
+        self.outra_apolice_no_veiculo()
+        dados = {**self.valid_data, 'placa': 'Placa1', 'chassi': 'TestChassi1'}
+        response = self.client.post(self.url, dados)
+
+        self.assertTemplateUsed(response, 'seguros/editar_apolice.html')
+        self.assertTrue(response.context['veiculo_form'].non_field_errors())
+        self.assertEqual(Veiculo.objects.get().modelo, 'TestModelo1')
+        self.assertEqual(Apolice.objects.get(codigo='TesteCodigo').seguradora, 'BR')
+
+    def test_new_placa_on_shared_vehicle_moves_only_this_policy(self):
+        outra = self.outra_apolice_no_veiculo()
+        self.client.post(self.url, self.valid_data)
+
+        self.assertEqual(Veiculo.objects.count(), 2)
+        self.assertEqual(Apolice.objects.get(codigo='TesteCodigo').veiculo.placa, 'EDI000')
+        self.assertEqual(Apolice.objects.get(pk=outra.pk).veiculo.placa, 'Placa1')
+
+    def test_placa_of_a_registered_vehicle_switches_to_it(self):
+        registrado = Veiculo.objects.create(
+            modelo = 'Registrado',
+            placa = 'EDI000',
+            chassi = 'CHASSIEDITADO',
+            ano_modelo = 2021,
+            alienado = False
+        )
+        response = self.client.post(self.url, self.valid_data)
+        mensagens = [str(m) for m in get_messages(response.wsgi_request)]
+
+        self.assertEqual(Apolice.objects.get(codigo='TesteCodigo').veiculo, registrado)
+        self.assertEqual(Veiculo.objects.get(pk=registrado.pk).modelo, 'Registrado')
+        self.assertIn('Modelo', mensagens[0])
+
 
 class EditarSeguradoViewTest(TestCase):
 
@@ -661,7 +1140,8 @@ class DeletarApoliceViewTest(TestCase):
 class RelatorioViewTest(TestCase):
     
     def setUp(self) -> None:
-        segurado = Segurado.objects.create(
+        cache.clear()
+        self.segurado = segurado = Segurado.objects.create(
             id= 1,
             nome = 'TesteNome',
             nascimento = '2000-01-01',
@@ -722,4 +1202,537 @@ class RelatorioViewTest(TestCase):
         response = self.client.get('/relatorio?mes=05&ano=2022')
 
         self.assertEqual(response.context['soma'], 350.00)
- 
\ No newline at end of file
+
+    def test_view_lists_only_policies_of_the_month(self):
+        self.apolice_2.vigencia = '2022-06-01'
+        self.apolice_2.save()
+        response = self.client.get('/relatorio?mes=05&ano=2022')
+
+        self.assertEqual([a['codigo'] for a in response.context['apolices']], [self.apolice_1.codigo])
+        self.assertEqual(response.context['soma'], 200.00)
+
+    def test_view_with_invalid_month_renders_empty_report(self):
+        response = self.client.get('/relatorio?mes=13&ano=2022')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('apolices', response.context)
+
+    def test_cached_month_costs_no_queries(self):
+        self.client.get('/relatorio?mes=05&ano=2022')
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/relatorio?mes=05&ano=2022')
+        self.assertEqual(len(response.context['apolices']), 2)
+        self.assertContains(response, 'TesteNome')
+
+    def test_cached_month_holds_plain_row_values(self):
+        self.client.get('/relatorio?mes=05&ano=2022')
+        linhas = {linha['codigo']: linha for linha in cache.get(chave_relatorio(2022, 5))['apolices']}
+        linha = linhas[self.apolice_1.codigo]
+
+        self.assertIsInstance(linha, dict)
+        self.assertEqual(linha['segurado_nome'], 'TesteNome')
+        self.assertEqual(linha['seguradora'], self.apolice_1.get_seguradora_display())
+
+    def test_editing_or_deleting_a_policy_invalidates_only_its_month(self):
+        self.client.get('/relatorio?mes=05&ano=2022')
+        self.client.get('/relatorio?mes=04&ano=2022')
+
+        self.apolice_1.premio = 4000
+        self.apolice_1.save()
+        self.assertIsNone(cache.get(chave_relatorio(2022, 5)))
+        self.assertIsNotNone(cache.get(chave_relatorio(2022, 4)))
+        response = self.client.get('/relatorio?mes=05&ano=2022')
+        self.assertEqual(response.context['soma'], 550.00)
+
+        self.apolice_2.delete()
+        response = self.client.get('/relatorio?mes=05&ano=2022')
+        self.assertEqual([a['codigo'] for a in response.context['apolices']], [self.apolice_1.codigo])
+
+    def test_editing_the_segurado_invalidates_the_months_listing_it(self):
+        self.client.get('/relatorio?mes=05&ano=2022')
+        self.segurado.nome = 'NomeEditado'
+        self.segurado.save()
+
+        response = self.client.get('/relatorio?mes=05&ano=2022')
+        self.assertContains(response, 'NomeEditado')
+
+    @override_settings(DATABASE_REPLICAS=['default'], REPLICA_ATRASO_MAXIMO=60)
+    def test_with_replicas_month_is_not_cached_again_until_they_catch_up(self):
+        self.client.get('/relatorio?mes=05&ano=2022')
+        self.apolice_1.save()
+        self.client.get('/relatorio?mes=05&ano=2022')
+
+        self.assertEqual(cache.get(chave_relatorio(2022, 5)), INVALIDADO)
+ 
+
+class ExportarRelatorioViewTest(TestCase):
+
+    def setUp(self) -> None:
+        segurado = Segurado.objects.create(
+            nome = 'João',
+            nascimento = '2000-01-01',
+            telefone = 'TesteTelefone',            
+            cpf = 'TesteCPF',
+            endereco = 'TesteEndereço',
+            estado_civil = 'NI'
+        )
+        veiculo = Veiculo.objects.create(
+            modelo = 'TestModelo1',
+            placa = 'Placa1',
+            chassi = 'TestChassi1',
+            ano_modelo = 2000,
+            alienado = False
+        )
+        for codigo, vigencia in (('Maio', '2022-05-01'), ('Junho', '2022-06-15'), ('Outro', '2021-05-01')):
+            Apolice.objects.create(
+                segurado = segurado,
+                veiculo = veiculo,
+                codigo = codigo,
+                seguradora = 'BR',
+                vigencia = vigencia,
+                premio = 2000.00,
+                perc_comissao = 10,
+            )
+        self.url = reverse('exportar_relatorio')
+
+    def linhas(self, response):
+        conteudo = b''.join(response.streaming_content).decode('utf-8-sig')
+        return [linha.split(';') for linha in conteudo.splitlines()]
+
+    def test_export_streams_csv_of_the_month(self):
+        response = self.client.get(self.url, {'mes': '05', 'ano': '2022'})
+        linhas = self.linhas(response)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertIn('relatorio_2022_05.csv', response['Content-Disposition'])
+        self.assertEqual(linhas[0][4], 'Apólice')
+        self.assertEqual(len(linhas), 2)
+        self.assertEqual(linhas[1][0], 'João')
+        self.assertEqual(linhas[1][5], 'Bradesco')
+        self.assertEqual(linhas[1][8], '200.0000')
+
+    def test_export_without_month_covers_whole_year(self):
+        response = self.client.get(self.url, {'ano': '2022'})
+
+        self.assertEqual([l[4] for l in self.linhas(response)[1:]], ['Maio', 'Junho'])
+
+    def test_export_without_year_returns_404(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 404)
+
+
+class RelatorioPeriodoViewTest(TestCase):
+
+    def setUp(self) -> None:
+        segurado = Segurado.objects.create(
+            nome = 'TesteNome',
+            nascimento = '2000-01-01',
+            telefone = 'TesteTelefone',
+            cpf = 'TesteCPF',
+            endereco = 'TesteEndereço',
+            estado_civil = 'NI'
+        )
+        veiculo = Veiculo.objects.create(
+            modelo = 'TestModelo1',
+            placa = 'Placa1',
+            chassi = 'TestChassi1',
+            ano_modelo = 2000,
+            alienado = False
+        )
+        for codigo, seguradora, vigencia, premio in (
+            ('Jan', 'BR', '2022-01-10', 1000.00),
+            ('Mar1', 'BR', '2022-03-05', 2000.00),
+            ('Mar2', 'AZ', '2022-03-20', 500.00),
+            ('Fora', 'AZ', '2023-01-01', 9000.00),
+        ):
+            Apolice.objects.create(
+                segurado = segurado,
+                veiculo = veiculo,
+                codigo = codigo,
+                seguradora = seguradora,
+                vigencia = vigencia,
+                premio = premio,
+                perc_comissao = 10,
+            )
+        self.url = reverse('relatorio_periodo')
+
+    def test_range_is_broken_down_by_month_and_seguradora_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'de': '2022-01', 'ate': '2022-12'})
+        relatorio = response.context['relatorio']
+        colunas = [codigo for codigo, _ in relatorio.seguradoras]
+
+        self.assertEqual(len(relatorio.meses), 12)
+        ano, mes, celulas, total = relatorio.meses[2]
+        self.assertEqual((ano, mes, total.quantidade, total.comissao), (2022, 3, 2, 250))
+        self.assertEqual(celulas[colunas.index('BR')].comissao, 200)
+        self.assertEqual(celulas[colunas.index('AZ')].comissao, 50)
+        self.assertEqual(relatorio.por_seguradora[colunas.index('BR')].quantidade, 2)
+        self.assertEqual((relatorio.total.quantidade, relatorio.total.comissao), (3, 350))
+
+    def test_ten_year_range_is_a_single_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'de': '2015-01', 'ate': '2024-12'})
+
+        self.assertEqual(len(response.context['relatorio'].meses), 120)
+        self.assertEqual(response.context['relatorio'].total.quantidade, 4)
+
+    def test_csv_export_lists_month_and_seguradora_rows(self):
+        response = self.client.get(self.url, {'de': '2022-01', 'ate': '2022-12', 'formato': 'csv'})
+        linhas = b''.join(response.streaming_content).decode().lstrip('\ufeff').splitlines()
+
+        self.assertEqual(linhas[0], 'Mês;Seguradora;Apólices;Prêmio;Comissão')
+        self.assertEqual(len(linhas), 4)
+        self.assertIn('03/2022;Bradesco;1;2000.00;200.0000', linhas)
+
+    def test_invalid_range_shows_error(self):
+        response = self.client.get(self.url, {'de': '2022-05', 'ate': '2022-01'})
+
+        self.assertIsNone(response.context.get('relatorio'))
+        self.assertEqual([str(m) for m in get_messages(response.wsgi_request)],
+                         ['O fim do período é anterior ao início.'])
+
+
+class ExportacaoAsgiTest(TransactionTestCase):
+    """
+    Downloads the CSV exports through the ASGI handler, which iterates
+    streaming responses inside the event loop.
+    """
+
+    def setUp(self) -> None:
+        segurado = Segurado.objects.create(
+            nome = 'João',
+            nascimento = '2000-01-01',
+            telefone = 'TesteTelefone',
+            cpf = 'TesteCPF',
+            endereco = 'TesteEndereço',
+            estado_civil = 'NI'
+        )
+        veiculo = Veiculo.objects.create(
+            modelo = 'TestModelo1',
+            placa = 'Placa1',
+            chassi = 'TestChassi1',
+            ano_modelo = 2000,
+            alienado = False
+        )
+        for codigo, vigencia in (('Maio', '2024-05-01'), ('Junho', '2024-06-15')):
+            Apolice.objects.create(
+                segurado = segurado,
+                veiculo = veiculo,
+                codigo = codigo,
+                seguradora = 'BR',
+                vigencia = vigencia,
+                premio = 2000.00,
+                perc_comissao = 10,
+            )
+
+    async def baixar(self, caminho, query_string):
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': 'GET', 'scheme': 'http', 'path': caminho, 'raw_path': caminho.encode(),
+            'query_string': query_string.encode(), 'root_path': '',
+            'headers': [(b'host', b'testserver')],
+            'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+        }
+        enviadas = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(mensagem):
+            enviadas.append(mensagem)
+
+        await ASGIHandler()(scope, receive, send)
+        self.assertEqual(enviadas[0]['status'], 200)
+        corpo = b''.join(m.get('body', b'') for m in enviadas[1:])
+        return corpo.decode('utf-8-sig').splitlines()
+
+    async def test_policy_export_streams_under_asgi(self):
+        linhas = await self.baixar(reverse('exportar_relatorio'), 'ano=2024')
+
+        self.assertEqual([linha.split(';')[4] for linha in linhas[1:]], ['Maio', 'Junho'])
+
+    async def test_period_export_streams_under_asgi(self):
+        linhas = await self.baixar(reverse('relatorio_periodo'), 'de=2024-01&ate=2024-12&formato=csv')
+
+        self.assertEqual(linhas[0], 'Mês;Seguradora;Apólices;Prêmio;Comissão')
+        self.assertIn('05/2024;Bradesco;1;2000.00;200.0000', linhas)
+
+
+class DashboardViewTest(TestCase):
+
+    def setUp(self) -> None:
+        segurado = Segurado.objects.create(
+            nome = 'TesteNome',
+            nascimento = '2000-01-01',
+            telefone = 'TesteTelefone',
+            cpf = 'TesteCPF',
+            endereco = 'TesteEndereço',
+            estado_civil = 'NI'
+        )
+        veiculo = Veiculo.objects.create(
+            modelo = 'TestModelo1',
+            placa = 'Placa1',
+            chassi = 'TestChassi1',
+            ano_modelo = 2000,
+            alienado = False
+        )
+        for codigo, seguradora, vigencia, premio, perc in (
+            ('Mar1', 'BR', '2022-03-05', 2000.00, 10),
+            ('Mar2', 'BR', '2022-03-20', 1000.00, 20),
+            ('Abr', 'AZ', '2022-04-01', 500.00, 15),
+        ):
+            Apolice.objects.create(
+                segurado = segurado,
+                veiculo = veiculo,
+                codigo = codigo,
+                seguradora = seguradora,
+                vigencia = vigencia,
+                premio = premio,
+                perc_comissao = perc,
+            )
+        self.url = reverse('dashboard')
+        self.api = reverse('api_dashboard')
+
+    def test_api_returns_one_array_per_seguradora_and_metric_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.api, {'de': '2022-02', 'ate': '2022-04'})
+        serie = response.json()
+        br = [codigo for codigo, _ in serie['seguradoras']].index('BR')
+
+        self.assertEqual(serie['meses'], ['2022-02', '2022-03', '2022-04'])
+        self.assertEqual(serie['quantidade'][br], [0, 2, 0])
+        self.assertEqual(serie['premio'][br], [0, 3000.0, 0])
+        self.assertEqual(serie['comissao'][br], [0, 400.0, 0])
+        self.assertEqual(serie['media_perc'][br], [None, 15.0, None])
+
+    def test_api_defaults_to_the_last_months(self):
+        serie = self.client.get(self.api).json()
+
+        self.assertEqual(len(serie['meses']), relatorios.DASHBOARD_MESES)
+        self.assertEqual(serie['meses'][-1], f'{date.today():%Y-%m}')
+
+    def test_api_invalid_range_returns_400(self):
+        response = self.client.get(self.api, {'de': '2022-05', 'ate': '2022-01'})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'erro': 'O fim do período é anterior ao início.'})
+
+    def test_page_embeds_the_series(self):
+        response = self.client.get(self.url, {'de': '2022-01', 'ate': '2022-12'})
+
+        self.assertTemplateUsed(response, 'seguros/dashboard.html')
+        self.assertEqual(len(response.context['serie']['meses']), 12)
+        self.assertContains(response, 'id="dashboard-serie"')
+
+    def test_page_invalid_month_shows_error(self):
+        response = self.client.get(self.url, {'de': 'ontem'})
+
+        self.assertIsNone(response.context.get('serie'))
+        self.assertEqual([str(m) for m in get_messages(response.wsgi_request)],
+                         ['Mês inicial inválido, use AAAA-MM.'])
+
+
+class AcoesEmMassaViewTest(TestCase):
+
+    def setUp(self) -> None:
+        self.segurado = Segurado.objects.create(
+            nome = 'TesteNome',
+            nascimento = '2000-01-01',
+            telefone = 'TesteTelefone',
+            cpf = 'TesteCPF',
+            endereco = 'TesteEndereço',
+            estado_civil = 'NI'
+        )
+        self.outro = Segurado.objects.create(
+            nome = 'OutroNome',
+            nascimento = '2000-01-01',
+            telefone = 'OutroTelefone',
+            cpf = 'OutroCPF',
+            endereco = 'OutroEndereço',
+            estado_civil = 'NI'
+        )
+        veiculo = Veiculo.objects.create(
+            modelo = 'TestModelo1',
+            placa = 'Placa1',
+            chassi = 'TestChassi1',
+            ano_modelo = 2000,
+            alienado = False
+        )
+        for codigo, seguradora, vigencia in (
+            ('A1', 'BR', '2022-03-05'),
+            ('A2', 'BR', '2022-03-20'),
+            ('A3', 'AZ', '2022-04-01'),
+        ):
+            Apolice.objects.create(
+                segurado = self.segurado,
+                veiculo = veiculo,
+                codigo = codigo,
+                seguradora = seguradora,
+                vigencia = vigencia,
+                premio = 1000.00,
+                perc_comissao = 10,
+            )
+        Renovacao.objects.create(apolice_id='A1', vencimento='2022-03-05')
+        self.url = reverse('acoes_em_massa')
+
+    def ledger_atual(self):
+        return (
+            list(ComissaoMensal.objects.filter(quantidade__gt=0).order_by('ano', 'mes', 'seguradora')
+                 .values_list('ano', 'mes', 'seguradora', 'quantidade', 'total_premio',
+                              'total_comissao', 'soma_perc_comissao')),
+            list(VencimentoDiario.objects.filter(quantidade__gt=0).order_by('vigencia', 'seguradora')
+                 .values_list('vigencia', 'seguradora', 'quantidade')),
+        )
+
+    def assertLedgerConsistente(self):
+        incremental = self.ledger_atual()
+        ledger.rebuild()
+        self.assertEqual(incremental, self.ledger_atual())
+
+    def mensagens(self, response):
+        return [str(m) for m in get_messages(response.wsgi_request)]
+
+    def test_commission_update_recomputes_comissao_and_ledger(self):
+        cache.set(chave_relatorio(2022, 3), {'apolices': [], 'soma': 0})
+
+        response = self.client.post(self.url, {
+            'acao': 'comissao', 'codigos': ['A1', 'A2'], 'perc_comissao': 20,
+        })
+
+        self.assertRedirects(response, reverse('index'), fetch_redirect_response=False)
+        self.assertEqual(self.mensagens(response), ['2 apólice(s) com comissão de 20%.'])
+        self.assertEqual(
+            list(Apolice.objects.order_by('codigo').values_list('perc_comissao', 'comissao', 'versao')),
+            [(20, 200, 2), (20, 200, 2), (10, 100, 1)],
+        )
+        marco = ComissaoMensal.objects.get(ano=2022, mes=3, seguradora='BR')
+        self.assertEqual((marco.total_comissao, marco.soma_perc_comissao), (400, 40))
+        self.assertIsNone(cache.get(chave_relatorio(2022, 3)))
+        self.assertLedgerConsistente()
+
+    def test_commission_update_keeps_cents_of_premios_without_cents(self):
+        Apolice.objects.filter(codigo='A1').update(premio=Decimal('1234.00'))
+        ledger.rebuild()
+
+        self.client.post(self.url, {'acao': 'comissao', 'codigos': ['A1'], 'perc_comissao': 15})
+
+        apolice = Apolice.objects.get(codigo='A1')
+        self.assertEqual(apolice.comissao, calcular_comissao(apolice.premio, 15))
+        self.assertEqual(apolice.comissao, Decimal('185.1000'))
+        self.assertLedgerConsistente()
+
+    def test_delete_keeps_ledger_consistent_and_cascades(self):
+        response = self.client.post(self.url, {'acao': 'excluir', 'codigos': ['A1', 'A3', 'X']})
+
+        self.assertEqual(self.mensagens(response), ['2 apólice(s) excluída(s).'])
+        self.assertEqual(list(Apolice.objects.values_list('codigo', flat=True)), ['A2'])
+        self.assertFalse(Renovacao.objects.exists())
+        self.assertLedgerConsistente()
+
+    def test_single_deletes_still_update_the_ledger(self):
+        Apolice.objects.get(codigo='A1').delete()
+
+        self.assertLedgerConsistente()
+
+    def test_reassign_moves_policies_and_invalidates_both_segurados(self):
+        versoes = tuple(Segurado.objects.order_by('id').values_list('versao', flat=True))
+        response = self.client.post(self.url, {
+            'acao': 'reatribuir', 'codigos': ['A1', 'A2'], 'segurado': self.outro.pk,
+            'voltar': '/?search=A',
+        })
+
+        self.assertRedirects(response, '/?search=A', fetch_redirect_response=False)
+        self.assertEqual(self.mensagens(response), ['2 apólice(s) transferida(s) para OutroNome.'])
+        self.assertEqual(self.outro.apolices.count(), 2)
+        self.segurado.refresh_from_db()
+        self.outro.refresh_from_db()
+        self.assertEqual((self.segurado.versao, self.outro.versao), (versoes[0] + 1, versoes[1] + 1))
+        self.assertLedgerConsistente()
+
+    def test_missing_parameters_change_nothing(self):
+        response = self.client.post(self.url, {'acao': 'reatribuir', 'codigos': ['A1']})
+        self.assertEqual(self.mensagens(response), ['Informe o segurado que receberá as apólices.'])
+
+        response = self.client.post(self.url, {'acao': 'excluir', 'voltar': 'https://example.com/'})
+        self.assertRedirects(response, reverse('index'), fetch_redirect_response=False)
+        self.assertEqual(Apolice.objects.count(), 3)
+
+    def test_listing_renders_selection_checkboxes(self):
+        response = self.client.get(reverse('index'))
+
+        self.assertContains(response, 'name="codigos" value="A1"')
+        self.assertContains(response, 'name="csrfmiddlewaretoken"')
+
+
+class ImportarApolicesViewTest(TestCase):
+
+    def setUp(self) -> None:
+        self.url = reverse('importar_apolices')
+
+    def test_get_method_render_correct_template(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'seguros/importar.html')
+
+    def test_upload_imports_rows_and_lists_errors(self):
+        conteudo = (
+            'nome,nascimento,telefone,email,cpf,endereco,estado_civil,modelo,placa,chassi,'
+            'ano_modelo,alienado,codigo,seguradora,vigencia,premio,perc_comissao\n'
+            'Fulano,1990-01-01,119999,,123,Rua A,SL,Gol,ABC1234,9BW00,2020,False,UP1,BR,2022-05-10,1000.00,10\n'
+            'Fulano,1990-01-01,119999,,123,Rua A,SL,Gol,ABC1234,9BW00,2020,False,UP2,BR,2022-05-10,1000.00,99\n'
+        )
+        arquivo = SimpleUploadedFile('apolices.csv', conteudo.encode(), content_type='text/csv')
+        response = self.client.post(self.url, {'arquivo': arquivo, 'delimitador': ','})
+        resultado = response.context['resultado']
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(resultado.importadas, 1)
+        self.assertEqual([numero for numero, _ in resultado.erros], [3])
+        self.assertTrue(Apolice.objects.filter(codigo='UP1').exists())
+
+    def test_large_upload_is_imported_by_a_background_job(self):
+        conteudo = (
+            'nome,nascimento,telefone,email,cpf,endereco,estado_civil,modelo,placa,chassi,'
+            'ano_modelo,alienado,codigo,seguradora,vigencia,premio,perc_comissao\n'
+            'Fulano,1990-01-01,119999,,123,Rua A,SL,Gol,ABC1234,9BW00,2020,False,UP1,BR,2022-05-10,1000.00,10\n'
+        )
+        arquivo = SimpleUploadedFile('apolices.csv', conteudo.encode(), content_type='text/csv')
+        with tempfile.TemporaryDirectory() as pasta, \
+                override_settings(IMPORTACAO_SINCRONA_MAX=10, TAREFAS_DIR=pasta):
+            response = self.client.post(self.url, {'arquivo': arquivo, 'delimitador': ','})
+            tarefa = Tarefa.objects.get()
+
+            self.assertRedirects(response, tarefa.get_absolute_url())
+            self.assertFalse(Apolice.objects.exists())
+            tarefas.executar(tarefas.reservar())
+            self.assertEqual(os.listdir(pasta), [])
+
+        tarefa.refresh_from_db()
+        self.assertEqual(tarefa.status, Tarefa.CONCLUIDA)
+        self.assertEqual((tarefa.feitos, tarefa.total), (1, 1))
+        self.assertTrue(Apolice.objects.filter(codigo='UP1').exists())
+        response = self.client.get(tarefa.get_absolute_url())
+        self.assertContains(response, '1 de 1 apólices importadas')
+
+
+class TarefasViewTest(TestCase):
+
+    def test_maintenance_job_is_queued_and_listed(self):
+        response = self.client.post(reverse('tarefas'), {'tipo': 'recalcular_comissoes'})
+        tarefa = Tarefa.objects.get()
+
+        self.assertRedirects(response, tarefa.get_absolute_url())
+        self.assertEqual(tarefa.tipo, 'recalcular_comissoes')
+        response = self.client.get(reverse('tarefas'))
+        self.assertContains(response, tarefa.get_absolute_url())
+
+    def test_unknown_job_type_returns_404(self):
+        response = self.client.post(reverse('tarefas'), {'tipo': 'importar_apolices'})
+
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Tarefa.objects.exists())
@@ -1,16 +1,20 @@
 from django.urls import path
-from . import views
-from .views import ApoliceListView, ClientListView, ClientCreateView, ClientDetailView
+from . import api, views
+from .routers import ler_da_replica
+from .views import ApoliceListView, ClientListView, ClientCreateView, ClientDetailView, RenovacaoListView
 
 
 urlpatterns = [
-    path('', ApoliceListView.as_view(), name='index'),
+    path('', ler_da_replica(ApoliceListView.as_view()), name='index'),
     
-    path('clients/', ClientListView.as_view(), name='clients_list'),
+    path('clients/', ler_da_replica(ClientListView.as_view()), name='clients_list'),
     path('clients/new', ClientCreateView.as_view(), name='clients_create'),
     path('clients/<int:pk>', ClientDetailView.as_view(), name='ver_segurado'),
 
     path('nova_apolice/<int:pk>', views.nova_apolice, name='nova_apolice'),
+    path('importar', views.importar_apolices, name='importar_apolices'),
+    path('tarefas', views.listar_tarefas, name='tarefas'),
+    path('tarefas/<int:pk>', views.ver_tarefa, name='ver_tarefa'),
 
     path('apolice/<str:pk>', views.ver_apolice, name='ver_apolice'),
 
@@ -19,6 +23,20 @@ urlpatterns = [
     
     path('del_segurado/<int:pk>', views.deletar_segurado, name='deletar_segurado'),
     path('del_apolice/<str:pk>', views.deletar_apolice, name='deletar_apolice'),    
+    path('apolices/em_massa', views.acoes_em_massa, name='acoes_em_massa'),
     
-    path('relatorio', views.relatorio, name='relatorio'),
+    path('relatorio', ler_da_replica(views.relatorio), name='relatorio'),
+    path('renovacoes', ler_da_replica(RenovacaoListView.as_view()), name='renovacoes'),
+    path('relatorio/periodo', ler_da_replica(views.relatorio_periodo), name='relatorio_periodo'),
+    path('dashboard', ler_da_replica(views.dashboard), name='dashboard'),
+    path('relatorio/exportar', views.exportar_relatorio, name='exportar_relatorio'),
+
+    path('api/autocomplete', ler_da_replica(api.autocompletar), name='api_autocomplete'),
+    path('api/dashboard', ler_da_replica(api.dashboard), name='api_dashboard'),
+    path('api/apolices', ler_da_replica(api.listar), {'recurso': api.APOLICES}, name='api_apolices'),
+    path('api/apolices/<str:pk>', api.detalhar, {'recurso': api.APOLICES}, name='api_apolice'),
+    path('api/segurados', ler_da_replica(api.listar), {'recurso': api.SEGURADOS}, name='api_segurados'),
+    path('api/segurados/<int:pk>', api.detalhar, {'recurso': api.SEGURADOS}, name='api_segurado'),
+    path('api/veiculos', ler_da_replica(api.listar), {'recurso': api.VEICULOS}, name='api_veiculos'),
+    path('api/veiculos/<int:pk>', api.detalhar, {'recurso': api.VEICULOS}, name='api_veiculo'),
 ]
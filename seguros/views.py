@@ -1,58 +1,149 @@
+from datetime import date
 from django.shortcuts import render, redirect, get_object_or_404
-from .forms import SeguradoForm, ApoliceForm, VeiculoForm
+from django.template.response import TemplateResponse
+from .forms import SeguradoForm, ApoliceForm, VeiculoForm, ImportacaoForm, AcaoEmMassaForm
 from django.contrib import messages
-from .models import Apolice, Segurado
+from django.contrib.messages import get_messages
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag, url_has_allowed_host_and_scheme
+from .models import Apolice, Renovacao, Segurado, Tarefa
+from django.db import transaction
 from django.db.models import Q, Sum, F, QuerySet
 from django.views.generic import ListView, CreateView, DetailView, DeleteView
 from typing import Any, Dict, Optional
 from django.urls import reverse_lazy
+from .pagination import CursorPaginationMixin
+from .search import search_apolices, search_segurados
+from .exports import apolice_rows, fora_do_loop, stream_csv
+from .cache import relatorio_mensal
+from .importacao import COLUNAS, importar_csv
+from .renovacoes import em_aberto, limite
+import io
+import os
+import tempfile
+from django.conf import settings
+from . import em_massa, relatorios, tarefas
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from . import metricas as metricas_prometheus
 
 
-class ApoliceListView(ListView):
+APOLICE_LIST_FIELDS = (
+    'codigo', 'seguradora', 'vigencia', 'premio', 'comissao', 'versao',
+    'segurado__id', 'segurado__nome', 'segurado__telefone',
+    'veiculo__id', 'veiculo__modelo', 'veiculo__placa',
+)
+
+
+def _etag(objeto) -> str:
+    return quote_etag(f'{objeto._meta.model_name}-{objeto.pk}-{objeto.versao}')
+
+
+def nao_modificado(request, queryset: QuerySet, **filtros) -> Optional[HttpResponse]:
+    """
+    Answers a conditional GET with 304 Not Modified when the client's ETag
+    matches the object's current `versao`, reading only that column.
+
+    Pages with pending flash messages are always rendered. Those are only
+    looked up once the ETag matches, so a stale conditional GET does not
+    read the message storage.
+
+    Returns:
+        The 304 response, or None when the page has to be rendered.
+    """
+    if 'HTTP_IF_NONE_MATCH' not in request.META:
+        return None
+    objeto = queryset.filter(**filtros).only('versao').first()
+    if objeto is None:
+        return None
+    response = get_conditional_response(request, etag=_etag(objeto))
+    if response is None or get_messages(request):
+        return None
+    return response
+
+
+def com_etag(response: HttpResponse, objeto) -> HttpResponse:
+    """
+    Tags a detail page with the object's version and asks browsers to
+    revalidate it on every visit.
+    """
+    response['ETag'] = _etag(objeto)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+class ApoliceListView(CursorPaginationMixin, ListView):
     """
     A view that lists all Apolice instances with optional search functionality.
     
     Inherits from Django's ListView to display paginated results. Supports filtering
     by segurado's name or apolice code via URL query parameter (`?search=...`).
 
+    Segurado and Veiculo are fetched in the same query as the Apolice, and only
+    the columns shown in the table are loaded, so a page costs a fixed number
+    of queries regardless of how many policies exist.
+
+    Passing `?cursor=` switches to keyset pagination on (vigencia, codigo), and
+    `?ordem=comissao` / `?ordem=-comissao` sorts on the indexed commission column,
+    search results included.
+
     Attributes:
         model: The model class (Apolice).
         template_name: Path to the template rendering the list.
         context_object_name: Variable name for the queryset in the template.
+        paginate_by: Number of policies per page.
+        ordering: Stable ordering required for offset pagination.
+        cursor_ordering: Keyset used by cursor pagination.
+        ordering_choices: Orderings selectable through `?ordem=...`.
     """
     model = Apolice
     template_name = 'seguros/index.html'
     context_object_name = "apolices"
+    paginate_by = 50
+    ordering = ["codigo"]
+    cursor_ordering = ("vigencia", "codigo")
+    ordering_choices = {
+        "comissao": ["comissao", "codigo"],
+        "-comissao": ["-comissao", "codigo"],
+    }
+
+    def get_ordering(self):
+        return self.ordering_choices.get(self.request.GET.get('ordem'), self.ordering)
 
     def get_queryset(self, **kwargs: Any) -> QuerySet[Apolice]:
         """
         Filters queryset based on URL search parameter.
             
         Returns:
-            QuerySet filtered by:
-            - segurado__nome (partial match)
+            QuerySet joined with segurado and veiculo, filtered by:
+            - segurado__nome (partial, accent-insensitive match)
             - codigo (partial match)
+            and ordered by trigram relevance when searching, unless `?ordem=`
+            picks one of `ordering_choices`.
         """
-        queryset = super().get_queryset(**kwargs)
+        queryset = super().get_queryset(**kwargs).select_related(
+            'segurado', 'veiculo'
+        ).only(*APOLICE_LIST_FIELDS)
         if search_term := self.request.GET.get('search'):
-            queryset = queryset.filter(
-                Q(segurado__nome__icontains=search_term) |
-                Q(codigo__icontains=search_term)
-            )
+            queryset = search_apolices(queryset, search_term)
+            if self.request.GET.get('ordem') in self.ordering_choices:
+                queryset = queryset.order_by(*self.get_ordering())
         return queryset
 
 
-class ClientListView(ListView):
+class ClientListView(CursorPaginationMixin, ListView):
     """
     A view that lists all Clients instances with optional search functionality.
 
     Inherits from Django's ListView to display paginated results. Supports filtering
-    by clients's name via URL query parameter (`?search=...`).
+    by clients's name via URL query parameter (`?search=...`). Passing `?cursor=`
+    switches to keyset pagination on (nome, id).
     """
     model = Segurado
     template_name = "seguros/lista_segurados.html"
     context_object_name = "segurados"
-    ordering = ["nome"]
+    paginate_by = 50
+    ordering = ["nome", "id"]
+    cursor_ordering = ("nome", "id")
 
     def get_queryset(self, **kwargs: Any) -> QuerySet[Segurado]:
         """
@@ -60,16 +151,51 @@ class ClientListView(ListView):
             
         Returns:
             QuerySet filtered by:
-            - nome (partial match)
+            - nome (partial, accent-insensitive match)
+            and ordered by trigram relevance when searching.
         """
         queryset = super().get_queryset(**kwargs)
         if search_term := self.request.GET.get('search'):
-            queryset = queryset.filter(
-                nome__icontains=search_term
-            ).order_by('nome')
+            queryset = search_segurados(queryset, search_term)
         return queryset
 
 
+class RenovacaoListView(CursorPaginationMixin, ListView):
+    """
+    The renewal queue: policies whose vigência ends within the window and
+    have not been renewed, soonest first, overdue ones included.
+
+    `?dias=` widens or narrows the window (default `RENOVACAO_ANTECEDENCIA`),
+    clamped to 0..DIAS_MAXIMO. The queue is filled by `processar_renovacoes` and read through a partial
+    index, with segurado and veiculo joined in the same query.
+    """
+    model = Renovacao
+    template_name = 'seguros/renovacoes.html'
+    context_object_name = 'renovacoes'
+    paginate_by = 50
+    ordering = ['vencimento', 'apolice_id']
+    cursor_ordering = ('vencimento', 'apolice_id')
+    DIAS_MAXIMO = 365
+
+    def get_queryset(self, **kwargs: Any) -> QuerySet[Renovacao]:
+        try:
+            dias = min(max(int(self.request.GET['dias']), 0), self.DIAS_MAXIMO)
+        except (KeyError, ValueError):
+            dias = None
+        return em_aberto(limite(dias)).select_related(
+            'apolice__segurado', 'apolice__veiculo'
+        ).order_by(*self.ordering)
+
+
+def _avisar_divergencias(request, form_veiculo: VeiculoForm, veiculo) -> None:
+    if form_veiculo.divergentes:
+        messages.warning(
+            request,
+            f'Veículo {veiculo.placa} já cadastrado com outros dados '
+            f'({", ".join(form_veiculo.divergentes)}); a apólice usa o cadastro existente.',
+        )
+
+
 def nova_apolice(request, pk):    
     
     segurado = get_object_or_404(Segurado, id=pk)
@@ -98,11 +224,13 @@ def nova_apolice(request, pk):
 
     if form_veiculo.is_valid() and form_apolice.is_valid():
 
-        veiculo = form_veiculo.save()
-        apolice = form_apolice.save(commit=False)
-        apolice.veiculo = veiculo
-        apolice.segurado = segurado
-        apolice.save()
+        with transaction.atomic():
+            veiculo = form_veiculo.salvar()
+            apolice = form_apolice.save(commit=False)
+            apolice.veiculo = veiculo
+            apolice.segurado = segurado
+            apolice.save()
+        _avisar_divergencias(request, form_veiculo, veiculo)
         criado = messages.success(request, 'Cadastro efetuado.')
         return redirect('/', criado)            
     return render(request, 'seguros/nova_apolice.html', contexto)
@@ -133,11 +261,22 @@ class ClientDetailView(DetailView):
         context['apolices'] = segurado.apolices.all()
         return context
 
+    def get(self, request, *args, **kwargs):
+        if (response := nao_modificado(request, Segurado.objects, pk=kwargs['pk'])) is not None:
+            return response
+        response = super().get(request, *args, **kwargs)
+        return com_etag(response, self.object)
+
 
 def ver_apolice(request, pk):
 
-    apolice = get_object_or_404(Apolice, codigo=pk)
-    return render(request, 'seguros/ver_apolice.html', {'apolice': apolice})
+    if (response := nao_modificado(request, Apolice.objects, codigo=pk)) is not None:
+        return response
+    apolice = get_object_or_404(
+        Apolice.objects.select_related('segurado', 'veiculo'), codigo=pk
+    )
+    response = TemplateResponse(request, 'seguros/ver_apolice.html', {'apolice': apolice})
+    return com_etag(response, apolice)
 
 
 def ver_segurado(request, pk):
@@ -153,7 +292,7 @@ def editar_apolice(request, pk):
     apolice = get_object_or_404(Apolice, codigo=pk)        
 
     apolice_form = ApoliceForm(instance=apolice)
-    veiculo_form = VeiculoForm(instance=apolice.veiculo)    
+    veiculo_form = VeiculoForm(instance=apolice.veiculo, apolice=apolice)
     
     contexto = {'apolice_form': apolice_form,
                 'veiculo_form': veiculo_form,
@@ -163,6 +302,8 @@ def editar_apolice(request, pk):
         data = request.POST
 
         apolice_form = ApoliceForm(data=data, instance=apolice)
+        veiculo_form = VeiculoForm(data=data, instance=apolice.veiculo, apolice=apolice)
+        contexto.update(apolice_form=apolice_form, veiculo_form=veiculo_form)
 
         if apolice_form.is_valid():
             apolice_codigo = apolice_form.cleaned_data['codigo']
@@ -171,18 +312,19 @@ def editar_apolice(request, pk):
                 erro = messages.error(request, 'Não é possível alterar o código da apólice.')
                 return render(request, 'seguros/editar_apolice.html', contexto, erro)
 
-            veiculo_form = VeiculoForm(data=data, instance=apolice.veiculo)
             if veiculo_form.is_valid():
 
-                veiculo = veiculo_form.save()
-                apolice = apolice_form.save(commit=False)
-                apolice.veiculo = veiculo
-                apolice_form.save()
+                with transaction.atomic():
+                    veiculo = veiculo_form.salvar()
+                    apolice = apolice_form.save(commit=False)
+                    apolice.veiculo = veiculo
+                    apolice.save()
+                _avisar_divergencias(request, veiculo_form, veiculo)
 
-            contexto = {'apolice_form': apolice_form, 'apolice': apolice}
+                contexto = {'apolice_form': apolice_form, 'apolice': apolice}
 
-            editado= messages.success(request, 'Apólice editada com sucesso.')
-            return render(request, 'seguros/ver_apolice.html', contexto, editado)            
+                editado= messages.success(request, 'Apólice editada com sucesso.')
+                return render(request, 'seguros/ver_apolice.html', contexto, editado)            
             
     return render(request, 'seguros/editar_apolice.html', contexto)
 
@@ -226,17 +368,202 @@ def deletar_apolice(request, pk):
     return redirect('/', excluido)
 
 
+def acoes_em_massa(request):
+
+    voltar = request.POST.get('voltar')
+    if not url_has_allowed_host_and_scheme(voltar, allowed_hosts={request.get_host()}):
+        voltar = 'index'
+    if request.method != 'POST':
+        return redirect(voltar)
+
+    form = AcaoEmMassaForm(request.POST)
+    if not form.is_valid():
+        for erros in form.errors.values():
+            for erro in erros:
+                messages.error(request, erro)
+        return redirect(voltar)
+
+    dados = form.cleaned_data
+    acao = dados['acao']
+    if acao == AcaoEmMassaForm.EXCLUIR:
+        total = em_massa.excluir(dados['codigos'])
+        messages.success(request, f'{total} apólice(s) excluída(s).')
+    elif acao == AcaoEmMassaForm.REATRIBUIR:
+        total = em_massa.reatribuir(dados['codigos'], dados['segurado'])
+        messages.success(request, f'{total} apólice(s) transferida(s) para {dados["segurado"]}.')
+    else:
+        total = em_massa.atualizar_comissao(dados['codigos'], dados['perc_comissao'])
+        messages.success(request, f'{total} apólice(s) com comissão de {dados["perc_comissao"]}%.')
+    return redirect(voltar)
+
+
+def _periodo_relatorio(request):
+    """
+    Reads `mes` and `ano` from the querystring. Without `mes` the whole year
+    is selected.
+
+    Returns:
+        (inicio, fim) half-open date range, or None if absent or invalid.
+    """
+    vigencia_mes = request.GET.get('mes')
+    vigencia_ano = request.GET.get('ano')
+    try:
+        if vigencia_mes:
+            inicio = date(int(vigencia_ano), int(vigencia_mes), 1)
+            return inicio, date(inicio.year + inicio.month // 12, inicio.month % 12 + 1, 1)
+        inicio = date(int(vigencia_ano), 1, 1)
+        return inicio, date(inicio.year + 1, 1, 1)
+    except (TypeError, ValueError):
+        return None
+
+
 def relatorio(request):        
 
     vigencia_mes = request.GET.get('mes')    
     vigencia_ano = request.GET.get('ano')    
     
     if vigencia_mes and vigencia_ano:               
-        apolices = Apolice.objects.filter(vigencia__year=vigencia_ano, 
-                                          vigencia__month=vigencia_mes).order_by('vigencia')    
-        soma = Apolice.objects.filter(vigencia__year=vigencia_ano, vigencia__month=vigencia_mes).annotate(
-            total=(F('premio') * F('perc_comissao')) / 100).aggregate(soma_com=Sum('total'))
-                    
-        return render(request, 'seguros/relatorio.html', {'apolices': apolices, 'soma': soma['soma_com']})
-
-    return render(request, 'seguros/relatorio.html')
+        periodo = _periodo_relatorio(request)
+        if periodo is None:
+            messages.error(request, 'Mês ou ano inválido.')
+            return TemplateResponse(request, 'seguros/relatorio.html')
+        inicio, _ = periodo
+
+        dados = relatorio_mensal(inicio.year, inicio.month)
+        return TemplateResponse(request, 'seguros/relatorio.html', dados)
+
+    return TemplateResponse(request, 'seguros/relatorio.html')
+
+
+def relatorio_periodo(request):
+
+    inicio = relatorios.ler_mes(request.GET.get('de'))
+    fim = relatorios.ler_mes(request.GET.get('ate'))
+    if not request.GET.get('de') and not request.GET.get('ate'):
+        return TemplateResponse(request, 'seguros/relatorio_periodo.html')
+    if inicio is None or fim is None:
+        messages.error(request, 'Informe o início e o fim do período (mês/ano).')
+        return TemplateResponse(request, 'seguros/relatorio_periodo.html')
+    try:
+        dados = relatorios.relatorio_periodo(inicio, fim)
+    except ValueError as e:
+        messages.error(request, str(e))
+        return TemplateResponse(request, 'seguros/relatorio_periodo.html')
+
+    if request.GET.get('formato') == 'csv':
+        response = StreamingHttpResponse(
+            stream_csv(dados.linhas(), ('Mês', 'Seguradora', 'Apólices', 'Prêmio', 'Comissão')),
+            content_type='text/csv; charset=utf-8',
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="relatorio_{inicio:%Y_%m}_{fim:%Y_%m}.csv"'
+        )
+        return response
+    return TemplateResponse(request, 'seguros/relatorio_periodo.html', {'relatorio': dados})
+
+
+def dashboard(request):
+
+    try:
+        inicio, fim = relatorios.periodo_dashboard(request.GET.get('de'), request.GET.get('ate'))
+        serie = relatorios.serie_mensal(inicio, fim)
+    except ValueError as e:
+        messages.error(request, str(e))
+        return TemplateResponse(request, 'seguros/dashboard.html')
+    return TemplateResponse(request, 'seguros/dashboard.html', {
+        'serie': serie, 'de': f'{inicio:%Y-%m}', 'ate': f'{fim:%Y-%m}',
+    })
+
+
+def exportar_relatorio(request):
+
+    periodo = _periodo_relatorio(request)
+    if periodo is None:
+        raise Http404('Informe o ano (e opcionalmente o mês) do relatório.')
+    inicio, fim = periodo
+
+    apolices = Apolice.objects.filter(
+        vigencia__gte=inicio, vigencia__lt=fim
+    ).order_by('vigencia', 'codigo')
+    nome_arquivo = f'relatorio_{inicio:%Y_%m}.csv' if request.GET.get('mes') else f'relatorio_{inicio:%Y}.csv'
+
+    response = StreamingHttpResponse(
+        fora_do_loop(stream_csv(apolice_rows(apolices))), content_type='text/csv; charset=utf-8'
+    )
+    response['Content-Disposition'] = f'attachment; filename="{nome_arquivo}"'
+    return response
+
+
+def _importar_em_segundo_plano(request, upload, delimitador):
+    # Saved where the workers can read it; the job deletes the file when done.
+    pasta = settings.TAREFAS_DIR
+    os.makedirs(pasta, exist_ok=True)
+    descritor, caminho = tempfile.mkstemp(suffix='.csv', dir=pasta)
+    with os.fdopen(descritor, 'wb') as destino:
+        for parte in upload.chunks():
+            destino.write(parte)
+    tarefa = tarefas.enfileirar('importar_apolices', caminho=caminho, delimitador=delimitador)
+    messages.info(request, 'Arquivo grande: a importação continua em segundo plano.')
+    return redirect(tarefa)
+
+
+def importar_apolices(request):
+
+    form = ImportacaoForm()
+    resultado = None
+
+    if request.method == 'POST':
+        form = ImportacaoForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = request.FILES['arquivo']
+            if upload.size > settings.IMPORTACAO_SINCRONA_MAX:
+                return _importar_em_segundo_plano(request, upload, form.cleaned_data['delimitador'])
+            arquivo = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+            resultado = importar_csv(arquivo, delimiter=form.cleaned_data['delimitador'])
+            messages.success(
+                request, f'{resultado.importadas} de {resultado.lidas} apólices importadas.'
+            )
+
+    contexto = {'form': form, 'resultado': resultado, 'colunas': COLUNAS}
+    return render(request, 'seguros/importar.html', contexto)
+
+
+# Maintenance jobs that can be started from the jobs page.
+TAREFAS_MANUTENCAO = {
+    'recalcular_comissoes': 'Recalcular comissões',
+    'processar_renovacoes': 'Processar renovações',
+    'deduplicar_veiculos': 'Mesclar veículos duplicados',
+}
+
+
+def listar_tarefas(request):
+
+    if request.method == 'POST':
+        tipo = request.POST.get('tipo')
+        if tipo not in TAREFAS_MANUTENCAO:
+            raise Http404('Tarefa desconhecida.')
+        tarefa = tarefas.enfileirar(tipo)
+        messages.success(request, f'{TAREFAS_MANUTENCAO[tipo]}: tarefa #{tarefa.pk} na fila.')
+        return redirect(tarefa)
+
+    contexto = {
+        'tarefas': Tarefa.objects.defer('parametros', 'resultado', 'erro').order_by('-id')[:50],
+        'manutencao': TAREFAS_MANUTENCAO,
+    }
+    return render(request, 'seguros/tarefas.html', contexto)
+
+
+def ver_tarefa(request, pk):
+
+    tarefa = get_object_or_404(Tarefa, pk=pk)
+    return render(request, 'seguros/ver_tarefa.html', {'tarefa': tarefa})
+
+
+def metricas(request):
+
+    from .urls import urlpatterns
+    rotas = [padrao.name for padrao in urlpatterns if padrao.name]
+    return HttpResponse(
+        metricas_prometheus.exportar(rotas),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )